@@ -1,11 +1,11 @@
 # app.py
 from pathlib import Path
 from ui_main import MainUI
-from crypto_ops import run_encrypt_and_sign
+from crypto_ops import Cancelled, run_encrypt_and_sign
 
 
 def on_run(**kwargs):
-    ui.clear_log()
+    # corre en el hilo de trabajo de MainUI: solo habla con la ventana vía logln
     try:
         rsa_pub_pem = Path(kwargs["rsa_pub_path"]).read_bytes()
         ed_priv_pem = Path(kwargs["ed_priv_path"]).read_bytes()
@@ -18,6 +18,8 @@ def on_run(**kwargs):
             bidder=kwargs["bidder"],
             call_id=kwargs["call_id"],
             key_id=kwargs["key_id"],
+            progress=kwargs["progress"],
+            cancel=kwargs["cancel"],
         )
 
         ui.logln("✅ Proceso completado.")
@@ -28,6 +30,8 @@ def on_run(**kwargs):
         ui.logln("\nRecuerda: para enviar al convocante debes POSTear:")
         ui.logln("  meta (meta.json), payload (payload.enc), wrapped_key (wrapped_key.bin), nonce (nonce.bin), tag (tag.bin)")
 
+    except Cancelled:
+        ui.logln("⏹ Cancelado. No se ha tocado la carpeta de salida.")
     except Exception as e:
         ui.logln("❌ Error: " + str(e))
 
@@ -0,0 +1,238 @@
+# batch.py
+# Sellado por lotes sin interfaz: lee un manifiesto JSON con muchos trabajos (licitante x
+# convocatoria x archivos) y los sella en paralelo con run_encrypt_and_sign.
+#
+# Uso (desde clidesk/):
+#   python batch.py lote.json                       # un proceso por CPU
+#   python batch.py lote.json -j 4 --threads 2      # 4 paquetes a la vez, 2 hilos de compresión cada uno
+#   python batch.py lote.json --skip-existing       # retomar un lote interrumpido
+#
+# Manifiesto (rutas relativas al propio manifiesto; `defaults` se aplica a cada trabajo):
+#   {
+#     "output_dir": "salida/lote-2025-06",
+#     "defaults": {"rsa_pub": "claves/conv_rsa_pub.pem", "ed_priv": "ed25519_priv.pem",
+#                  "key_id": "k-2025", "format_version": 1},  # 2 = contenedor por trozos
+#     "jobs": [
+#       {"id": "acme-obra-12", "bidder": {"name": "ACME", "identifier": "B12345678"},
+#        "call_id": "OBRA-12", "files": ["acme/oferta.pdf", "acme/anexos/"]},
+#       ...
+#     ]
+#   }
+# Con "key_registry": "<URL del convocante>" (p. ej. en `defaults`) sobran "rsa_pub" y
+# "key_id": la clave se resuelve contra el registro (la más reciente del call_id si no se
+# da key_id; "key_fingerprint" opcional la fija) y queda en la caché local de key_registry.
+# Cada trabajo se sella en <output_dir>/<id>/. Un directorio en `files` aporta todos sus
+# archivos (recursivo). Un trabajo que falla no para al resto: su carpeta a medio hacer
+# se borra y el error queda en <output_dir>/batch_report.json.
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from crypto_ops import run_encrypt_and_sign
+from key_registry import KeyResolver
+
+REQUIRED = ("id", "bidder", "call_id", "key_id", "files", "rsa_pub", "ed_priv")
+REGISTRY_RESOLVES = ("key_id", "rsa_pub")
+PARTIAL = ".partial"
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def _expand_files(base: Path, specs: List[str]) -> List[Path]:
+    files = []
+    for spec in specs:
+        p = base / spec
+        if p.is_dir():
+            files.extend(sorted(f for f in p.rglob("*") if f.is_file()))
+        else:
+            files.append(p)
+    return files
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    """Lee y valida el manifiesto; devuelve {"output_dir": Path, "jobs": [dict, ...]}."""
+    try:
+        doc = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"No se pudo leer {path}: {e}")
+    base = path.parent
+    defaults = doc.get("defaults", {})
+    jobs, seen = [], set()
+    for n, raw in enumerate(doc.get("jobs", []), 1):
+        job = {**defaults, **raw}
+        missing = [k for k in REQUIRED if not job.get(k)
+                   and not (job.get("key_registry") and k in REGISTRY_RESOLVES)]
+        if missing:
+            raise ManifestError(f"Trabajo #{n}: faltan {', '.join(missing)}")
+        job_id = str(job["id"])
+        if job_id in seen or "/" in job_id or "\\" in job_id or job_id.startswith("."):
+            raise ManifestError(f"Trabajo #{n}: id inválido o repetido: {job_id!r}")
+        seen.add(job_id)
+        jobs.append({
+            "id": job_id,
+            "bidder": job["bidder"],
+            "call_id": job["call_id"],
+            "key_id": job.get("key_id"),
+            "files": [str(p) for p in _expand_files(base, job["files"])],
+            "rsa_pub": str(base / job["rsa_pub"]) if job.get("rsa_pub") else None,
+            "key_registry": job.get("key_registry"),
+            "key_fingerprint": job.get("key_fingerprint"),
+            "ed_priv": str(base / job["ed_priv"]),
+            "format_version": int(job.get("format_version", 1)),
+        })
+    if not jobs:
+        raise ManifestError("El manifiesto no tiene trabajos")
+    return {"output_dir": base / doc.get("output_dir", "output/batch"), "jobs": jobs}
+
+
+# ---- Lado worker (proceso del pool) ----
+
+@lru_cache(maxsize=32)
+def _read_key(path: str) -> bytes:
+    # las mismas claves se repiten en casi todos los trabajos del lote
+    return Path(path).read_bytes()
+
+
+def _seal_job(job: Dict[str, Any], out_root: str, threads: Optional[int]) -> Dict[str, Any]:
+    """Sella un trabajo en <out_root>/<id>; nunca lanza: los errores vuelven en el resultado."""
+    final = Path(out_root) / job["id"]
+    partial = Path(out_root) / (job["id"] + PARTIAL)
+    t0 = time.perf_counter()
+    result = {"id": job["id"], "ok": False, "bytes": 0}
+    try:
+        result["bytes"] = sum(os.path.getsize(p) for p in job["files"])
+        names = [Path(p).name for p in job["files"]]
+        dup = sorted({n for n in names if names.count(n) > 1})
+        if dup:  # el paquete guarda cada archivo por su nombre, sin carpetas
+            raise ValueError(f"nombres de archivo repetidos: {', '.join(dup)}")
+        key_id, rsa_pub = job["key_id"], job["rsa_pub"]
+        if rsa_pub is None:
+            resolver = KeyResolver(job["key_registry"])
+            key_id = key_id or resolver.latest_for_call(job["call_id"])
+            rsa_pub = str(resolver.public_key_path(key_id, job["key_fingerprint"]))
+            result["key_id"] = key_id
+        shutil.rmtree(partial, ignore_errors=True)
+        run_encrypt_and_sign(
+            input_files=job["files"],
+            rsa_pub_pem=_read_key(rsa_pub),
+            ed_priv_pem=_read_key(job["ed_priv"]),
+            output_dir=partial,
+            bidder=job["bidder"],
+            call_id=job["call_id"],
+            key_id=key_id,
+            workers=threads,
+            format_version=job["format_version"],
+        )
+        shutil.rmtree(final, ignore_errors=True)
+        partial.rename(final)  # solo aparece <id>/ si el paquete está completo
+        result.update(ok=True, output_dir=str(final))
+    except Exception as e:
+        shutil.rmtree(partial, ignore_errors=True)
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - t0, 3)
+    return result
+
+
+# ---- Lado principal ----
+
+def _mb(n: int) -> float:
+    return n / (1024 * 1024)
+
+
+def run_batch(manifest: Dict[str, Any], jobs: int, threads: Optional[int], skip_existing: bool = False,
+              out=sys.stdout) -> Dict[str, Any]:
+    out_root = Path(manifest["output_dir"])
+    out_root.mkdir(parents=True, exist_ok=True)
+    pending, results = [], []
+    for job in manifest["jobs"]:
+        if skip_existing and (out_root / job["id"] / "meta.json").exists():
+            results.append({"id": job["id"], "ok": True, "skipped": True, "bytes": 0, "seconds": 0})
+        else:
+            pending.append(job)
+
+    total = len(manifest["jobs"])
+    done = total - len(pending)
+    if done:
+        print(f"{done} trabajos ya sellados, se omiten", file=out, flush=True)
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_seal_job, job, str(out_root), threads): job for job in pending}
+        for fut in as_completed(futures):
+            try:
+                res = fut.result()
+            except Exception as e:  # el worker murió (p. ej. sin memoria): falla solo este trabajo
+                res = {"id": futures[fut]["id"], "ok": False, "bytes": 0, "seconds": 0,
+                       "error": f"{type(e).__name__}: {e}"}
+            results.append(res)
+            done += 1
+            elapsed = time.perf_counter() - t0
+            eta = elapsed / (done - (total - len(pending))) * (total - done)
+            status = "ok " if res["ok"] else "ERR"
+            line = f"[{done}/{total}] {status} {res['id']}  {_mb(res['bytes']):.1f} MB  {res['seconds']:.1f} s"
+            if not res["ok"]:
+                line += f"  {res['error']}"
+            print(f"{line}  (ETA {eta:.0f} s)", file=out, flush=True)
+    elapsed = time.perf_counter() - t0
+
+    sealed = [r for r in results if r["ok"] and not r.get("skipped")]
+    failed = [r for r in results if not r["ok"]]
+    in_bytes = sum(r["bytes"] for r in sealed)
+    summary = {
+        "jobs": total,
+        "sealed": len(sealed),
+        "skipped": len(results) - len(sealed) - len(failed),
+        "failed": len(failed),
+        "seconds": round(elapsed, 3),
+        "input_mb": round(_mb(in_bytes), 1),
+        "mb_per_s": round(_mb(in_bytes) / elapsed, 1) if elapsed else 0.0,
+        "packages_per_min": round(len(sealed) / elapsed * 60, 1) if elapsed else 0.0,
+        "workers": jobs,
+    }
+    order = {job["id"]: i for i, job in enumerate(manifest["jobs"])}
+    report = {"summary": summary, "results": sorted(results, key=lambda r: order[r["id"]])}
+    (out_root / "batch_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(f"\n{summary['sealed']} sellados, {summary['skipped']} omitidos, {summary['failed']} con error "
+          f"en {elapsed:.1f} s — {summary['input_mb']:g} MB, {summary['mb_per_s']:g} MB/s, "
+          f"{summary['packages_per_min']:g} paquetes/min ({jobs} procesos)", file=out)
+    for r in failed:
+        print(f"  ✗ {r['id']}: {r['error']}", file=out)
+    print(f"Informe: {out_root / 'batch_report.json'}", file=out)
+    return report
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Sella en paralelo los paquetes de un manifiesto JSON.")
+    ap.add_argument("manifest", type=Path)
+    ap.add_argument("-j", "--jobs", type=int, default=0, help="paquetes a la vez (por defecto, uno por CPU)")
+    ap.add_argument("--threads", type=int, default=0,
+                    help="hilos de compresión/hash por paquete (por defecto, CPUs / jobs)")
+    ap.add_argument("-o", "--output-dir", type=Path, help="sustituye el output_dir del manifiesto")
+    ap.add_argument("--skip-existing", action="store_true", help="omite trabajos cuya carpeta ya tiene meta.json")
+    a = ap.parse_args(argv)
+
+    try:
+        manifest = load_manifest(a.manifest)
+    except ManifestError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    if a.output_dir:
+        manifest["output_dir"] = a.output_dir
+    cpus = os.cpu_count() or 1
+    jobs = min(a.jobs or cpus, len(manifest["jobs"]))
+    threads = a.threads or max(1, cpus // jobs)
+    report = run_batch(manifest, jobs, threads, a.skip_existing)
+    return 1 if report["summary"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# bench_compress.py
+# Compara tiempo total y tamaño de salida de run_encrypt_and_sign con la política
+# clásica (DEFLATE 9 en los tres ZIP) frente a la política adaptativa y otros codecs.
+#
+# Uso (desde clidesk/):
+#   python -m bench.bench_compress          # ~200 MB de entradas mixtas
+#   python -m bench.bench_compress 50       # MB aproximados de entrada
+import os
+import sys
+import time
+import random
+import tempfile
+import zipfile
+from pathlib import Path
+
+from crypto_ops import CHUNK, CompressionPolicy, LEGACY_COMPRESSION, run_encrypt_and_sign
+from bench.bench_seal import _keys
+
+POLICIES = [
+    ("clásica (deflate 9)", LEGACY_COMPRESSION),
+    ("adaptativa deflate 9", CompressionPolicy()),
+    ("adaptativa deflate 6", CompressionPolicy(level=6)),
+    ("adaptativa bzip2", CompressionPolicy(codec="bzip2")),
+    ("adaptativa lzma", CompressionPolicy(codec="lzma")),
+]
+
+
+def _make_inputs(d: Path, total_mb: int):
+    """Mitad texto (comprimible), un cuarto binario aleatorio (fotos/escaneos), un cuarto ZIP ya comprimido."""
+    rnd = random.Random(42)
+    words = [bytes(rnd.choices(b"abcdefghijklmnopqrstuvwxyz", k=rnd.randint(2, 10))) for _ in range(5000)]
+    files = []
+    for i in range(max(1, total_mb // 4)):
+        p = d / f"memoria_{i:03d}.txt"
+        p.write_bytes(b" ".join(rnd.choices(words, k=2 * CHUNK // 6))[: 2 * CHUNK])
+        files.append(p)
+    for i in range(max(1, total_mb // 8)):
+        p = d / f"plano_{i:03d}.jpg"
+        p.write_bytes(os.urandom(2 * CHUNK))
+        files.append(p)
+    anexos = d / "anexos.zip"
+    with zipfile.ZipFile(anexos, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        for i in range(max(1, total_mb // 8)):
+            z.writestr(f"scan_{i}.tif", os.urandom(2 * CHUNK))
+    files.append(anexos)
+    return files
+
+
+def main(argv):
+    total_mb = int(argv[0]) if argv else 200
+    rsa_pub, ed_priv = _keys()
+    with tempfile.TemporaryDirectory(prefix="bench_compress_") as d:
+        d = Path(d)
+        files = _make_inputs(d, total_mb)
+        in_mb = sum(p.stat().st_size for p in files) / CHUNK
+        print(f"entrada: {len(files)} archivos, {in_mb:.0f} MB")
+        print(f"{'política':<22} {'seg':>7} {'content.zip':>12} {'sealed.zip':>12}")
+        for label, policy in POLICIES:
+            out = d / "out"
+            t0 = time.perf_counter()
+            run_encrypt_and_sign(
+                input_files=files, rsa_pub_pem=rsa_pub, ed_priv_pem=ed_priv, output_dir=out,
+                bidder={"name": "bench", "identifier": "0"}, call_id="BENCH", key_id="bench",
+                compression=policy, format_version=1,  # compara el tamaño de content.zip
+            )
+            elapsed = time.perf_counter() - t0
+            content_mb = (out / "content.zip").stat().st_size / CHUNK
+            sealed_mb = (out / "sealed.zip").stat().st_size / CHUNK
+            print(f"{label:<22} {elapsed:>7.2f} {content_mb:>9.1f} MB {sealed_mb:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
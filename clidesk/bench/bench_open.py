@@ -0,0 +1,71 @@
+# bench_open.py
+# Abrir un solo documento de una propuesta grande: formato v1 (un único AES-GCM sobre
+# sealed_base.zip, hay que descifrar todo y abrir dos ZIP anidados) frente a v2
+# (trozos autenticados + índice: solo se descifran los trozos del archivo pedido).
+#
+# Uso (desde clidesk/):
+#   python -m bench.bench_open                  # propuesta de 500 MB + un PDF de 200 KB
+#   python -m bench.bench_open 2048 1           # MB de relleno, MB del documento
+#
+# Mide por formato: sellado, listar entradas y listar + extraer el documento (incluye
+# el unwrap RSA, igual en ambos).
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+from crypto_ops import CHUNK, open_sealed, run_encrypt_and_sign
+
+
+def _write_random(path: Path, size: int):
+    with open(path, "wb") as f:
+        while size > 0:
+            n = min(size, CHUNK)
+            f.write(os.urandom(n))
+            size -= n
+
+
+def main(argv):
+    filler_mb = float(argv[0]) if argv else 500
+    doc_mb = float(argv[1]) if len(argv) > 1 else 0.2
+    rsa_priv = rsa.generate_private_key(public_exponent=65537, key_size=3072)
+    rsa_pub_pem = rsa_priv.public_key().public_bytes(serialization.Encoding.PEM,
+                                                     serialization.PublicFormat.SubjectPublicKeyInfo)
+    rsa_priv_pem = rsa_priv.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                          serialization.NoEncryption())
+    ed_priv_pem = ed25519.Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+
+    with tempfile.TemporaryDirectory(prefix="bench_open-") as tmp:
+        d = Path(tmp)
+        filler, doc = d / "anexos.bin", d / "oferta.pdf"
+        _write_random(filler, int(filler_mb * CHUNK))
+        _write_random(doc, int(doc_mb * CHUNK))
+
+        print(f"relleno {filler_mb:g} MB + oferta.pdf {doc_mb:g} MB")
+        print(f"{'formato':<9}{'sellar s':>10}{'listar ms':>11}{'abrir 1 ms':>12}")
+        for fmt in (1, 2):
+            out = d / f"v{fmt}"
+            t0 = time.perf_counter()
+            run_encrypt_and_sign([filler, doc], rsa_pub_pem, ed_priv_pem, out, {"name": "bench"},
+                                 "bench", "bench", format_version=fmt)
+            seal = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with open_sealed(out, rsa_priv_pem) as pkg:
+                pkg.entries()
+            list_ms = (time.perf_counter() - t0) * 1e3
+
+            t0 = time.perf_counter()
+            with open_sealed(out, rsa_priv_pem) as pkg:
+                pkg.extract("oferta.pdf", d / f"oferta_v{fmt}.pdf")
+            open_ms = (time.perf_counter() - t0) * 1e3
+            print(f"v{fmt:<8}{seal:>10.2f}{list_ms:>11.1f}{open_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,66 @@
+# bench_pack.py
+# Escalado de write_content_zip (hash + compresión de content.zip) según el número de hilos.
+#
+# Uso (desde clidesk/):
+#   python -m bench.bench_pack                     # 64 archivos de 8 MB, hilos 1..nCPU
+#   python -m bench.bench_pack 200 2 1,2,4,8       # <archivos> <MB por archivo> <hilos>
+import os
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+from crypto_ops import CHUNK, HashingWriter, write_content_zip
+
+
+def _make_files(d: Path, n_files: int, size_mb: int):
+    # Mezcla de texto repetitivo y bloques aleatorios: comprime ~2-3x, como PDFs/CAD típicos.
+    rnd = random.Random(1234)
+    words = [bytes(rnd.choices(b"abcdefghijklmnopqrstuvwxyz ", k=rnd.randint(3, 12))) for _ in range(2000)]
+    files = []
+    for i in range(n_files):
+        p = d / f"doc_{i:04d}.bin"
+        with open(p, "wb") as f:
+            for _ in range(size_mb):
+                half = b" ".join(rnd.choices(words, k=CHUNK // 16))[: CHUNK // 2]
+                f.write(half + os.urandom(CHUNK - len(half)))
+        files.append(p)
+    return files
+
+
+def _worker_counts(arg: str = ""):
+    if arg:
+        return [int(x) for x in arg.split(",")]
+    n, counts = os.cpu_count() or 1, []
+    w = 1
+    while w < n:
+        counts.append(w)
+        w *= 2
+    return counts + [n]
+
+
+def main(argv):
+    n_files = int(argv[0]) if len(argv) > 0 else 64
+    size_mb = int(argv[1]) if len(argv) > 1 else 8
+    counts = _worker_counts(argv[2] if len(argv) > 2 else "")
+    total_mb = n_files * size_mb
+
+    with tempfile.TemporaryDirectory(prefix="bench_pack_") as d:
+        d = Path(d)
+        files = _make_files(d, n_files, size_mb)
+        print(f"{n_files} archivos x {size_mb} MB = {total_mb} MB, CPUs: {os.cpu_count()}")
+        print(f"{'hilos':>6} {'seg':>8} {'MB/s':>8} {'speedup':>8}")
+        base = None
+        for w in counts:
+            out = d / "content.zip"
+            t0 = time.perf_counter()
+            with open(out, "wb") as f:
+                write_content_zip(files, HashingWriter(f), workers=w, tmp_dir=d)
+            elapsed = time.perf_counter() - t0
+            base = base or elapsed
+            print(f"{w:>6} {elapsed:>8.2f} {total_mb / elapsed:>8.1f} {base / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,124 @@
+# bench_seal.py
+# Mide MB/s y memoria pico de run_encrypt_and_sign para entradas grandes.
+#
+# Uso (desde clidesk/):
+#   python -m bench.bench_seal                 # 100 MB, 1 GB y 5 GB
+#   python -m bench.bench_seal 100 500         # tamaños en MB
+#
+# Cada tamaño corre en un subproceso propio para que ru_maxrss refleje solo esa corrida.
+# Ademas se muestrea RssAnon (heap + buffers anonimos): ru_maxrss incluye las paginas
+# del content.zip mapeado para la firma Ed25519 (formato v1), que son cache del SO y reclamables.
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+from crypto_ops import CHUNK, run_encrypt_and_sign
+
+DEFAULT_SIZES_MB = [100, 1024, 5 * 1024]
+
+
+def _make_input(path: Path, size_mb: int):
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(CHUNK))
+
+
+def _keys():
+    rsa_pub = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    ed_priv = ed25519.Ed25519PrivateKey.generate().private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    return rsa_pub, ed_priv
+
+
+def _rss_anon_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class _AnonSampler(threading.Thread):
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.is_set():
+            self.peak_kb = max(self.peak_kb, _rss_anon_kb())
+            self._stop_evt.wait(self.interval)
+
+    def stop(self) -> int:
+        self._stop_evt.set()
+        self.join()
+        return self.peak_kb
+
+
+def run_one(size_mb: int, workdir: Path) -> dict:
+    src = workdir / f"input_{size_mb}MB.bin"
+    _make_input(src, size_mb)
+    rsa_pub, ed_priv = _keys()
+
+    sampler = _AnonSampler()
+    sampler.start()
+    t0 = time.perf_counter()
+    run_encrypt_and_sign(
+        input_files=[src],
+        rsa_pub_pem=rsa_pub,
+        ed_priv_pem=ed_priv,
+        output_dir=workdir / "out",
+        bidder={"name": "bench", "identifier": "0"},
+        call_id="BENCH",
+        key_id="bench",
+    )
+    elapsed = time.perf_counter() - t0
+    anon_kb = sampler.stop()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB en Linux
+    return {
+        "size_mb": size_mb,
+        "seconds": round(elapsed, 2),
+        "mb_s": round(size_mb / elapsed, 1),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "peak_anon_mb": round(anon_kb / 1024, 1),
+    }
+
+
+def main(argv):
+    if argv and argv[0] == "--one":
+        print(json.dumps(run_one(int(argv[1]), Path(argv[2]))))
+        return
+
+    sizes = [int(a) for a in argv] or DEFAULT_SIZES_MB
+    print(f"{'tamaño':>10} {'seg':>8} {'MB/s':>8} {'RSS pico':>10} {'anon pico':>10}")
+    for size_mb in sizes:
+        with tempfile.TemporaryDirectory(prefix="bench_seal_") as d:
+            out = subprocess.run(
+                [sys.executable, "-m", "bench.bench_seal", "--one", str(size_mb), d],
+                check=True, capture_output=True, text=True,
+            ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['size_mb']:>7} MB {r['seconds']:>8} {r['mb_s']:>8} {r['peak_rss_mb']:>7} MB {r['peak_anon_mb']:>7} MB")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
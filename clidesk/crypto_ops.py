@@ -1,18 +1,32 @@
 # crypto_ops.py
+import os
+import bz2
 import json
+import math
+import mmap
+import zlib
+import shutil
 import zipfile
 import hashlib
 import secrets
+import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List, Union, Dict, Any
+from typing import Callable, List, Union, Dict, Any, Optional, Tuple
 
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import ed25519, rsa, padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 
+from sbx2 import GCM_TAG, V2_CHUNK, ChunkedAeadReader, ChunkedAeadWriter, is_chunked
+
 CHUNK = 1024 * 1024
+SPOOL_MAX = 8 * CHUNK  # entradas comprimidas más grandes se vuelcan a un temporal en disco
 
 
 def sha256_file(path: Path) -> str:
@@ -26,14 +40,489 @@ def sha256_file(path: Path) -> str:
     return h.hexdigest()
 
 
-def build_manifest(files: List[Path]) -> Dict[str, Any]:
+def sign_file(priv: ed25519.Ed25519PrivateKey, path: Path) -> bytes:
+    # Ed25519 puro necesita el mensaje completo: se mapea el archivo en vez de
+    # copiarlo al heap, asi el SO pagina el contenido bajo demanda.
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return priv.sign(m)
+
+
+class HashingWriter:
+    """
+    Escritor "tee": reenvia cada bloque a todos los `sinks` y calcula su SHA-256
+    al vuelo, para no releer del disco lo que se acaba de escribir.
+    No implementa seek(): zipfile lo detecta y usa data descriptors.
+    """
+
+    def __init__(self, *sinks):
+        self._sinks = sinks
+        self._h = hashlib.sha256()
+        self._pos = 0
+
+    def write(self, b) -> int:
+        self._h.update(b)
+        for s in self._sinks:
+            s.write(b)
+        n = len(b)
+        self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        for s in self._sinks:
+            s.flush()
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+class Cancelled(Exception):
+    """El usuario canceló el empaquetado (ver Progress)."""
+
+
+class Progress:
+    """
+    Avance en bytes del empaquetado. `advance(n)` lo llaman los hilos que leen/cifran;
+    llama a `callback(hecho, total)` (desde ESOS hilos: la UI debe pasarlo a su hilo) y
+    lanza Cancelled en cuanto `cancel()` devuelve True, así que se corta en un bloque.
+    """
+
+    def __init__(self, total: int, callback: Optional[Callable[[int, int], None]] = None,
+                 cancel: Optional[Callable[[], bool]] = None):
+        self.total = total
+        self.done = 0
+        self._callback = callback
+        self._cancel = cancel
+        self._lock = threading.Lock()
+
+    def advance(self, n: int = 0):
+        with self._lock:
+            self.done += n
+            done, total = self.done, self.total
+        if self._cancel is not None and self._cancel():
+            raise Cancelled()
+        if self._callback is not None and n:
+            self._callback(done, total)
+
+
+class ProgressWriter:
+    """Reenvía las escrituras a `fp` contándolas en `progress`."""
+
+    def __init__(self, fp, progress: Progress):
+        self._fp = fp
+        self._progress = progress
+
+    def write(self, b) -> int:
+        n = self._fp.write(b)
+        self._progress.advance(len(b))
+        return n
+
+    def tell(self) -> int:
+        return self._fp.tell()
+
+    def flush(self):
+        self._fp.flush()
+
+
+class AesGcmWriter:
+    """
+    Objeto tipo archivo que cifra con AES-256-GCM todo lo que se le escribe y
+    vuelca el ciphertext en `fp` a medida que llega (memoria acotada a un bloque).
+    El tag queda disponible en `.tag` tras `close()`.
+    """
+
+    def __init__(self, fp, key: bytes, nonce: bytes):
+        self._fp = fp
+        self._enc = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend()).encryptor()
+        self._pos = 0
+        self.tag: Optional[bytes] = None
+
+    def write(self, b) -> int:
+        self._fp.write(self._enc.update(b))
+        n = len(b)
+        self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        self._fp.flush()
+
+    def close(self):
+        if self.tag is None:
+            self._fp.write(self._enc.finalize())
+            self.tag = self._enc.tag  # 16B
+
+
+def aes_gcm_encrypt_file(src: Path, dst: Path, key: bytes, nonce: bytes) -> bytes:
+    """Cifra `src` en `dst` por bloques de CHUNK bytes. Devuelve el tag GCM."""
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        w = AesGcmWriter(fout, key, nonce)
+        shutil.copyfileobj(fin, w, CHUNK)
+        w.close()
+    return w.tag
+
+
+def unwrap_key(rsa_priv_pem: bytes, wrapped: bytes, password: Optional[bytes] = None) -> bytes:
+    priv = serialization.load_pem_private_key(rsa_priv_pem, password=password)
+    if not isinstance(priv, rsa.RSAPrivateKey):
+        raise ValueError("La clave privada NO es RSA.")
+    return priv.decrypt(wrapped, padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()),
+                                              algorithm=hashes.SHA256(), label=None))
+
+
+class SealedPackage:
+    """
+    Lectura de un payload.enc (v1 o v2) con la clave AES ya desenvuelta: `entries()` lista
+    los archivos de la propuesta más manifest.json y signature.bin, y `open(name)` da el
+    contenido de uno por bloques.
+
+    v2 descifra solo los trozos de lo que se pide. v1 es un único GCM sin acceso
+    aleatorio: al abrir el paquete se descifra y autentica entero a un temporal (hacen
+    falta `nonce` y `tag`) y luego se leen los ZIP anidados.
+    """
+
+    def __init__(self, fp, key: bytes, nonce: Optional[bytes] = None, tag: Optional[bytes] = None,
+                 tmp_dir: Optional[Path] = None, close_fp: bool = False):
+        self._fp = fp if close_fp else None
+        self.format = 2 if is_chunked(fp) else 1
+        if self.format == 2:
+            self._v2 = ChunkedAeadReader(fp, key)
+            return
+        if nonce is None or tag is None:
+            raise ValueError("Un paquete v1 necesita nonce y tag")
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX, dir=tmp_dir)
+        try:
+            dec = Cipher(algorithms.AES(key), modes.GCM(nonce, tag), backend=default_backend()).decryptor()
+            fp.seek(0)
+            while True:
+                b = fp.read(CHUNK)
+                if not b:
+                    break
+                self._spool.write(dec.update(b))
+            self._spool.write(dec.finalize())  # verifica el tag
+            self._outer = zipfile.ZipFile(self._spool)
+            self._content = zipfile.ZipFile(self._outer.open("content.zip"))
+            manifest = json.loads(self._outer.read("manifest.json"))
+            self._sha = {f["path"]: f["sha256"] for f in manifest.get("files", [])}
+        except BaseException:
+            self._spool.close()
+            raise
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """[{name, size, sha256}] en el orden del paquete."""
+        if self.format == 2:
+            return [{"name": e["name"], "size": e["file_size"], "sha256": e["sha256"]} for e in self._v2.entries]
+        out = [{"name": i.filename, "size": i.file_size, "sha256": self._sha.get(i.filename)}
+               for i in self._content.infolist()]
+        out += [{"name": i.filename, "size": i.file_size, "sha256": None}
+                for i in self._outer.infolist() if i.filename != "content.zip"]
+        return out
+
+    def open(self, name: str):
+        if self.format == 2:
+            yield from self._v2.open_entry(name)
+            return
+        z = self._content if name in self._content.NameToInfo else self._outer
+        if name == "content.zip" or name not in z.NameToInfo:
+            raise KeyError(f"No existe la entrada: {name}")
+        with z.open(name) as f:
+            while True:
+                b = f.read(CHUNK)
+                if not b:
+                    break
+                yield b
+
+    def extract(self, name: str, dest: Union[str, Path]) -> int:
+        """Escribe `name` en `dest` (vía .part, renombrado al terminar). Devuelve los bytes."""
+        dest = Path(dest)
+        part = dest.with_name(dest.name + ".part")
+        n = 0
+        try:
+            with open(part, "wb") as f:
+                for b in self.open(name):
+                    f.write(b)
+                    n += len(b)
+            os.replace(part, dest)
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        return n
+
+    def close(self):
+        if self.format == 1:
+            self._content.close()
+            self._outer.close()
+            self._spool.close()
+        if self._fp is not None:
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_sealed(output_dir: Union[str, Path], rsa_priv_pem: bytes, password: Optional[bytes] = None) -> SealedPackage:
+    """
+    Abre el paquete que dejó run_encrypt_and_sign en `output_dir` (payload.enc,
+    wrapped_key.bin, nonce.bin, tag.bin) con la clave privada RSA del convocante.
+    """
+    d = Path(output_dir)
+    key = unwrap_key(rsa_priv_pem, (d / "wrapped_key.bin").read_bytes(), password)
+    fp = open(d / "payload.enc", "rb")
+    try:
+        return SealedPackage(fp, key, (d / "nonce.bin").read_bytes(), (d / "tag.bin").read_bytes(),
+                             tmp_dir=d, close_fp=True)
+    except BaseException:
+        fp.close()
+        raise
+
+
+def build_manifest(files: List[Path], digests: Optional[Dict[Path, str]] = None) -> Dict[str, Any]:
+    digests = digests or {}
     return {
         "version": 1,
-        "files": [{"path": p.name, "sha256": sha256_file(p)} for p in files],
+        "files": [{"path": p.name, "sha256": digests.get(p) or sha256_file(p)} for p in files],
         "created_at": datetime.utcnow().isoformat() + "Z",
     }
 
 
+CODECS = {
+    "store": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+CODEC_NAMES = {v: k for k, v in CODECS.items()}
+
+# Formatos que ya llegan comprimidos (o cifrados): recomprimirlos solo gasta CPU.
+INCOMPRESSIBLE_EXT = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst", ".lz4",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".aac", ".ogg", ".mp4", ".m4v", ".mov", ".avi", ".mkv", ".webm",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub", ".jar",
+    ".enc", ".gpg", ".p7m",
+}
+
+
+def byte_entropy(sample: bytes) -> float:
+    """Entropía de Shannon en bits por byte (8.0 = indistinguible de aleatorio)."""
+    if not sample:
+        return 0.0
+    n = len(sample)
+    return -sum(c / n * math.log2(c / n) for c in Counter(sample).values())
+
+
+@dataclass
+class CompressionPolicy:
+    """
+    Decide, entrada por entrada, cómo se comprime dentro de los ZIP del paquete.
+    - codec/level: lo que se usa para contenido comprimible ("store", "deflate", "bzip2", "lzma").
+    - detect: si es False, todo va con codec/level (equivale al empaquetado clásico DEFLATE 9).
+    - Con detect=True se guarda sin comprimir (STORED) lo que es muy pequeño, tiene una
+      extensión ya comprimida o cuya muestra supera `entropy_threshold` bits/byte.
+    """
+    codec: str = "deflate"
+    level: Optional[int] = 9
+    detect: bool = True
+    entropy_threshold: float = 7.5
+    sample_size: int = 64 * 1024
+    min_size: int = 512
+
+    def __post_init__(self):
+        if self.codec not in CODECS:
+            raise ValueError(f"Codec desconocido: {self.codec} (usa {', '.join(CODECS)})")
+
+    def choose(self, name: str, sample: bytes = b"", size: Optional[int] = None) -> Tuple[int, Optional[int]]:
+        """Devuelve (compress_type, compresslevel) para una entrada."""
+        stored = (zipfile.ZIP_STORED, None)
+        if self.detect:
+            if size is not None and size < self.min_size:
+                return stored
+            if Path(name).suffix.lower() in INCOMPRESSIBLE_EXT:
+                return stored
+            if len(sample) >= self.min_size and byte_entropy(sample) >= self.entropy_threshold:
+                return stored
+        ctype = CODECS[self.codec]
+        return ctype, (None if ctype == zipfile.ZIP_STORED else self.level)
+
+    def choose_for_file(self, path: Path) -> Tuple[int, Optional[int]]:
+        size = path.stat().st_size
+        sample = b""
+        if self.detect and size >= self.min_size:
+            # Tres trozos (inicio, mitad, final): las cabeceras suelen engañar a la estimación.
+            part = max(1, self.sample_size // 3)
+            with open(path, 'rb') as f:
+                chunks = []
+                for off in (0, max(0, size // 2 - part // 2), max(0, size - part)):
+                    f.seek(off)
+                    chunks.append(f.read(part))
+            sample = b"".join(chunks)
+        return self.choose(path.name, sample, size)
+
+
+LEGACY_COMPRESSION = CompressionPolicy(detect=False)
+
+
+def _write_entry(z: zipfile.ZipFile, policy: CompressionPolicy, arcname: str, data: Union[bytes, Path]):
+    if isinstance(data, Path):
+        ctype, level = policy.choose_for_file(data)
+        z.write(data, arcname=arcname, compress_type=ctype, compresslevel=level)
+    else:
+        ctype, level = policy.choose(arcname, data[:policy.sample_size], len(data))
+        z.writestr(arcname, data, compress_type=ctype, compresslevel=level)
+
+
+def _compressor(compress_type: int, level: Optional[int]):
+    if compress_type == zipfile.ZIP_STORED:
+        return None
+    if compress_type == zipfile.ZIP_DEFLATED:
+        return zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15)
+    if compress_type == zipfile.ZIP_BZIP2:
+        return bz2.BZ2Compressor(9 if level is None else level)
+    if compress_type == zipfile.ZIP_LZMA:
+        return zipfile.LZMACompressor()
+    raise ValueError(f"Compresión no soportada: {compress_type}")
+
+
+def _pack_entry(path: Path, arcname: str, policy: CompressionPolicy, tmp_dir: Path,
+                progress: Optional[Progress] = None):
+    """
+    Comprime (según `policy`) y hashea un archivo en una sola lectura (corre en un hilo del pool).
+    Devuelve (ZipInfo completo, datos comprimidos rebobinados, sha256 del original).
+    """
+    zinfo = zipfile.ZipInfo.from_file(path, arcname=arcname)
+    compress_type, level = policy.choose_for_file(path)
+    zinfo.compress_type = compress_type
+    comp = _compressor(compress_type, level)
+    h = hashlib.sha256()
+    crc = size = 0
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX, dir=tmp_dir)
+    try:
+        with open(path, 'rb') as src:
+            while True:
+                b = src.read(CHUNK)
+                if not b:
+                    break
+                h.update(b)
+                crc = zlib.crc32(b, crc)
+                size += len(b)
+                out.write(comp.compress(b) if comp else b)
+                if progress is not None:
+                    progress.advance(len(b))
+        if comp:
+            out.write(comp.flush())
+        zinfo.file_size = size
+        zinfo.compress_size = out.tell()
+        zinfo.CRC = crc
+        out.seek(0)
+    except BaseException:
+        out.close()
+        raise
+    return zinfo, out, h.hexdigest()
+
+
+def _append_packed(z: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data) -> None:
+    # Entrada ya comprimida: cabecera local + datos; ZipFile escribe el directorio central al cerrar.
+    zinfo.header_offset = z.fp.tell()
+    z.fp.write(zinfo.FileHeader())
+    shutil.copyfileobj(data, z.fp, CHUNK)
+    z.filelist.append(zinfo)
+    z.NameToInfo[zinfo.filename] = zinfo
+    z.start_dir = z.fp.tell()
+
+
+def _pack_in_order(files: List[Path], workers: Optional[int], policy: CompressionPolicy,
+                   tmp_dir: Optional[Path], sink, progress: Optional[Progress] = None) -> Dict[Path, str]:
+    """
+    Comprime y hashea `files` en paralelo (`workers` hilos; zlib/bz2/lzma y hashlib
+    liberan el GIL) y entrega cada resultado a `sink(zinfo, data)` siempre en el orden
+    de `files`, así que la salida es determinista sin importar qué hilo termine primero.
+    Devuelve {ruta: sha256} para el manifest.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    digests: Dict[Path, str] = {}
+    pending = deque()
+
+    def drain_one():
+        p, fut = pending.popleft()
+        zinfo, data, digest = fut.result()
+        with data:
+            sink(zinfo, data, digest)
+        digests[p] = digest
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for p in files:
+                pending.append((p, pool.submit(_pack_entry, p, p.name, policy, tmp_dir, progress)))
+                # Ventana acotada: como mucho 2 entradas comprimidas por hilo esperando turno.
+                if len(pending) >= 2 * workers:
+                    drain_one()
+            while pending:
+                drain_one()
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+                if not fut.cancelled() and fut.exception() is None:
+                    fut.result()[1].close()
+    return digests
+
+
+def write_content_zip(
+    files: List[Path],
+    fp,
+    workers: Optional[int] = None,
+    policy: Optional[CompressionPolicy] = None,
+    tmp_dir: Optional[Path] = None,
+    progress: Optional[Progress] = None,
+) -> Dict[Path, str]:
+    """
+    Escribe en `fp` un ZIP con `files`, comprimiendo y hasheando en paralelo
+    (ver _pack_in_order). Devuelve {ruta: sha256} para el manifest.
+    """
+    policy = policy or CompressionPolicy()
+    with zipfile.ZipFile(fp, "w") as z:
+        return _pack_in_order(files, workers, policy, tmp_dir,
+                              lambda zinfo, data, digest: _append_packed(z, zinfo, data), progress)
+
+
+def write_v2_entries(
+    files: List[Path],
+    w: ChunkedAeadWriter,
+    workers: Optional[int] = None,
+    policy: Optional[CompressionPolicy] = None,
+    tmp_dir: Optional[Path] = None,
+    progress: Optional[Progress] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[Path, str]]:
+    """
+    Escribe `files` en el contenedor v2 `w`, uno tras otro (compresión y hash en paralelo
+    como en write_content_zip). Devuelve (entradas del índice, {ruta: sha256}).
+    """
+    policy = policy or CompressionPolicy()
+    entries: List[Dict[str, Any]] = []
+
+    def sink(zinfo, data, digest):
+        offset = w.tell()
+        shutil.copyfileobj(data, w, CHUNK)
+        entries.append({"name": zinfo.filename, "offset": offset, "size": zinfo.compress_size,
+                        "file_size": zinfo.file_size, "compression": CODEC_NAMES[zinfo.compress_type],
+                        "sha256": digest})
+
+    digests = _pack_in_order(files, workers, policy, tmp_dir, sink, progress)
+    return entries, digests
+
+
+def _v2_add_bytes(w: ChunkedAeadWriter, entries: List[Dict[str, Any]], name: str, data: bytes):
+    entries.append({"name": name, "offset": w.tell(), "size": len(data), "file_size": len(data),
+                    "compression": "store", "sha256": hashlib.sha256(data).hexdigest()})
+    w.write(data)
+
+
 def run_encrypt_and_sign(
     input_files: List[Union[str, Path]],
     rsa_pub_pem: bytes,
@@ -42,74 +531,127 @@ def run_encrypt_and_sign(
     bidder: Dict[str, str],
     call_id: str,
     key_id: str,
+    workers: Optional[int] = None,
+    compression: Optional[CompressionPolicy] = None,
+    format_version: int = 1,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[Callable[[], bool]] = None,
 ) -> Dict[str, Any]:
     """
     Produce EXACTAMENTE estas salidas (que el convocante espera):
       - meta.json
-      - payload.enc    (ciphertext AES-256-GCM, SIN tag)
+      - payload.enc    (v1: ciphertext AES-256-GCM SIN tag; v2: contenedor por trozos)
       - wrapped_key.bin
-      - nonce.bin      (12 bytes)
-      - tag.bin        (16 bytes)
+      - nonce.bin      (v1: 12 bytes; v2: los 8 bytes de prefijo, también en la cabecera)
+      - tag.bin        (16 bytes; v2: tag del último trozo)
       - sealed.zip     (opcional: paquete contenedor de las 5 piezas anteriores)
 
-    El plaintext cifrado (AES-GCM) es un ZIP ("sealed_base.zip") con:
+    v1 (por defecto): el plaintext cifrado (AES-GCM) es un ZIP ("sealed_base.zip") con:
       - content.zip
       - manifest.json
       - signature.bin   (firma Ed25519 sobre content.zip)
+    v2 (`format_version=2`, opcional hasta que los consumidores lo acepten): contenedor por trozos (ver ChunkedAeadWriter) con una entrada por
+    archivo más manifest.json y signature.bin (firma Ed25519 sobre manifest.json, que
+    lista el SHA-256 de cada archivo). Un archivo se lee sin descifrar el resto.
+
+    `workers` fija los hilos que comprimen/hashean los archivos (por defecto, uno por CPU).
+    `compression` decide cómo se comprime cada entrada; por defecto guarda sin
+    recomprimir lo ya comprimido, el ciphertext y los binarios aleatorios
+    (LEGACY_COMPRESSION reproduce el DEFLATE 9 para todo).
+    Todos los SHA-256 (manifest y meta) se calculan mientras se escriben los
+    bytes; el plaintext nunca toca el disco: se cifra a medida que se genera.
+
+    `progress(hecho, total)` recibe el avance en bytes (se llama desde hilos de trabajo) y
+    `cancel()` se consulta en cada bloque: si devuelve True se lanza Cancelled. El paquete
+    se escribe en una subcarpeta temporal de `output_dir` y solo sustituye al que hubiera
+    cuando está completo; ante un error o una cancelación se borra esa subcarpeta (y
+    `output_dir` si lo creó esta llamada).
     """
+    if format_version not in (1, 2):
+        raise ValueError(f"Formato desconocido: {format_version} (usa 1 o 2)")
     output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # --- 1) content.zip con los archivos de entrada ---
     files = [Path(p) for p in input_files]
     for p in files:
         if not p.exists():
             raise FileNotFoundError(f"Archivo no encontrado: {p}")
 
-    content_zip = output_dir / "content.zip"
-    with zipfile.ZipFile(content_zip, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as z:
-        for p in files:
-            z.write(p, arcname=p.name)
+    created_dir = not output_dir.exists()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Se sella en una subcarpeta temporal y las salidas se mueven al final: un fallo o una
+    # cancelación no toca el paquete que ya hubiera en output_dir.
+    work = Path(tempfile.mkdtemp(prefix=".partial-", dir=output_dir))
+    try:
+        result = _seal(files, rsa_pub_pem, ed_priv_pem, work, bidder, call_id, key_id, workers,
+                       compression or CompressionPolicy(), format_version, progress, cancel)
+        # meta.json sale el primero y vuelve el último: sin él el paquete no cuenta como
+        # completo (batch.py --skip-existing), y no quedan restos del paquete anterior
+        (output_dir / "meta.json").unlink(missing_ok=True)
+        for name in SEAL_OUTPUTS:
+            if name == "meta.json":
+                continue
+            if (work / name).exists():
+                os.replace(work / name, output_dir / name)
+            else:
+                (output_dir / name).unlink(missing_ok=True)
+        os.replace(work / "meta.json", output_dir / "meta.json")
+    except BaseException:
+        shutil.rmtree(output_dir if created_dir else work, ignore_errors=True)
+        raise
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    result["output_dir"] = str(output_dir)
+    return result
 
-    # --- 2) manifest.json con hashes SHA-256 ---
-    manifest = build_manifest(files)
-    manifest_path = output_dir / "manifest.json"
-    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
 
-    # --- 3) Firma Ed25519 sobre content.zip ---
+SEAL_OUTPUTS = ("meta.json", "payload.enc", "wrapped_key.bin", "nonce.bin", "tag.bin", "sealed.zip",
+                "manifest.json", "signature.bin", "content.zip")
+
+
+def _seal(files: List[Path], rsa_pub_pem: bytes, ed_priv_pem: bytes, output_dir: Path,
+          bidder: Dict[str, str], call_id: str, key_id: str, workers: Optional[int],
+          policy: CompressionPolicy, format_version: int,
+          on_progress: Optional[Callable[[int, int], None]],
+          cancel: Optional[Callable[[], bool]]) -> Dict[str, Any]:
+    in_bytes = sum(p.stat().st_size for p in files)
+    # v1 lee las entradas y luego cifra content.zip: el total se corrige al conocer su tamaño
+    prog = Progress(in_bytes * 2 if format_version == 1 else in_bytes, on_progress, cancel)
+
     priv = serialization.load_pem_private_key(ed_priv_pem, password=None)
     if not isinstance(priv, ed25519.Ed25519PrivateKey):
         raise ValueError("La clave privada NO es Ed25519 (se esperaba Ed25519).")
-    signature = priv.sign(content_zip.read_bytes())
-    (output_dir / "signature.bin").write_bytes(signature)
-
     # Pública Ed25519 (opcional en meta para que el convocante pueda verificar)
     ed_pub_hex = priv.public_key().public_bytes(
         encoding=serialization.Encoding.Raw,
         format=serialization.PublicFormat.Raw
     ).hex()
 
-    # --- 4) sealed_base.zip = ZIP claro con 3 archivos requeridos ---
-    sealed_base = output_dir / "sealed_base.zip"
-    with zipfile.ZipFile(sealed_base, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as z:
-        z.write(content_zip,   arcname="content.zip")
-        z.write(manifest_path, arcname="manifest.json")
-        z.writestr("signature.bin", signature)
+    manifest_path = output_dir / "manifest.json"
+    if format_version == 1:
+        # --- 1) content.zip con los archivos de entrada (compresión y hash en paralelo, misma lectura) ---
+        content_zip = output_dir / "content.zip"
+        with open(content_zip, "wb") as f:
+            content_hw = HashingWriter(f)
+            digests = write_content_zip(files, content_hw, workers=workers, policy=policy, tmp_dir=output_dir,
+                                        progress=prog)
+
+        # --- 2) manifest.json con hashes SHA-256 ---
+        manifest = build_manifest(files, digests)
+        manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        # --- 3) Firma Ed25519 sobre content.zip ---
+        signature = sign_file(priv, content_zip)
+        (output_dir / "signature.bin").write_bytes(signature)
+        payload_estimate = content_zip.stat().st_size + manifest_path.stat().st_size + CHUNK
+        prog.total = in_bytes + content_zip.stat().st_size + manifest_path.stat().st_size + len(signature)
+    else:
+        # el manifest y la firma se generan dentro del contenedor, tras los archivos
+        payload_estimate = sum(p.stat().st_size for p in files) * (1 + GCM_TAG / V2_CHUNK) + CHUNK
 
-    # --- 5) AES-256-GCM: ciphertext SIN tag; tag separado ---
+    # --- 4) Clave AES y envoltura RSA-OAEP-SHA256 ---
+    prog.advance()
     K = secrets.token_bytes(32)          # 32B = AES-256
-    nonce = secrets.token_bytes(12)      # GCM nonce 96 bits
-    cipher = Cipher(algorithms.AES(K), modes.GCM(nonce), backend=default_backend())
-    enc = cipher.encryptor()
-    plaintext = sealed_base.read_bytes()
-    ciphertext = enc.update(plaintext) + enc.finalize()
-    tag = enc.tag  # 16B
-
-    (output_dir / "payload.enc").write_bytes(ciphertext)   # SIN tag
-    (output_dir / "nonce.bin").write_bytes(nonce)
-    (output_dir / "tag.bin").write_bytes(tag)
-
-    # --- 6) Envolver K con RSA-OAEP-SHA256 ---
+    nonce = secrets.token_bytes(12)      # GCM nonce 96 bits (v1)
+
     pub = serialization.load_pem_public_key(rsa_pub_pem)
     if not isinstance(pub, rsa.RSAPublicKey):
         raise ValueError("La clave pública NO es RSA.")
@@ -123,43 +665,76 @@ def run_encrypt_and_sign(
     )
     (output_dir / "wrapped_key.bin").write_bytes(wrapped)
 
-    # --- 7) meta.json con identificadores, algoritmos y hashes ---
-    meta = {
-        "version": 1,
-        "call_id": call_id,
-        "key_id": key_id,
-        "alg": {
-            "aead": "AES-256-GCM",
-            "wrap": "RSA-OAEP-SHA256",
-            "sig": "Ed25519",
-            "hash": "SHA-256"
-        },
-        "bidder": {
-            "name": bidder.get("name", ""),
-            "identifier": bidder.get("identifier", ""),
-            "ed25519_pk_hex": ed_pub_hex,   # opcional pero muy útil
-        },
-        "payload_sha256": sha256_file(output_dir / "payload.enc"),
-        "content_zip_sha256": sha256_file(content_zip),
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-    }
+    # --- 5) plaintext -> AES-256-GCM -> payload.enc + sealed.zip en una sola pasada ---
+    # El ciphertext se escribe a la vez en payload.enc y en la entrada payload.enc de
+    # sealed.zip; meta.json va al final porque depende de su hash.
+    sealed_final = output_dir / "sealed.zip"
+    payload_path = output_dir / "payload.enc"
+    with open(sealed_final, "wb") as sf, open(payload_path, "wb") as pf:
+        sealed_hw = HashingWriter(sf)
+        payload_ctype, payload_level = policy.choose("payload.enc")
+        with zipfile.ZipFile(sealed_hw, "w", compression=payload_ctype, compresslevel=payload_level) as outer:
+            force_zip64 = payload_estimate * 1.05 > zipfile.ZIP64_LIMIT
+            with outer.open("payload.enc", "w", force_zip64=force_zip64) as member:
+                payload_hw = HashingWriter(pf, member)
+                if format_version == 1:
+                    enc = AesGcmWriter(payload_hw, K, nonce)
+                    with zipfile.ZipFile(ProgressWriter(enc, prog), "w") as z:
+                        _write_entry(z, policy, "content.zip",   content_zip)
+                        _write_entry(z, policy, "manifest.json", manifest_path)
+                        _write_entry(z, policy, "signature.bin", signature)
+                    enc.close()
+                    tag = enc.tag
+                else:
+                    enc = ChunkedAeadWriter(payload_hw, K)
+                    entries, digests = write_v2_entries(files, enc, workers=workers, policy=policy,
+                                                        tmp_dir=output_dir, progress=prog)
+                    manifest_bytes = json.dumps(build_manifest(files, digests), indent=2).encode("utf-8")
+                    signature = priv.sign(manifest_bytes)
+                    manifest_path.write_bytes(manifest_bytes)
+                    (output_dir / "signature.bin").write_bytes(signature)
+                    _v2_add_bytes(enc, entries, "manifest.json", manifest_bytes)
+                    _v2_add_bytes(enc, entries, "signature.bin", signature)
+                    enc.close(json.dumps({"version": 2, "entries": entries}).encode("utf-8"))
+                    nonce, tag = enc.nonce_prefix, enc.last_tag
+            (output_dir / "nonce.bin").write_bytes(nonce)
+            (output_dir / "tag.bin").write_bytes(tag)
+
+            _write_entry(outer, policy, "wrapped_key.bin", wrapped)
+            _write_entry(outer, policy, "nonce.bin", nonce)
+            _write_entry(outer, policy, "tag.bin", tag)
+
+            # --- 6) meta.json con identificadores, algoritmos y hashes ---
+            meta = {
+                "version": format_version,
+                "call_id": call_id,
+                "key_id": key_id,
+                "alg": {
+                    "aead": "AES-256-GCM",
+                    "wrap": "RSA-OAEP-SHA256",
+                    "sig": "Ed25519",
+                    "hash": "SHA-256"
+                },
+                "bidder": {
+                    "name": bidder.get("name", ""),
+                    "identifier": bidder.get("identifier", ""),
+                    "ed25519_pk_hex": ed_pub_hex,   # opcional pero muy útil
+                },
+                "payload_sha256": payload_hw.hexdigest(),
+            }
+            if format_version == 1:
+                meta["content_zip_sha256"] = content_hw.hexdigest()
+            else:
+                meta["manifest_sha256"] = hashlib.sha256(manifest_bytes).hexdigest()
+                meta["container"] = {"format": "SBX2", "chunk_size": V2_CHUNK, "entries": len(entries)}
+            meta["timestamp"] = datetime.utcnow().isoformat() + "Z"
+            _write_entry(outer, policy, "meta.json", json.dumps(meta, indent=2).encode("utf-8"))
+
+    # Añadir el hash del sealed.zip al meta local (el de dentro de sealed.zip no lo lleva)
+    meta["sealed_zip_sha256"] = sealed_hw.hexdigest()
     meta_path = output_dir / "meta.json"
     meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
 
-    # --- 8) (opcional) sealed.zip con las 5 piezas para transporte sencillo ---
-    sealed_final = output_dir / "sealed.zip"
-    with zipfile.ZipFile(sealed_final, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as z:
-        z.write(meta_path,                         arcname="meta.json")
-        z.write(output_dir / "payload.enc",        arcname="payload.enc")
-        z.write(output_dir / "wrapped_key.bin",    arcname="wrapped_key.bin")
-        z.write(output_dir / "nonce.bin",          arcname="nonce.bin")
-        z.write(output_dir / "tag.bin",            arcname="tag.bin")
-
-    # Añadir el hash del sealed.zip al meta (si lo quieres para control)
-    meta_json = json.loads(meta_path.read_text(encoding="utf-8"))
-    meta_json["sealed_zip_sha256"] = sha256_file(sealed_final)
-    meta_path.write_text(json.dumps(meta_json, indent=2), encoding="utf-8")
-
     outputs = [
         "meta.json", "payload.enc", "wrapped_key.bin", "nonce.bin", "tag.bin", "sealed.zip"
     ]
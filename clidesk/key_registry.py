@@ -0,0 +1,119 @@
+# key_registry.py
+# Resuelve la clave RSA pública de una convocatoria contra el registro del convocante
+# (GET /api/keys/...) y la guarda en una caché local. Una clave publicada no cambia nunca:
+# una vez descargada y verificada su huella no se vuelve a pedir. Así el usuario no tiene
+# que elegir el PEM ni teclear el Key ID.
+#
+#   r = KeyResolver("http://127.0.0.1:8001/convocante")
+#   key_id = r.latest_for_call("OBRA-12")         # o el Key ID que publique el convocante
+#   pem = r.public_key(key_id)                    # bytes PEM, de la caché si ya estaba
+#
+# La caché vive en CLIDESK_KEY_CACHE (por defecto ~/.clidesk/keys).
+import os
+import re
+import json
+import hashlib
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from cryptography.hazmat.primitives import serialization
+
+KEY_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,100}$")
+
+
+class KeyRegistryError(Exception):
+    pass
+
+
+def public_key_fingerprint(public_pem: bytes) -> str:
+    """SHA-256 (hex) de la clave pública en DER, la misma huella que publica el convocante."""
+    try:
+        key = serialization.load_pem_public_key(public_pem)
+    except ValueError as e:
+        raise KeyRegistryError(f"La clave recibida no es un PEM válido: {e}")
+    der = key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).hexdigest()
+
+
+def default_cache_dir() -> Path:
+    return Path(os.getenv("CLIDESK_KEY_CACHE") or Path.home() / ".clidesk" / "keys")
+
+
+def _atomic_write(path: Path, data: bytes):
+    # varios procesos (batch.py) pueden resolver la misma clave a la vez
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class KeyResolver:
+    def __init__(self, base_url: str, cache_dir: Union[str, Path, None] = None, timeout: float = 15):
+        self.base_url = base_url.rstrip("/")
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.timeout = timeout
+
+    def _get(self, path: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        req = urllib.request.Request(self.base_url + path, headers=headers or {})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, dict(resp.headers), resp.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, dict(e.headers), b""
+            if e.code == 404:
+                raise KeyRegistryError(f"El registro no tiene {path}")
+            raise KeyRegistryError(f"Registro de claves: HTTP {e.code} en {path}")
+        except urllib.error.URLError as e:
+            raise KeyRegistryError(f"No se pudo contactar con el registro ({self.base_url}): {e.reason}")
+
+    def public_key_path(self, key_id: str, expected_fingerprint: Optional[str] = None) -> Path:
+        """
+        Ruta local del PEM de `key_id`; lo descarga si no está en caché. Si se da
+        `expected_fingerprint` (p. ej. publicada en el pliego) se exige que coincida.
+        """
+        if not KEY_ID_RE.match(key_id):
+            raise KeyRegistryError(f"Key ID inválido: {key_id!r}")
+        path = self.cache_dir / f"{key_id}.pem"
+        if path.exists():
+            fp = public_key_fingerprint(path.read_bytes())
+        else:
+            _, headers, pem = self._get(f"/api/keys/{urllib.parse.quote(key_id)}/rsa_pub.pem")
+            fp = public_key_fingerprint(pem)
+            announced = headers.get("X-Key-Fingerprint")
+            if announced and announced.lower() != fp:
+                raise KeyRegistryError(f"La huella de {key_id} no coincide con la anunciada por el registro")
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            _atomic_write(path, pem)
+        if expected_fingerprint and expected_fingerprint.lower() != fp:
+            raise KeyRegistryError(f"La huella de {key_id} es {fp}, no la esperada {expected_fingerprint}")
+        return path
+
+    def public_key(self, key_id: str, expected_fingerprint: Optional[str] = None) -> bytes:
+        return self.public_key_path(key_id, expected_fingerprint).read_bytes()
+
+    def keys_for_call(self, call_id: str) -> list:
+        """JWKS de `call_id` (la más reciente primero); revalida con If-None-Match."""
+        name = hashlib.sha256(call_id.encode()).hexdigest()[:16]
+        path = self.cache_dir / f"jwks-{name}.json"
+        cached = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+        headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+        status, resp_headers, body = self._get(
+            "/api/keys/jwks.json?" + urllib.parse.urlencode({"call_id": call_id}), headers)
+        if status == 304:
+            return cached["keys"]
+        keys = json.loads(body)["keys"]
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, json.dumps({"etag": resp_headers.get("ETag"), "keys": keys}).encode("utf-8"))
+        return keys
+
+    def latest_for_call(self, call_id: str) -> str:
+        """Key ID de la clave más reciente de `call_id`."""
+        keys = self.keys_for_call(call_id)
+        if not keys:
+            raise KeyRegistryError(f"La convocatoria {call_id} no tiene claves publicadas")
+        return keys[0]["kid"]
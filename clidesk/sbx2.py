@@ -0,0 +1,273 @@
+import os
+import bz2
+import json
+import lzma
+import zlib
+import struct
+import hashlib
+import secrets
+from typing import Any, Dict, Iterator, List, Optional
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# ---- Contenedor v2: AES-256-GCM por trozos con índice cifrado ----
+#
+#   cabecera (17 B, en claro): b"SBX2" | versión u8 = 2 | chunk_size u32 | nonce_prefix 8 B
+#   trozo i: AES-GCM(K, nonce_prefix | i u32, aad = cabecera | final u8) -> pt + tag 16 B
+#
+# Todos los trozos llevan chunk_size bytes de plaintext salvo el último (1..chunk_size),
+# que se marca como final en el AAD: truncar, reordenar o mezclar trozos de otro
+# paquete falla la autenticación. El plaintext lógico es: datos de cada entrada uno tras
+# otro, el índice JSON ({"entries": [{name, offset, size, file_size, compression,
+# sha256}]}) y un pie de 16 B con (offset, tamaño) del índice. Leer una entrada solo
+# descifra los trozos que cubren su rango. `compression` es "store", "deflate", "bzip2" o
+# "lzma", con los flujos tal como los escribe zipfile.
+#
+# Este archivo es el mismo en clidesk/sbx2.py (escribe y lee) y en
+# backend-convocante/app/sbx2.py (lee): solo depende de la stdlib y de cryptography.
+# backend-convocante/tests/test_sbx2.py comprueba que las dos copias no se separen.
+
+V2_MAGIC = b"SBX2"
+V2_HEADER = struct.Struct(">4sBI8s")
+V2_CHUNK = 64 * 1024
+V2_FOOTER = struct.Struct(">QQ")
+V2_MAX_CHUNK = 4 * 1024 * 1024  # lo que se acepta al leer; más es una cabecera hostil
+GCM_TAG = 16
+CHUNK = 1024 * 1024  # bloque máximo al descomprimir una entrada
+
+
+def _nonce(prefix: bytes, i: int) -> bytes:
+    return prefix + i.to_bytes(4, "big")
+
+
+def is_chunked(fp) -> bool:
+    """True si `fp` (con seek) empieza con la cabecera del contenedor v2 (los v1 son GCM crudo)."""
+    pos = fp.tell()
+    fp.seek(0)
+    head = fp.read(len(V2_MAGIC) + 1)
+    fp.seek(pos)
+    return head == V2_MAGIC + b"\x02"
+
+
+class ChunkedAeadWriter:
+    """
+    Objeto tipo archivo que cifra lo que se le escribe en trozos AES-GCM independientes
+    (formato v2, ver arriba). `close(index)` añade el índice y el pie y cifra el último
+    trozo; `last_tag` queda con su tag.
+    """
+
+    def __init__(self, fp, key: bytes, chunk_size: int = V2_CHUNK):
+        self._fp = fp
+        self._aead = AESGCM(key)
+        self.chunk_size = chunk_size
+        self.nonce_prefix = secrets.token_bytes(8)
+        self.header = V2_HEADER.pack(V2_MAGIC, 2, chunk_size, self.nonce_prefix)
+        self._aad = (self.header + b"\x00", self.header + b"\x01")
+        self._buf = bytearray()
+        self._i = 0
+        self._pos = 0
+        self.last_tag: Optional[bytes] = None
+        fp.write(self.header)
+
+    def _emit(self, pt, final: bool):
+        if self._i >= 2 ** 32:
+            raise ValueError("Demasiados trozos para el contenedor v2")
+        ct = self._aead.encrypt(_nonce(self.nonce_prefix, self._i), pt, self._aad[final])
+        self._fp.write(ct)
+        self._i += 1
+        if final:
+            self.last_tag = ct[-GCM_TAG:]
+
+    def _drain(self):
+        # Se retiene al menos 1 byte: el último trozo es el que se marca final en close()
+        cs = self.chunk_size
+        end = (len(self._buf) - 1) // cs * cs
+        with memoryview(self._buf) as mv:
+            for off in range(0, end, cs):
+                self._emit(mv[off:off + cs], False)
+        del self._buf[:end]
+
+    def write(self, b) -> int:
+        self._buf += b
+        n = len(b)
+        self._pos += n
+        if len(self._buf) > self.chunk_size:
+            self._drain()
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        self._fp.flush()
+
+    def close(self, index: bytes):
+        if self.last_tag is not None:
+            return
+        offset = self._pos
+        self.write(index)
+        self.write(V2_FOOTER.pack(offset, len(index)))
+        self._emit(bytes(self._buf), True)
+        self._buf.clear()
+
+
+class ChunkedAeadReader:
+    """
+    Lector de un contenedor v2 sobre un archivo binario con seek. Solo descifra (y
+    autentica) los trozos que se piden: listar cuesta el pie y el índice; leer una
+    entrada, los trozos de su rango.
+    """
+
+    def __init__(self, fp, key: bytes):
+        self._fp = fp
+        self._aead = AESGCM(key)
+        fp.seek(0)
+        self.header = fp.read(V2_HEADER.size)
+        if len(self.header) < V2_HEADER.size:
+            raise ValueError("Contenedor v2 truncado")
+        magic, version, self.chunk_size, self.nonce_prefix = V2_HEADER.unpack(self.header)
+        if magic != V2_MAGIC or version != 2:
+            raise ValueError("No es un contenedor v2")
+        if not 0 < self.chunk_size <= V2_MAX_CHUNK:
+            raise ValueError(f"Tamaño de trozo inválido: {self.chunk_size}")
+        self._aad = (self.header + b"\x00", self.header + b"\x01")
+        body = fp.seek(0, os.SEEK_END) - V2_HEADER.size
+        stride = self.chunk_size + GCM_TAG
+        self.n_chunks = -(-body // stride)
+        last_ct = body - (self.n_chunks - 1) * stride
+        if self.n_chunks == 0 or last_ct <= GCM_TAG:
+            raise ValueError("Contenedor v2 truncado")
+        self.length = (self.n_chunks - 1) * self.chunk_size + last_ct - GCM_TAG
+        if self.length < V2_FOOTER.size:
+            raise ValueError("Contenedor v2 truncado")
+        offset, size = V2_FOOTER.unpack(self.read(self.length - V2_FOOTER.size, V2_FOOTER.size))
+        if offset + size > self.length - V2_FOOTER.size:
+            raise ValueError("Índice fuera de rango")
+        self.index = json.loads(self.read(offset, size))
+        self.entries: List[Dict[str, Any]] = self.index["entries"]
+        self._by_name = {e["name"]: e for e in self.entries}
+
+    def _chunk(self, i: int) -> bytes:
+        stride = self.chunk_size + GCM_TAG
+        self._fp.seek(V2_HEADER.size + i * stride)
+        ct = self._fp.read(stride)
+        final = i == self.n_chunks - 1
+        return self._aead.decrypt(_nonce(self.nonce_prefix, i), ct, self._aad[final])
+
+    def iter_range(self, offset: int, size: int) -> Iterator[bytes]:
+        """Plaintext de [offset, offset+size), trozo a trozo (cada uno ya autenticado)."""
+        if offset < 0 or size < 0 or offset + size > self.length:
+            raise ValueError("Rango fuera del contenedor")
+        cs = self.chunk_size
+        end = offset + size
+        i = offset // cs
+        while offset < end:
+            pt = self._chunk(i)
+            start = offset - i * cs
+            piece = pt[start:start + (end - offset)]
+            yield piece
+            offset += len(piece)
+            i += 1
+
+    def read(self, offset: int, size: int) -> bytes:
+        return b"".join(self.iter_range(offset, size))
+
+    def entry(self, name: str) -> Dict[str, Any]:
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f"No existe la entrada: {name}") from None
+
+    def open_entry(self, name: str) -> Iterator[bytes]:
+        """
+        Contenido original de `name`, por bloques; al final comprueba su SHA-256. La
+        descompresión va acotada: bloques de CHUNK como mucho y nunca más de `file_size`.
+        """
+        e = self.entry(name)
+        dec = _decompressor(e["compression"])
+        h = hashlib.sha256()
+        n = 0
+        for piece in self.iter_range(e["offset"], e["size"]):
+            for out in (_inflate(dec, piece) if dec else (piece,)):
+                n += len(out)
+                if n > e["file_size"]:
+                    raise ValueError(f"{name} descomprime a más de los {e['file_size']} bytes del índice")
+                h.update(out)
+                yield out
+        if dec and hasattr(dec, "flush"):
+            out = dec.flush()
+            if n + len(out) > e["file_size"]:
+                raise ValueError(f"{name} descomprime a más de los {e['file_size']} bytes del índice")
+            h.update(out)
+            yield out
+        if h.hexdigest() != e["sha256"]:
+            raise ValueError(f"SHA-256 de {name} no coincide con el índice")
+
+
+def _decompressor(codec: str):
+    if codec == "store":
+        return None
+    if codec == "deflate":
+        return zlib.decompressobj(-15)
+    if codec == "bzip2":
+        return bz2.BZ2Decompressor()
+    if codec == "lzma":
+        return _ZipLzmaDecompressor()
+    raise ValueError(f"Compresión no soportada: {codec}")
+
+
+class _ZipLzmaDecompressor:
+    """
+    Como zipfile.LZMADecompressor (cabecera versión u16 | tamaño u16 | propiedades LZMA1
+    y flujo en crudo) pero con `max_length`, que la de zipfile no admite.
+    """
+
+    def __init__(self):
+        self._head = b""
+        self._dec = None
+
+    @property
+    def needs_input(self) -> bool:
+        return self._dec is None or self._dec.needs_input
+
+    @property
+    def eof(self) -> bool:
+        return self._dec is not None and self._dec.eof
+
+    def decompress(self, data: bytes, max_length: int = -1) -> bytes:
+        if self._dec is None:
+            self._head += data
+            if len(self._head) < 4:
+                return b""
+            psize = struct.unpack("<H", self._head[2:4])[0]
+            if psize != 5:
+                raise ValueError("Propiedades LZMA inválidas")
+            if len(self._head) < 4 + psize:
+                return b""
+            props = self._head[4:4 + psize]
+            lc_lp_pb, dict_size = props[0], struct.unpack("<I", props[1:])[0]
+            pb, lc_lp = divmod(lc_lp_pb, 45)
+            lp, lc = divmod(lc_lp, 9)
+            self._dec = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[
+                {"id": lzma.FILTER_LZMA1, "dict_size": dict_size, "lc": lc, "lp": lp, "pb": pb}])
+            data, self._head = self._head[4 + psize:], b""
+        return self._dec.decompress(data, max_length)
+
+
+def _inflate(dec, data: bytes) -> Iterator[bytes]:
+    """`data` descomprimido en bloques de como mucho CHUNK bytes, nunca todo de golpe."""
+    if hasattr(dec, "unconsumed_tail"):  # zlib
+        while True:
+            out = dec.decompress(data, CHUNK)
+            data = dec.unconsumed_tail
+            if out:
+                yield out
+            if not data and len(out) < CHUNK:
+                return
+    out = dec.decompress(data, CHUNK)
+    while True:
+        if out:
+            yield out
+        if dec.eof or dec.needs_input:
+            return
+        out = dec.decompress(b"", CHUNK)
@@ -1,8 +1,16 @@
 # ui_main.py
+import os
+import time
+import queue
+import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
-from typing import Callable, List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional
+
+from key_registry import KeyRegistryError, KeyResolver
+
+POLL_MS = 100
 
 
 class MainUI:
@@ -16,6 +24,15 @@ class MainUI:
         self.ed_priv_path: str = ""
         self.out_dir: str = ""
 
+        # on_run (y la consulta al registro de claves) corren en hilos aparte: lo que toca
+        # la ventana pasa por esta cola y _poll lo aplica en el hilo de Tk
+        self._events: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._progress = (0, 0)
+        self._started = 0.0
+        self._closing = False
+
         frm = tk.Frame(self.root, padx=10, pady=10)
         frm.pack(fill="both", expand=True)
 
@@ -43,33 +60,50 @@ class MainUI:
         self.files_lbl = tk.Label(frm, text="(0 archivos seleccionados)")
         self.files_lbl.grid(row=5, column=0, columnspan=2, sticky="w")
 
-        # --- Claves ---
+        # --- Claves: del registro del convocante (Call ID y, opcional, Key ID) o a mano ---
+        tk.Label(frm, text="Registro de claves (URL):").grid(row=6, column=0, sticky="e", pady=(8, 0))
+        self.registry_in = tk.Entry(frm, width=42)
+        self.registry_in.insert(0, os.getenv("CLIDESK_REGISTRY_URL", ""))
+        self.registry_in.grid(row=6, column=1, sticky="we", pady=(8, 0))
+        self.resolve_btn = tk.Button(frm, text="Obtener clave RSA del registro", command=self._resolve_key)
+        self.resolve_btn.grid(row=7, column=0, columnspan=2, sticky="we", pady=(2, 2))
+
         tk.Button(frm, text="Clave RSA pública (.pem)...", command=self._pick_rsa_pub)\
-            .grid(row=6, column=0, columnspan=2, sticky="we", pady=(8, 2))
+            .grid(row=8, column=0, columnspan=2, sticky="we", pady=(8, 2))
         self.rsa_lbl = tk.Label(frm, text="(no seleccionada)")
-        self.rsa_lbl.grid(row=7, column=0, columnspan=2, sticky="w")
+        self.rsa_lbl.grid(row=9, column=0, columnspan=2, sticky="w")
 
         tk.Button(frm, text="Clave Ed25519 privada (.pem)...", command=self._pick_ed_priv)\
-            .grid(row=8, column=0, columnspan=2, sticky="we", pady=(8, 2))
+            .grid(row=10, column=0, columnspan=2, sticky="we", pady=(8, 2))
         self.ed_lbl = tk.Label(frm, text="(no seleccionada)")
-        self.ed_lbl.grid(row=9, column=0, columnspan=2, sticky="w")
+        self.ed_lbl.grid(row=11, column=0, columnspan=2, sticky="w")
 
         # --- Carpeta de salida ---
         tk.Button(frm, text="Carpeta de salida...", command=self._pick_outdir)\
-            .grid(row=10, column=0, columnspan=2, sticky="we", pady=(8, 2))
+            .grid(row=12, column=0, columnspan=2, sticky="we", pady=(8, 2))
         self.out_lbl = tk.Label(frm, text="(no seleccionada)")
-        self.out_lbl.grid(row=11, column=0, columnspan=2, sticky="w")
+        self.out_lbl.grid(row=13, column=0, columnspan=2, sticky="w")
 
-        # --- Ejecutar ---
-        tk.Button(frm, text="Generar paquete", command=self.run, bg="#2d7", fg="white")\
-            .grid(row=12, column=0, columnspan=2, sticky="we", pady=(12, 4))
+        # --- Ejecutar / cancelar ---
+        self.run_btn = tk.Button(frm, text="Generar paquete", command=self.run, bg="#2d7", fg="white")
+        self.run_btn.grid(row=14, column=0, sticky="we", pady=(12, 4))
+        self.cancel_btn = tk.Button(frm, text="Cancelar", command=self.cancel, state="disabled")
+        self.cancel_btn.grid(row=14, column=1, sticky="we", pady=(12, 4), padx=(8, 0))
+
+        # --- Progreso ---
+        self.progress_bar = ttk.Progressbar(frm, mode="determinate", maximum=1)
+        self.progress_bar.grid(row=15, column=0, columnspan=2, sticky="we")
+        self.progress_lbl = tk.Label(frm, text="")
+        self.progress_lbl.grid(row=16, column=0, columnspan=2, sticky="w")
 
         # --- Log ---
         self.log_txt = tk.Text(frm, height=12)
-        self.log_txt.grid(row=13, column=0, columnspan=2, sticky="nsew", pady=(8, 0))
+        self.log_txt.grid(row=17, column=0, columnspan=2, sticky="nsew", pady=(8, 0))
 
         frm.columnconfigure(1, weight=1)
-        frm.rowconfigure(13, weight=1)
+        frm.rowconfigure(17, weight=1)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.after(POLL_MS, self._poll)
 
     # ---- Helpers selección ----
     def _pick_files(self):
@@ -85,6 +119,36 @@ class MainUI:
             self.rsa_pub_path = p
             self.rsa_lbl.config(text=Path(p).name)
 
+    def _resolve_key(self):
+        url = self.registry_in.get().strip()
+        call_id = self.call_id_in.get().strip()
+        key_id = self.key_id_in.get().strip()
+        if not url or not (call_id or key_id):
+            messagebox.showerror("Error", "Indica la URL del registro y el Call ID (o el Key ID).")
+            return
+        self.resolve_btn.config(state="disabled")
+
+        def work():
+            # en un hilo: la petición puede tardar; el resultado se aplica en _poll
+            try:
+                resolver = KeyResolver(url)
+                kid = key_id or resolver.latest_for_call(call_id)
+                path = resolver.public_key_path(kid)
+                self._events.put(("call", lambda: self._key_resolved(kid, path)))
+            except KeyRegistryError as e:
+                self.logln(f"❌ {e}")
+            finally:
+                self._events.put(("call", lambda: self.resolve_btn.config(state="normal")))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _key_resolved(self, key_id: str, path: Path):
+        self.key_id_in.delete(0, "end")
+        self.key_id_in.insert(0, key_id)
+        self.rsa_pub_path = str(path)
+        self.rsa_lbl.config(text=f"{key_id} (del registro, en caché: {path})")
+        self.logln(f"Clave {key_id} lista.")
+
     def _pick_ed_priv(self):
         p = filedialog.askopenfilename(title="Selecciona Ed25519 privada (.pem)",
                                        filetypes=[("PEM files", "*.pem"), ("All files", "*.*")])
@@ -98,17 +162,85 @@ class MainUI:
             self.out_dir = d
             self.out_lbl.config(text=d)
 
-    # ---- Log ----
+    # ---- Log (se puede llamar desde cualquier hilo) ----
     def logln(self, s: str):
-        self.log_txt.insert("end", s + "\n")
-        self.log_txt.see("end")
-        self.root.update_idletasks()
+        self._events.put(("log", s))
 
     def clear_log(self):
-        self.log_txt.delete("1.0", "end")
+        self._events.put(("clear", None))
+
+    # ---- Progreso ----
+    def set_progress(self, done: int, total: int):
+        """Callback de avance en bytes; llega desde hilos de trabajo, _poll lo pinta."""
+        self._progress = (done, total)
+
+    def _paint_progress(self):
+        done, total = self._progress
+        if not total:
+            return
+        done = min(done, total)
+        self.progress_bar.config(maximum=total, value=done)
+        elapsed = time.monotonic() - self._started
+        rate = done / elapsed if elapsed > 0 else 0
+        text = f"{done / 2**20:,.0f} / {total / 2**20:,.0f} MB  ·  {rate / 2**20:,.1f} MB/s"
+        if rate > 0 and done < total:
+            eta = int((total - done) / rate)
+            text += f"  ·  quedan {eta // 60}:{eta % 60:02d}"
+        self.progress_lbl.config(text=text)
+
+    def _poll(self):
+        finished = False
+        try:
+            while True:
+                kind, value = self._events.get_nowait()
+                if kind == "log":
+                    self.log_txt.insert("end", value + "\n")
+                    self.log_txt.see("end")
+                elif kind == "clear":
+                    self.log_txt.delete("1.0", "end")
+                elif kind == "call":
+                    value()
+                else:
+                    finished = True
+        except queue.Empty:
+            pass
+        if self._worker is not None:
+            self._paint_progress()
+        if finished:
+            self._worker = None
+            self.run_btn.config(state="normal")
+            self.cancel_btn.config(state="disabled")
+            if self._closing:
+                self.root.destroy()
+                return
+        self.root.after(POLL_MS, self._poll)
+
+    def _work(self, kwargs: Dict[str, Any]):
+        try:
+            self.on_run(**kwargs)
+        except Exception as e:
+            self.logln(f"❌ Error: {e}")
+        finally:
+            self._events.put(("done", None))
+
+    def cancel(self):
+        if self._worker is not None and not self._cancel.is_set():
+            self._cancel.set()
+            self.cancel_btn.config(state="disabled")
+            self.logln("Cancelando...")
+
+    def _on_close(self):
+        # no se cierra con el paquete a medias: se cancela y se cierra al terminar la limpieza
+        if self._worker is None:
+            self.root.destroy()
+        else:
+            self._closing = True
+            self.cancel()
 
     # ---- Ejecutar ----
     def run(self):
+        if self._worker is not None:
+            return
         if not self.input_files:
             messagebox.showerror("Error", "Selecciona al menos un archivo.")
             return
@@ -126,18 +258,26 @@ class MainUI:
             return
 
         self.clear_log()
-        try:
-            self.on_run(
-                input_files=self.input_files,
-                rsa_pub_path=self.rsa_pub_path,
-                ed_priv_path=self.ed_priv_path,
-                out_dir=self.out_dir,
-                bidder=bidder,
-                call_id=call_id,
-                key_id=key_id,
-            )
-        except Exception as e:
-            self.logln(f"❌ Error: {e}")
+        self._cancel.clear()
+        self._progress = (0, 0)
+        self._started = time.monotonic()
+        self.progress_bar.config(value=0)
+        self.progress_lbl.config(text="")
+        self.run_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        kwargs = dict(
+            input_files=list(self.input_files),
+            rsa_pub_path=self.rsa_pub_path,
+            ed_priv_path=self.ed_priv_path,
+            out_dir=self.out_dir,
+            bidder=bidder,
+            call_id=call_id,
+            key_id=key_id,
+            progress=self.set_progress,
+            cancel=self._cancel.is_set,
+        )
+        self._worker = threading.Thread(target=self._work, args=(kwargs,), daemon=True)
+        self._worker.start()
 
     def show(self):
         self.root.mainloop()
@@ -0,0 +1,179 @@
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache import CACHE_REQUESTS
+from ..config import settings
+from ..models import Role, User, UserSession
+
+# Sesiones de login en la tabla `sessions`, con una caché en memoria sid -> Identity para
+# que las comprobaciones de permisos (cada chunk de una subida, cada descifrado) no vayan
+# a la base. Cada worker tiene la suya, acotada en tamaño (LRU) y en tiempo
+# (SESSION_CACHE_TTL): un logout hecho en otro worker se nota, como mucho, pasado ese TTL.
+# Un cambio de `User.role` por el ORM invalida, al hacer commit, las sesiones cacheadas de
+# ese usuario en el worker que lo hace (`invalidate_user`); en los demás, y para cambios
+# hechos por SQL directo, vale el mismo TTL.
+
+
+@dataclass(frozen=True)
+class Identity:
+    """Lo que usan las comprobaciones de permisos (`user.id`, `user.role`)."""
+    id: int
+    role: Role
+    expires_at: datetime
+
+
+class _IdentityCache:
+    """
+    LRU + TTL en el proceso de sid -> Identity (objetos, sin serializar), con un índice
+    user_id -> sids para `delete_user`. `generation` sube con cada `delete_user`: quien
+    la lee antes de consultar la base no cachea una fila que pudo quedar vieja.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._items: "OrderedDict[str, Tuple[float, Identity]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _pop(self, sid: str) -> None:
+        item = self._items.pop(sid, None)
+        if item is not None:
+            sids = self._by_user.get(item[1].id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._by_user[item[1].id]
+
+    def get(self, sid: str) -> Optional[Identity]:
+        with self._lock:
+            item = self._items.get(sid)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                self._pop(sid)
+                return None
+            self._items.move_to_end(sid)
+            return item[1]
+
+    def set(self, sid: str, ident: Identity, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._pop(sid)
+            self._items[sid] = (time.monotonic() + self.ttl, ident)
+            self._by_user.setdefault(ident.id, set()).add(sid)
+            while len(self._items) > self.maxsize:
+                self._pop(next(iter(self._items)))
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._pop(sid)
+
+    def delete_user(self, user_id: int) -> None:
+        with self._lock:
+            self.generation += 1
+            for sid in self._by_user.pop(user_id, ()):
+                self._items.pop(sid, None)
+
+
+_cache = _IdentityCache(settings.SESSION_CACHE_SIZE, settings.SESSION_CACHE_TTL)
+_hit = CACHE_REQUESTS.labels("sessions", "hit")
+_miss = CACHE_REQUESTS.labels("sessions", "miss")
+
+
+def _cached(sid: str) -> Optional[Identity]:
+    ident = _cache.get(sid)
+    if ident is not None and ident.expires_at > datetime.utcnow():
+        _hit.inc()
+        return ident
+    _miss.inc()
+    return None
+
+
+def _lookup(sid: str):
+    return (select(User.id, User.role, UserSession.expires_at)
+            .join(UserSession, UserSession.user_id == User.id)
+            .where(UserSession.sid == sid, UserSession.revoked_at.is_(None),
+                   UserSession.expires_at > datetime.utcnow()))
+
+
+def _remember(sid: str, row, generation: int) -> Identity:
+    ident = Identity(row.id, row.role, row.expires_at)
+    _cache.set(sid, ident, generation)
+    return ident
+
+
+def resolve(db: Session, sid: str) -> Optional[Identity]:
+    """Identidad de la sesión `sid`, o None si no existe, expiró o fue revocada."""
+    ident = _cached(sid)
+    if ident is None:
+        # la generación se lee antes de consultar: si cambia un rol entretanto, la fila
+        # leída no se cachea
+        generation = _cache.generation
+        row = db.execute(_lookup(sid)).first()
+        ident = _remember(sid, row, generation) if row else None
+    return ident
+
+
+async def resolve_async(db: AsyncSession, sid: str) -> Optional[Identity]:
+    ident = _cached(sid)
+    if ident is None:
+        generation = _cache.generation
+        row = (await db.execute(_lookup(sid))).first()
+        ident = _remember(sid, row, generation) if row else None
+    return ident
+
+
+async def create_session(db: AsyncSession, user: User) -> str:
+    sid = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.SESSION_TTL)
+    db.add(UserSession(sid=sid, user_id=user.id, expires_at=expires_at))
+    await db.commit()
+    return sid
+
+
+async def revoke(db: AsyncSession, sid: str) -> None:
+    await db.execute(update(UserSession).where(UserSession.sid == sid, UserSession.revoked_at.is_(None))
+                     .values(revoked_at=datetime.utcnow()))
+    await db.commit()
+    _cache.delete(sid)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Descarta las sesiones cacheadas de `user_id` en este worker (cambio de rol, bloqueo)."""
+    _cache.delete_user(user_id)
+
+
+# Cambios de rol hechos con el ORM (también bajo AsyncSession, que usa un Session por
+# debajo): se anotan en el flush y se invalidan tras el commit, no antes, para que una
+# petición concurrente no vuelva a cachear el rol viejo todavía en la base.
+_ROLE_CHANGED = "sessions_role_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _note_role_changes(db: Session, _ctx) -> None:
+    for obj in db.dirty:
+        if isinstance(obj, User) and inspect(obj).attrs.role.history.has_changes():
+            db.info.setdefault(_ROLE_CHANGED, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_role_changes(db: Session) -> None:
+    for user_id in db.info.pop(_ROLE_CHANGED, ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_role_changes(db: Session) -> None:
+    db.info.pop(_ROLE_CHANGED, None)
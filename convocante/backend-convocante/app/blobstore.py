@@ -0,0 +1,96 @@
+import os
+import shutil
+import hashlib
+import secrets
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Tuple
+
+from .config import settings
+
+
+class BlobStore:
+    """
+    Almacén de blobs inmutables direccionados por su SHA-256 (hex).
+    Escribir dos veces el mismo contenido no duplica nada: el segundo put es un no-op.
+    Por eso no hay borrado: un blob puede ser el payload de varias submissions.
+    """
+
+    def open(self, sha256: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def put_file(self, src: Path, sha256: str) -> None:
+        """Adopta un archivo ya verificado (se mueve o se borra si el blob ya existe)."""
+        raise NotImplementedError
+
+    def put_stream(self, chunks: Iterable[bytes]) -> Tuple[str, int]:
+        """Guarda lo que llegue por `chunks` hasheando al vuelo. Devuelve (sha256, tamaño)."""
+        raise NotImplementedError
+
+    def put_bytes(self, data: bytes) -> Tuple[str, int]:
+        return self.put_stream([data])
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs en `root/ab/cd/abcd...` (dos niveles para no tener directorios enormes)."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.tmp = self.root / "tmp"
+        self.tmp.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, sha256: str) -> Path:
+        sha256 = sha256.lower()
+        if len(sha256) != 64 or any(ch not in "0123456789abcdef" for ch in sha256):
+            raise ValueError("sha256 inválido")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def open(self, sha256: str) -> BinaryIO:
+        return open(self._path(sha256), "rb")
+
+    def put_file(self, src: Path, sha256: str) -> None:
+        dest = self._path(sha256)
+        if dest.exists():
+            os.remove(src)
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(src, dest)
+        except OSError:
+            # Otro sistema de archivos: copiar a tmp del store y renombrar (atómico).
+            staged = self.tmp / secrets.token_hex(16)
+            shutil.copyfile(src, staged)
+            os.replace(staged, dest)
+            os.remove(src)
+
+    def put_stream(self, chunks: Iterable[bytes]) -> Tuple[str, int]:
+        h = hashlib.sha256()
+        size = 0
+        staged = self.tmp / secrets.token_hex(16)
+        try:
+            with open(staged, "wb") as f:
+                for b in chunks:
+                    h.update(b)
+                    size += len(b)
+                    f.write(b)
+            sha256 = h.hexdigest()
+            self.put_file(staged, sha256)
+        except BaseException:
+            staged.unlink(missing_ok=True)
+            raise
+        return sha256, size
+
+
+BACKENDS = {
+    "local": lambda: LocalBlobStore(settings.BLOB_DIR),
+}
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        if settings.BLOB_BACKEND not in BACKENDS:
+            raise RuntimeError(f"BLOB_BACKEND desconocido: {settings.BLOB_BACKEND}")
+        _store = BACKENDS[settings.BLOB_BACKEND]()
+    return _store
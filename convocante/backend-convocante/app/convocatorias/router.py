@@ -1,29 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session
-from ..db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from ..db import get_db, get_async_db
 from ..models import Convocatoria, User, Role
-from ..schemas import ConvocatoriaIn, ConvocatoriaOut
-from ..auth.router import get_current_user
+from ..schemas import ConvocatoriaIn, ConvocatoriaOut, ConvocatoriaSummary
+from ..etag import body_response, etag_for, render_json
+from ..cache import convocatorias_cache, pack_response, unpack_response
+from ..auth.router import get_current_user_async
 from ..ws.hub import hub
 
 router = APIRouter(prefix="/convocatorias", tags=["convocatorias"])
 
+def _invalidate_on_event(message: dict):
+    # Otros workers se enteran de la convocatoria nueva por el hub; con caché compartida
+    # (Redis) ya la invalidó quien la creó.
+    if message.get("type") == "new_convocatoria" and not convocatorias_cache.backend.shared:
+        convocatorias_cache.invalidate()
+
+hub.listeners.append(_invalidate_on_event)
+
 @router.post("", response_model=ConvocatoriaOut)
-async def crear_convocatoria(body: ConvocatoriaIn, req: Request, db: Session = Depends(get_db)):
-    user = get_current_user(req, db)
+async def crear_convocatoria(body: ConvocatoriaIn, req: Request, db: AsyncSession = Depends(get_async_db)):
+    user = await get_current_user_async(req, db)
     if not user or user.role != Role.CONVOCANTE:
         raise HTTPException(status_code=403, detail="Solo convocantes")
     c = Convocatoria(titulo=body.titulo, descripcion=body.descripcion, owner_id=user.id)
-    db.add(c); db.commit(); db.refresh(c)
+    db.add(c); await db.commit(); await db.refresh(c)
+    await run_in_threadpool(convocatorias_cache.invalidate)
     await hub.broadcast({"type": "new_convocatoria", "id": c.id, "titulo": c.titulo})
     return c
 
-@router.get("", response_model=list[ConvocatoriaOut])
-def listar(db: Session = Depends(get_db)):
-    return db.query(Convocatoria).order_by(Convocatoria.id.desc()).all()
+@router.get("", response_model=list[ConvocatoriaSummary])
+def listar(req: Request, cursor: int | None = None, limit: int = Query(50, ge=1, le=500),
+           owner_id: int | None = None, desde: datetime | None = None, hasta: datetime | None = None,
+           db: Session = Depends(get_db)):
+    """
+    Convocatorias, de la más reciente a la más antigua, sin `descripcion`. Paginado por id:
+    la cabecera X-Next-Cursor trae el `?cursor=` de la página siguiente. Filtros opcionales
+    por dueño y por `created_at` en [desde, hasta). Con If-None-Match responde 304.
+    """
+    def load() -> bytes:
+        q = db.query(Convocatoria.id, Convocatoria.titulo, Convocatoria.owner_id, Convocatoria.created_at)
+        if cursor is not None:
+            q = q.filter(Convocatoria.id < cursor)
+        if owner_id is not None:
+            q = q.filter(Convocatoria.owner_id == owner_id)
+        if desde is not None:
+            q = q.filter(Convocatoria.created_at >= desde)
+        if hasta is not None:
+            q = q.filter(Convocatoria.created_at < hasta)
+        rows = q.order_by(Convocatoria.id.desc()).limit(limit + 1).all()
+        body = render_json([dict(r._mapping) for r in rows[:limit]])
+        headers = {"Cache-Control": "no-cache", "ETag": etag_for(body)}
+        if len(rows) > limit:
+            headers["X-Next-Cursor"] = str(rows[limit - 1].id)
+        return pack_response(body, headers)
+
+    key = f"list:{cursor}:{limit}:{owner_id}:{desde and desde.isoformat()}:{hasta and hasta.isoformat()}"
+    body, headers = unpack_response(convocatorias_cache.get_or_load(key, load))
+    return body_response(req, body, headers)
 
 @router.get("/{conv_id}", response_model=ConvocatoriaOut)
-def detalle(conv_id: int, db: Session = Depends(get_db)):
-    c = db.get(Convocatoria, conv_id)
-    if not c: raise HTTPException(status_code=404, detail="No existe")
-    return c
+def detalle(conv_id: int, req: Request, db: Session = Depends(get_db)):
+    def load() -> bytes:
+        c = db.get(Convocatoria, conv_id)
+        if not c: raise HTTPException(status_code=404, detail="No existe")
+        body = render_json({"id": c.id, "titulo": c.titulo, "descripcion": c.descripcion, "owner_id": c.owner_id})
+        return pack_response(body, {"Cache-Control": "no-cache", "ETag": etag_for(body)})
+
+    body, headers = unpack_response(convocatorias_cache.get_or_load(f"detail:{conv_id}", load))
+    return body_response(req, body, headers)
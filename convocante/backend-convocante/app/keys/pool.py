@@ -0,0 +1,151 @@
+import time
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Deque, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from ..config import settings
+from .. import metrics
+from ..metrics import CRYPTO_LATENCY
+
+log = logging.getLogger(__name__)
+
+# Generar un par RSA 4096 es una búsqueda de primos: de cientos de ms a varios segundos, y
+# muy variable. Para que crear una convocatoria no lo pague, cada worker mantiene un pool
+# de KEY_POOL_SIZE pares ya generados y lo rellena en segundo plano en un pool de procesos
+# propio (KEYGEN_WORKERS). Si el pool se vacía, la petición genera la suya en ese mismo pool.
+
+_T_KEYGEN = CRYPTO_LATENCY.labels("rsa_keygen")
+
+KEY_POOL_REFILLED = metrics.counter("key_pool_refilled_total", "Pares RSA generados para el pool")
+KEY_POOL_TAKEN = metrics.counter("key_pool_taken_total", "Claves entregadas, del pool (hit) o generadas al vuelo (miss)",
+                                 ("result",))
+KEY_POOL_ERRORS = metrics.counter("key_pool_errors_total", "Fallos al generar claves para el pool")
+KEY_POOL_WAIT = metrics.histogram("key_pool_wait_seconds", "Espera de una petición hasta tener su par RSA")
+
+
+@dataclass(frozen=True)
+class GeneratedKey:
+    bits: int
+    public_pem: bytes
+    private_pem: bytes  # PKCS#8 cifrado con KEY_ENCRYPTION_SECRET: ni en memoria está en claro
+
+
+_PLACEHOLDERS = {"", "change-me", "cambia-esto"}
+
+
+def key_passphrase() -> bytes:
+    """
+    KEY_ENCRYPTION_SECRET, con la que se cifran las privadas. RuntimeError si falta, es un
+    valor de ejemplo o coincide con SECRET_TOKEN (que firma las cookies y suele quedarse
+    en su valor por defecto): `KeyPool.start` la comprueba y así el servidor no arranca.
+    """
+    secret = settings.KEY_ENCRYPTION_SECRET
+    if secret in _PLACEHOLDERS or secret == settings.SECRET_TOKEN:
+        raise RuntimeError("KEY_ENCRYPTION_SECRET sin definir, de ejemplo o igual a SECRET_TOKEN: "
+                           "hace falta un secreto propio para cifrar las claves privadas")
+    return secret.encode()
+
+
+def generate_keypair(bits: int, passphrase: bytes) -> Tuple[bytes, bytes, float]:
+    """Lado worker (proceso del pool): (pública PEM, privada PKCS#8 cifrada, segundos)."""
+    t0 = time.perf_counter()
+    priv = rsa.generate_private_key(public_exponent=65537, key_size=bits)
+    public_pem = priv.public_key().public_bytes(serialization.Encoding.PEM,
+                                                serialization.PublicFormat.SubjectPublicKeyInfo)
+    private_pem = priv.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.BestAvailableEncryption(passphrase))
+    return public_pem, private_pem, time.perf_counter() - t0
+
+
+class KeyPool:
+    def __init__(self, size: int, bits: int, workers: int):
+        self.size = size
+        self.bits = bits
+        self.workers = max(1, workers)
+        self._keys: Deque[GeneratedKey] = deque()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, como el pool de bcrypt: el servidor ya tiene hilos y fork podría heredar un lock tomado
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _generate(self) -> GeneratedKey:
+        public_pem, private_pem, seconds = await asyncio.get_running_loop().run_in_executor(
+            self._pool(), generate_keypair, self.bits, key_passphrase())
+        _T_KEYGEN.observe(seconds)
+        return GeneratedKey(self.bits, public_pem, private_pem)
+
+    async def _refill(self):
+        delay = 1.0
+        while True:
+            missing = self.size - len(self._keys)
+            if missing <= 0:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = await asyncio.gather(*(self._generate() for _ in range(min(missing, self.workers))),
+                                         return_exceptions=True)
+            for key in batch:
+                if isinstance(key, Exception):
+                    KEY_POOL_ERRORS.inc()
+                    log.warning("Pool de claves: fallo al generar (%s), reintento en %.1fs", key, delay)
+                else:
+                    self._keys.append(key)
+                    KEY_POOL_REFILLED.inc()
+            if any(isinstance(key, Exception) for key in batch):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+            else:
+                delay = 1.0
+
+    async def take(self) -> GeneratedKey:
+        """Un par del pool o, si está vacío, uno recién generado. Avisa al relleno."""
+        t0 = time.perf_counter()
+        try:
+            key = self._keys.popleft()
+            KEY_POOL_TAKEN.labels("hit").inc()
+        except IndexError:
+            KEY_POOL_TAKEN.labels("miss").inc()
+            key = await self._generate()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        KEY_POOL_WAIT.observe(time.perf_counter() - t0)
+        return key
+
+    async def start(self):
+        key_passphrase()  # sin secreto propio no se arranca
+        if self.size > 0 and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._refill())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)  # como mucho espera la clave en curso
+            self._executor = None
+
+
+key_pool = KeyPool(settings.KEY_POOL_SIZE, settings.KEY_BITS, settings.KEYGEN_WORKERS)
+metrics.gauge("key_pool_depth", "Pares RSA pregenerados disponibles en el pool", fn=lambda: {(): len(key_pool)})
+metrics.gauge("key_pool_target", "Tamaño objetivo del pool de claves (KEY_POOL_SIZE)", fn=lambda: {(): key_pool.size})
@@ -0,0 +1,97 @@
+import base64
+import hashlib
+from typing import Dict, Optional
+
+from cryptography.hazmat.primitives import serialization
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..cache import jwks_cache, keys_cache, pack_response, unpack_response
+from ..config import settings
+from ..etag import etag_for, render_json
+from ..models import CallKey
+
+# Registro de claves públicas de convocatoria, por key_id y por huella SHA-256. Una clave
+# publicada no cambia nunca: la PEM y sus metadatos se sirven con Cache-Control immutable
+# y se cachean (KEYS_CACHE_TTL) sin invalidación. Solo el JWKS, que crece con cada clave
+# nueva, se invalida al crear una y caduca en JWKS_MAX_AGE en los clientes.
+#
+# Los valores cacheados son respuestas ya serializadas (pack_response): un acierto no
+# toca la base ni vuelve a serializar.
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_COLUMNS = (CallKey.key_id, CallKey.call_id, CallKey.bits, CallKey.fingerprint, CallKey.public_pem,
+            CallKey.created_at)
+
+
+class KeyNotFound(Exception):
+    pass
+
+
+def fingerprint(public_pem: bytes) -> str:
+    """SHA-256 (hex) de la clave pública en DER (SubjectPublicKeyInfo): no depende del formato del PEM."""
+    der = serialization.load_pem_public_key(public_pem).public_bytes(
+        serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).hexdigest()
+
+
+def _b64url_uint(n: int) -> str:
+    return base64.urlsafe_b64encode(n.to_bytes((n.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+
+def jwk(row) -> Dict[str, str]:
+    numbers = serialization.load_pem_public_key(row.public_pem.encode()).public_numbers()
+    return {"kty": "RSA", "kid": row.key_id, "use": "enc", "alg": "RSA-OAEP-256",
+            "n": _b64url_uint(numbers.n), "e": _b64url_uint(numbers.e),
+            "call_id": row.call_id, "fingerprint": _fingerprint_of(row)}
+
+
+def _fingerprint_of(row) -> str:
+    # claves creadas antes de la columna fingerprint
+    return row.fingerprint or fingerprint(row.public_pem.encode())
+
+
+def _metadata(row) -> dict:
+    return {"call_id": row.call_id, "key_id": row.key_id, "bits": row.bits,
+            "fingerprint": _fingerprint_of(row), "created_at": row.created_at}
+
+
+def _row(db: Session, where):
+    row = db.execute(select(*_COLUMNS).where(where)).first()
+    if row is None:
+        raise KeyNotFound()
+    return row
+
+
+def public_pem(db: Session, key_id: str):
+    """(cuerpo, cabeceras) de la PEM pública de `key_id`; KeyNotFound si no existe."""
+    def load() -> bytes:
+        row = _row(db, CallKey.key_id == key_id)
+        fp = _fingerprint_of(row)
+        return pack_response(row.public_pem.encode(), {"Cache-Control": IMMUTABLE, "ETag": f'"{fp}"',
+                                                       "X-Key-Fingerprint": fp})
+    return unpack_response(keys_cache.get_or_load(f"pem:{key_id}", load))
+
+
+def metadata(db: Session, key_id: Optional[str] = None, fp: Optional[str] = None):
+    """(cuerpo JSON, cabeceras) de una clave buscada por key_id o por huella."""
+    def load() -> bytes:
+        row = _row(db, CallKey.key_id == key_id if key_id is not None else CallKey.fingerprint == fp)
+        body = render_json(_metadata(row))
+        return pack_response(body, {"Cache-Control": IMMUTABLE, "ETag": etag_for(body)})
+    cache_key = f"meta:{key_id}" if key_id is not None else f"fp:{fp}"
+    return unpack_response(keys_cache.get_or_load(cache_key, load))
+
+
+def jwks(db: Session, call_id: Optional[str] = None):
+    """JWKS con todas las claves (o las de `call_id`), de la más reciente a la más antigua."""
+    def load() -> bytes:
+        q = select(*_COLUMNS)
+        if call_id is not None:
+            q = q.where(CallKey.call_id == call_id)
+        rows = db.execute(q.order_by(CallKey.created_at.desc())).all()
+        body = render_json({"keys": [jwk(r) for r in rows]})
+        return pack_response(body, {"Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE}",
+                                    "ETag": etag_for(body)})
+    return unpack_response(jwks_cache.get_or_load(f"jwks:{call_id}", load))
@@ -0,0 +1,86 @@
+import re
+import secrets
+import unicodedata
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from ..db import get_db, get_async_db
+from ..models import CallKey, Role
+from ..schemas import CallIn, CallOut
+from ..cache import jwks_cache
+from ..etag import body_response
+from ..auth.router import get_current_user_async
+from . import registry
+from .pool import key_pool
+
+calls_router = APIRouter(prefix="/calls", tags=["keys"])
+router = APIRouter(prefix="/keys", tags=["keys"])
+
+def _slug(call_id: str) -> str:
+    ascii_id = unicodedata.normalize("NFKD", call_id).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", ascii_id.lower()).strip("-")[:40] or "x"
+
+def new_key_id(call_id: str) -> str:
+    # call-<slug>-YYYYmmdd-HHMMSS-xxxx: legible en los meta.json y único sin consultar la base
+    return f"call-{_slug(call_id)}-{datetime.utcnow():%Y%m%d-%H%M%S}-{secrets.token_hex(2)}"
+
+async def _convocante(req: Request, db: AsyncSession):
+    user = await get_current_user_async(req, db)
+    if not user or user.role != Role.CONVOCANTE:
+        raise HTTPException(status_code=403, detail="Solo convocantes")
+    return user
+
+@calls_router.post("", response_model=CallOut)
+async def crear_call(body: CallIn, req: Request, db: AsyncSession = Depends(get_async_db)):
+    """Par RSA nuevo para `call_id` (sale del pool de claves pregeneradas)."""
+    user = await _convocante(req, db)
+    key = await key_pool.take()
+    ck = CallKey(key_id=new_key_id(body.call_id), call_id=body.call_id, owner_id=user.id, bits=key.bits,
+                 public_pem=key.public_pem.decode(), fingerprint=registry.fingerprint(key.public_pem),
+                 private_pem=key.private_pem)
+    db.add(ck); await db.commit(); await db.refresh(ck)
+    await run_in_threadpool(jwks_cache.invalidate)
+    return ck
+
+@calls_router.get("", response_model=list[CallOut])
+async def listar_calls(call_id: str | None = None, db: AsyncSession = Depends(get_async_db)):
+    q = select(CallKey.call_id, CallKey.key_id, CallKey.bits, CallKey.fingerprint, CallKey.created_at)
+    if call_id is not None:
+        q = q.where(CallKey.call_id == call_id)
+    rows = (await db.execute(q.order_by(CallKey.created_at.desc()))).all()
+    return [dict(r._mapping) for r in rows]
+
+# Rutas públicas del registro: sin sesión, cacheables por proxies/CDN y con If-None-Match -> 304
+
+@router.get("/jwks.json")
+def jwks(req: Request, call_id: str | None = None, db: Session = Depends(get_db)):
+    """Claves públicas en formato JWKS (`kid` = key_id), opcionalmente solo las de `call_id`."""
+    body, headers = registry.jwks(db, call_id)
+    return body_response(req, body, headers, media_type="application/jwk-set+json")
+
+@router.get("/fingerprint/{fp}", response_model=CallOut)
+def por_huella(fp: str, req: Request, db: Session = Depends(get_db)):
+    try:
+        body, headers = registry.metadata(db, fp=fp.lower())
+    except registry.KeyNotFound:
+        raise HTTPException(status_code=404, detail="No existe")
+    return body_response(req, body, headers)
+
+@router.get("/{key_id}", response_model=CallOut)
+def clave(key_id: str, req: Request, db: Session = Depends(get_db)):
+    try:
+        body, headers = registry.metadata(db, key_id=key_id)
+    except registry.KeyNotFound:
+        raise HTTPException(status_code=404, detail="No existe")
+    return body_response(req, body, headers)
+
+@router.get("/{key_id}/rsa_pub.pem")
+def clave_publica(key_id: str, req: Request, db: Session = Depends(get_db)):
+    try:
+        body, headers = registry.public_pem(db, key_id)
+    except registry.KeyNotFound:
+        raise HTTPException(status_code=404, detail="No existe")
+    return body_response(req, body, headers, media_type="application/x-pem-file")
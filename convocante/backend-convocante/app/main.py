@@ -1,13 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .db import Base, engine
+from .metrics import router as metrics_router, MetricsMiddleware
 from .auth.router import router as auth_router
 from .convocatorias.router import router as conv_router
 from .submissions.router import router as sub_router
 from .ws.router import router as ws_router
+from .keys.router import calls_router, router as keys_router
+from .keys.pool import key_pool
+from .ws.hub import hub
+from .auth import password
 
-app = FastAPI(title=settings.APP_NAME + " - CONVOCANTE")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await hub.start()  # LISTEN del backend de broadcast (WS_BACKEND)
+    await key_pool.start()  # relleno en segundo plano del pool de claves RSA
+    yield
+    await key_pool.stop()
+    await hub.stop()
+    password.shutdown()
+
+app = FastAPI(title=settings.APP_NAME + " - CONVOCANTE", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,11 +30,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Key-Fingerprint"],
 )
+app.add_middleware(MetricsMiddleware)
 
 Base.metadata.create_all(bind=engine)
 
 app.include_router(auth_router, prefix="/api")
 app.include_router(conv_router, prefix="/api")
 app.include_router(sub_router, prefix="/api")
+app.include_router(calls_router, prefix="/api")
+app.include_router(keys_router, prefix="/api")
 app.include_router(ws_router)
+app.include_router(metrics_router)
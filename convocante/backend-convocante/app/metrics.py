@@ -0,0 +1,310 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+# Registro mínimo de métricas en formato de texto de Prometheus (sin dependencia de
+# prometheus_client). Cada serie con etiquetas es un "hijo" cacheado: en la ruta
+# caliente `observe`/`inc` es un bisect + sumas bajo un lock por serie.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: se esperaban etiquetas {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, names, values):
+        return [f"{name}{_fmt_labels(names, values)} {_fmt_num(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+
+class Gauge(_Metric):
+    """Gauge normal, o calculado al exportar si se pasa `fn` (devuelve {etiquetas: valor})."""
+    kind = "gauge"
+    _new_child = _GaugeChild
+
+    def __init__(self, name, help, labelnames=(), fn: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def collect(self) -> List[str]:
+        if self.fn is None:
+            return super().collect()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.fn().items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_num(value)}")
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+    def render(self, name, names, values):
+        lines, acc = [], 0
+        for le, n in zip(list(self.buckets) + [float("inf")], self.counts):
+            acc += n
+            le_label = 'le="%s"' % _fmt_num(le)
+            lines.append(f"{name}_bucket{_fmt_labels(names, values, le_label)} {acc}")
+        lab = _fmt_labels(names, values)
+        lines.append(f"{name}_sum{lab} {_fmt_num(self.sum)}")
+        lines.append(f"{name}_count{lab} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = (), fn=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames, fn))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456, 1073741824)
+
+HTTP_LATENCY = histogram("http_request_duration_seconds", "Latencia por ruta", ("method", "route", "status"))
+HTTP_REQUEST_SIZE = histogram("http_request_size_bytes", "Tamaño del cuerpo de la petición", ("method", "route"), SIZE_BUCKETS)
+HTTP_RESPONSE_SIZE = histogram("http_response_size_bytes", "Tamaño del cuerpo de la respuesta", ("method", "route"), SIZE_BUCKETS)
+HTTP_DB_TIME = histogram("http_request_db_seconds", "Tiempo total en SQL por petición", ("method", "route"))
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "Peticiones HTTP en curso")
+CRYPTO_LATENCY = histogram("crypto_op_duration_seconds", "Duración de cada primitiva criptográfica", ("op",))
+
+# Acumulador de tiempo SQL de la petición en curso. Lo crea el middleware y lo suman los
+# eventos de cursor de db.py; run_in_threadpool copia el contexto, así que también
+# cuenta lo que hacen los handlers síncronos.
+request_db_time: ContextVar[Optional[List[float]]] = ContextVar("request_db_time", default=None)
+
+
+def add_db_time(seconds: float):
+    acc = request_db_time.get()
+    if acc is not None:
+        acc[0] += seconds
+
+
+def route_template(scope) -> str:
+    """
+    Plantilla de la ruta que atendió la petición: `root_path` (prefijo de montaje o de
+    proxy) + prefijo de `include_router` + `path_format` de la ruta. Según la versión de
+    FastAPI, `path_format` puede venir sin el prefijo de `include_router`; ese prefijo es
+    la parte de la URL que queda antes de donde casa `path_regex`, así que solo puede ser
+    uno de los prefijos registrados, también con rutas `{name:path}` de varios segmentos.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    regex = getattr(route, "path_regex", None)
+    if not template or regex is None:
+        return "unmatched"
+    root = scope.get("root_path", "").rstrip("/")
+    path = scope["path"]
+    if root and path.startswith(root):
+        path = path[len(root):]
+    cuts = [0] + [i for i, c in enumerate(path) if c == "/" and i]
+    prefix = next((path[:i] for i in cuts if regex.match(path[i:])), "")
+    return root + prefix + template
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware, que copia el cuerpo y añade una tarea
+    por petición). La etiqueta `route` es la plantilla de la ruta (`/api/submissions/{conv_id}`),
+    no la URL, para no disparar la cardinalidad; lo que no casa con ninguna ruta va a "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        req_bytes = resp_bytes = 0
+        status = 500
+
+        async def receive_counting():
+            nonlocal req_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                req_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_counting(message):
+            nonlocal resp_bytes, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                resp_bytes += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels()
+        in_flight.inc()
+        db_time = [0.0]
+        token = request_db_time.set(db_time)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive_counting, send_counting)
+        finally:
+            elapsed = time.perf_counter() - t0
+            request_db_time.reset(token)
+            in_flight.dec()
+            path = route_template(scope)
+            method = scope["method"]
+            HTTP_LATENCY.labels(method, path, status).observe(elapsed)
+            HTTP_REQUEST_SIZE.labels(method, path).observe(req_bytes)
+            HTTP_RESPONSE_SIZE.labels(method, path).observe(resp_bytes)
+            HTTP_DB_TIME.labels(method, path).observe(db_time[0])
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, LargeBinary
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Enum, ForeignKey, DateTime, LargeBinary, Index
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from .db import Base
 import enum
@@ -19,35 +19,82 @@ class User(Base):
     convocatorias = relationship("Convocatoria", back_populates="owner")
     submissions   = relationship("Submission", back_populates="licitante")
 
+class UserSession(Base):
+    # Sesión de login: la cookie firmada solo lleva el `sid`; logout la revoca
+    __tablename__ = "sessions"
+    sid = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+
 class Convocatoria(Base):
     __tablename__ = "convocatorias"
     id = Column(Integer, primary_key=True)
     titulo = Column(String(200), nullable=False)
     descripcion = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     owner = relationship("User", back_populates="convocatorias")
+    # listado por dueño paginado por id (keyset)
+    __table_args__ = (Index("ix_convocatorias_owner_id_id", "owner_id", "id"),)
 
     submissions = relationship("Submission", back_populates="convocatoria")
 
+class CallKey(Base):
+    # Par RSA de una convocatoria (create_call.sh). La privada va en PKCS#8 cifrado con KEY_ENCRYPTION_SECRET
+    __tablename__ = "call_keys"
+    key_id = Column(String(100), primary_key=True)
+    call_id = Column(String(100), nullable=False, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    bits = Column(Integer, nullable=False)
+    public_pem = Column(Text, nullable=False)
+    fingerprint = Column(String(64), unique=True, index=True)  # SHA-256 (hex) de la pública en DER
+    private_pem = deferred(Column(LargeBinary, nullable=False))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
 class Submission(Base):
     __tablename__ = "submissions"
     id = Column(Integer, primary_key=True)
+    convocatoria_id = Column(Integer, ForeignKey("convocatorias.id"), nullable=False, index=True)
+    licitante_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # payload_sha256 es además la referencia al ciphertext en el blob store
+    payload_sha256 = Column(String(64), index=True)
+    content_zip_sha256 = Column(String(64))
+    sealed_zip_sha256 = Column(String(64))
+
+    # Columnas binarias diferidas: cargar una fila (o recorrer una relación) no las trae;
+    # se leen en bloque ("envelope") solo cuando se accede a alguna de ellas.
+    wrapped_key = deferred(Column(LargeBinary, nullable=False), group="envelope")
+    nonce       = deferred(Column(LargeBinary, nullable=False), group="envelope")
+    tag         = deferred(Column(LargeBinary, nullable=False), group="envelope")
+    ciphertext_size = Column(BigInteger)
+    ciphertext  = deferred(Column(LargeBinary))  # solo filas anteriores al blob store
+
+    signer_pk_hex = Column(String(64))
+    signature     = deferred(Column(LargeBinary), group="envelope")
+
+    convocatoria = relationship("Convocatoria", back_populates="submissions")
+    licitante    = relationship("User", back_populates="submissions")
+
+class Upload(Base):
+    """Subida por trozos en curso: el ciphertext vive en UPLOAD_DIR/<id>.part hasta completarla."""
+    __tablename__ = "uploads"
+    id = Column(String(32), primary_key=True)
     convocatoria_id = Column(Integer, ForeignKey("convocatorias.id"), nullable=False)
     licitante_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    payload_sha256 = Column(String(64))
+    total_size = Column(BigInteger, nullable=False)
+    payload_sha256 = Column(String(64), nullable=False)
     content_zip_sha256 = Column(String(64))
     sealed_zip_sha256 = Column(String(64))
 
     wrapped_key = Column(LargeBinary, nullable=False)
     nonce       = Column(LargeBinary, nullable=False)
     tag         = Column(LargeBinary, nullable=False)
-    ciphertext  = Column(LargeBinary, nullable=False)
 
     signer_pk_hex = Column(String(64))
     signature     = Column(LargeBinary)
-
-    convocatoria = relationship("Convocatoria", back_populates="submissions")
-    licitante    = relationship("User", back_populates="submissions")
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Dict
+from datetime import datetime
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -31,6 +32,15 @@ class ConvocatoriaOut(BaseModel):
     class Config:
         orm_mode = True
 
+class ConvocatoriaSummary(BaseModel):
+    """Fila del listado: sin `descripcion` (Text), que solo trae el detalle."""
+    id: int
+    titulo: str
+    owner_id: int
+    created_at: Optional[datetime] = None
+    class Config:
+        orm_mode = True
+
 class SubmissionIn(BaseModel):
     payload_sha256: Optional[str] = None
     content_zip_sha256: Optional[str] = None
@@ -48,3 +58,78 @@ class SubmissionOut(BaseModel):
     licitante_id: int
     class Config:
         orm_mode = True
+
+class SubmissionSummary(BaseModel):
+    id: int
+    convocatoria_id: int
+    licitante_id: int
+    created_at: Optional[datetime] = None
+    payload_sha256: Optional[str] = None
+    content_zip_sha256: Optional[str] = None
+    sealed_zip_sha256: Optional[str] = None
+    ciphertext_size: Optional[int] = None
+    signer_pk_hex: Optional[str] = None
+    class Config:
+        orm_mode = True
+
+class SubmissionPage(BaseModel):
+    items: List[SubmissionSummary]
+    next_cursor: Optional[int] = None
+
+class PackageEntry(BaseModel):
+    name: str
+    size: int
+    sha256: Optional[str] = None
+
+class PackageEntries(BaseModel):
+    format: int  # 1 = sealed_base.zip en un solo GCM; 2 = contenedor por trozos
+    entries: List[PackageEntry]
+
+class OpeningResult(BaseModel):
+    status: str  # pending | ok | error
+    bytes: Optional[int] = None
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class OpeningJobOut(BaseModel):
+    id: str
+    convocatoria_id: int
+    state: str
+    total: int
+    done: int
+    failed: int
+    bytes_out: int
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    results: Dict[int, OpeningResult] = {}
+    class Config:
+        orm_mode = True
+
+class UploadInit(BaseModel):
+    total_size: int = Field(gt=0)
+    payload_sha256: str = Field(min_length=64, max_length=64)
+    content_zip_sha256: Optional[str] = None
+    sealed_zip_sha256: Optional[str] = None
+    wrapped_key_b64: str
+    nonce_b64: str
+    tag_b64: str
+    signer_pk_hex: Optional[str] = None
+    signature_b64: Optional[str] = None
+
+class UploadOut(BaseModel):
+    id: str
+    offset: int
+    total_size: int
+
+class CallIn(BaseModel):
+    call_id: str = Field(min_length=1, max_length=100)
+
+class CallOut(BaseModel):
+    call_id: str
+    key_id: str
+    bits: int
+    fingerprint: Optional[str] = None
+    created_at: datetime
+    class Config:
+        orm_mode = True
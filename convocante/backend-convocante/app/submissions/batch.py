@@ -0,0 +1,160 @@
+import io
+import os
+import time
+import secrets
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import serialization
+from sqlalchemy.orm import undefer_group
+
+from ..config import settings
+from ..db import SessionLocal
+from ..models import Submission
+from ..blobstore import get_blob_store
+from ..crypto_utils import (rsa_unwrap, aes_gcm_decrypt_stream, load_private_key_cached, ChunkedAeadReader,
+                            chunked_to_zip)
+from ..sbx2 import is_chunked
+
+# Apertura masiva de propuestas: un hilo por trabajo reparte las propuestas de la
+# convocatoria en un pool de procesos; cada proceso parsea la clave RSA una sola vez
+# (initializer) y descifra por bloques directo a OPEN_DIR/<conv_id>/<job_id>/<sub_id>.zip.
+# Cada trabajo escribe en su carpeta, así que dos trabajos de la misma convocatoria (p. ej.
+# en workers distintos) no pisan los .part/.zip del otro. El estado de los trabajos vive
+# en memoria del proceso que los lanzó: con varios workers de uvicorn, el GET de estado y
+# de resultado tiene que llegar a ese mismo proceso.
+
+@dataclass
+class OpeningJob:
+    id: str
+    convocatoria_id: int
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    bytes_out: int = 0
+    state: str = "pending"  # pending | running | done | error
+    error: Optional[str] = None
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    results: Dict[int, dict] = field(default_factory=dict)
+
+class JobAlreadyRunning(Exception):
+    """Ya hay un trabajo sin terminar para la convocatoria (en este proceso)."""
+
+    def __init__(self, job_id: str):
+        super().__init__(job_id)
+        self.job_id = job_id
+
+_jobs: Dict[str, OpeningJob] = {}
+_jobs_lock = threading.Lock()
+
+def _prune_jobs():
+    # los trabajos terminados se olvidan pasado OPEN_JOB_TTL (los .zip siguen en OPEN_DIR)
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.OPEN_JOB_TTL)
+    with _jobs_lock:
+        for job_id in [j.id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del _jobs[job_id]
+
+def get_job(job_id: str) -> Optional[OpeningJob]:
+    _prune_jobs()
+    return _jobs.get(job_id)
+
+def output_path(conv_id: int, job_id: str, sub_id: int) -> Path:
+    return Path(settings.OPEN_DIR) / str(conv_id) / job_id / f"{sub_id}.zip"
+
+
+# ---- Lado worker (proceso del pool) ----
+_worker_key = None
+
+def _init_worker(private_pem: bytes):
+    global _worker_key
+    _worker_key = serialization.load_pem_private_key(private_pem, password=None)
+
+def _open_one(sub_id: int, wrapped_key: bytes, nonce: bytes, tag: bytes,
+              payload_sha256: str, legacy_ciphertext: Optional[bytes], dest: str) -> dict:
+    dest = Path(dest)
+    part = dest.with_suffix(".part")
+    t0 = time.perf_counter()
+    try:
+        aes_key = rsa_unwrap(_worker_key, wrapped_key)
+        src = io.BytesIO(legacy_ciphertext) if legacy_ciphertext is not None else get_blob_store().open(payload_sha256)
+        with src, open(part, "wb") as dst:
+            if is_chunked(src):  # v2: ZIP con las entradas del contenedor
+                n = chunked_to_zip(ChunkedAeadReader(src, aes_key), dst)
+            else:
+                n = aes_gcm_decrypt_stream(aes_key, nonce, tag, src, dst)
+        os.replace(part, dest)  # solo aparece el .zip si el tag es válido
+        return {"status": "ok", "bytes": n, "seconds": round(time.perf_counter() - t0, 3)}
+    except InvalidTag:
+        part.unlink(missing_ok=True)
+        return {"status": "error", "error": "Tag GCM inválido"}
+    except Exception as e:
+        part.unlink(missing_ok=True)
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+
+# ---- Lado servidor ----
+def _run(job: OpeningJob, private_pem: bytes, workers: int):
+    try:
+        with SessionLocal() as db:
+            rows = (db.query(Submission)
+                      .options(undefer_group("envelope"))
+                      .filter(Submission.convocatoria_id == job.convocatoria_id)
+                      .order_by(Submission.id.asc())
+                      .all())
+            tasks = [(s.id, s.wrapped_key, s.nonce, s.tag, s.payload_sha256,
+                      s.ciphertext if s.ciphertext_size is None else None) for s in rows]
+        job.total = len(tasks)
+        job.results = {t[0]: {"status": "pending"} for t in tasks}
+        out_dir = output_path(job.convocatoria_id, job.id, 0).parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+        job.state = "running"
+
+        # spawn, como los pools de bcrypt y de claves: fork desde un servidor con hilos puede heredar un lock tomado
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(private_pem,),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futs = {pool.submit(_open_one, *t, str(output_path(job.convocatoria_id, job.id, t[0]))): t[0] for t in tasks}
+            for fut in as_completed(futs):
+                sub_id = futs[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:  # el proceso murió
+                    res = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+                job.results[sub_id] = res
+                if res["status"] == "ok":
+                    job.done += 1
+                    job.bytes_out += res["bytes"]
+                else:
+                    job.failed += 1
+        job.state = "done"
+    except Exception as e:
+        job.state = "error"
+        job.error = f"{type(e).__name__}: {e}"
+    finally:
+        job.finished_at = datetime.utcnow()
+
+def start_opening(conv_id: int, private_pem: bytes, workers: Optional[int] = None) -> OpeningJob:
+    """
+    Lanza el trabajo. `workers` (de la petición) se acota a [1, número de CPUs]; sin él se
+    usa OPEN_WORKERS. JobAlreadyRunning si la convocatoria ya tiene uno en curso.
+    """
+    # Falla rápido (en la petición) si la clave no se puede parsear.
+    load_private_key_cached(private_pem)
+    _prune_jobs()
+    job = OpeningJob(id=secrets.token_hex(8), convocatoria_id=conv_id)
+    with _jobs_lock:
+        running = next((j for j in _jobs.values() if j.convocatoria_id == conv_id and j.finished_at is None), None)
+        if running is not None:
+            raise JobAlreadyRunning(running.id)
+        _jobs[job.id] = job
+    cpus = os.cpu_count() or 1
+    workers = min(max(workers, 1), cpus) if workers else (settings.OPEN_WORKERS or cpus)
+    threading.Thread(target=_run, args=(job, private_pem, workers), daemon=True,
+                     name=f"opening-{job.id}").start()
+    return job
@@ -1,50 +1,190 @@
+import os
 import base64
-from fastapi import APIRouter, Depends, HTTPException, Request
+import secrets
+from pydantic import ValidationError
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from cryptography.exceptions import InvalidTag
 from sqlalchemy.orm import Session
-from ..db import get_db
-from ..models import Submission, Convocatoria, User, Role
-from ..schemas import SubmissionIn, SubmissionOut
-from ..auth.router import get_current_user
-from .service import decrypt_envelope, verify_optional_signature
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from ..db import get_db, get_async_db
+from ..models import Submission, Convocatoria, User, Role, Upload
+from ..schemas import (SubmissionIn, SubmissionOut, SubmissionPage, OpeningJobOut, UploadInit, UploadOut,
+                       PackageEntries)
+from ..auth.router import get_current_user, get_current_user_async
+from ..executors import run_crypto
+from ..config import settings
+from ..blobstore import get_blob_store
+from ..crypto_utils import CHUNK, sha256_bytes
+from .service import b64d, decrypt_submission_to_spool, open_package, verify_optional_signature
+from . import uploads, batch
 
 router = APIRouter(prefix="/submissions", tags=["submissions"])
 
-@router.post("/{conv_id}", response_model=SubmissionOut)
-def subir(conv_id: int, body: SubmissionIn, req: Request, db: Session = Depends(get_db)):
-    user = get_current_user(req, db)
-    # Permitir que el licitante suba incluso desde este backend si quieren unificar URL:
+def _decode_submission(raw: bytes) -> tuple[SubmissionIn, dict]:
+    """
+    Parseo del JSON, base64, firma Ed25519 y SHA-256 del payload. Todo es CPU sobre
+    varios MB, así que corre en el crypto_executor y no en el event loop.
+    """
+    try:
+        body = SubmissionIn.parse_raw(raw)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    ciphertext = b64d(body.ciphertext_b64)
+    signature  = b64d(body.signature_b64) if body.signature_b64 else None
+    if not verify_optional_signature(body.signer_pk_hex, ciphertext, signature):
+        raise HTTPException(status_code=400, detail="Firma inválida")
+    payload_sha256 = sha256_bytes(ciphertext).hex()
+    if body.payload_sha256 and body.payload_sha256.lower() != payload_sha256:
+        raise HTTPException(status_code=400, detail="payload_sha256 no coincide")
+    return body, dict(
+        wrapped_key=b64d(body.wrapped_key_b64),
+        nonce=b64d(body.nonce_b64),
+        tag=b64d(body.tag_b64),
+        ciphertext=ciphertext,
+        signature=signature,
+        payload_sha256=payload_sha256,
+    )
+
+@router.post("/{conv_id}", response_model=SubmissionOut,
+             openapi_extra={"requestBody": {"required": True,
+                                            "content": {"application/json": {"schema": SubmissionIn.schema()}}}})
+async def subir(conv_id: int, req: Request, db: AsyncSession = Depends(get_async_db)):
+    # El cuerpo se lee crudo y se valida en _decode_submission: con `body: SubmissionIn`
+    # FastAPI parsearía el JSON (el ciphertext en base64) dentro del event loop.
+    user = await get_current_user_async(req, db)
     if not user or user.role != Role.LICITANTE:
         raise HTTPException(status_code=403, detail="Solo licitantes")
-    conv = db.get(Convocatoria, conv_id)
+    conv = await db.get(Convocatoria, conv_id)
     if not conv: raise HTTPException(status_code=404, detail="Convocatoria no existe")
 
-    import base64
-    def b64d(s: str) -> bytes: return base64.b64decode(s)
-    wrapped_key = b64d(body.wrapped_key_b64)
-    nonce       = b64d(body.nonce_b64)
-    tag         = b64d(body.tag_b64)
-    ciphertext  = b64d(body.ciphertext_b64)
-    signature   = b64d(body.signature_b64) if body.signature_b64 else None
-
-    if not verify_optional_signature(body.signer_pk_hex, ciphertext, signature):
-        raise HTTPException(status_code=400, detail="Firma inválida")
+    body, d = await run_crypto(_decode_submission, await req.body())
+    await run_in_threadpool(get_blob_store().put_bytes, d["ciphertext"])
 
     sub = Submission(
         convocatoria_id=conv.id,
         licitante_id=user.id,
-        payload_sha256=body.payload_sha256,
+        payload_sha256=d["payload_sha256"],
         content_zip_sha256=body.content_zip_sha256,
         sealed_zip_sha256=body.sealed_zip_sha256,
-        wrapped_key=wrapped_key,
-        nonce=nonce,
-        tag=tag,
-        ciphertext=ciphertext,
+        wrapped_key=d["wrapped_key"],
+        nonce=d["nonce"],
+        tag=d["tag"],
+        ciphertext_size=len(d["ciphertext"]),
+        signer_pk_hex=body.signer_pk_hex,
+        signature=d["signature"]
+    )
+    db.add(sub); await db.commit()
+    return sub
+
+
+async def _get_upload(req: Request, db: AsyncSession, conv_id: int, upload_id: str) -> Upload:
+    user = await get_current_user_async(req, db)
+    if not user or user.role != Role.LICITANTE:
+        raise HTTPException(status_code=403, detail="Solo licitantes")
+    up = await db.get(Upload, upload_id)
+    if not up or up.convocatoria_id != conv_id or up.licitante_id != user.id:
+        raise HTTPException(status_code=404, detail="Subida no existe")
+    return up
+
+@router.post("/{conv_id}/uploads", response_model=UploadOut)
+async def iniciar_subida(conv_id: int, body: UploadInit, req: Request, db: AsyncSession = Depends(get_async_db)):
+    """Abre una subida por trozos: metadatos aquí, ciphertext crudo con PUT .../uploads/{id}?offset=N."""
+    user = await get_current_user_async(req, db)
+    if not user or user.role != Role.LICITANTE:
+        raise HTTPException(status_code=403, detail="Solo licitantes")
+    conv = await db.get(Convocatoria, conv_id)
+    if not conv: raise HTTPException(status_code=404, detail="Convocatoria no existe")
+    if body.total_size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Propuesta demasiado grande")
+
+    up = Upload(
+        id=secrets.token_hex(16),
+        convocatoria_id=conv.id,
+        licitante_id=user.id,
+        total_size=body.total_size,
+        payload_sha256=body.payload_sha256.lower(),
+        content_zip_sha256=body.content_zip_sha256,
+        sealed_zip_sha256=body.sealed_zip_sha256,
+        wrapped_key=b64d(body.wrapped_key_b64),
+        nonce=b64d(body.nonce_b64),
+        tag=b64d(body.tag_b64),
         signer_pk_hex=body.signer_pk_hex,
-        signature=signature
+        signature=b64d(body.signature_b64) if body.signature_b64 else None,
     )
-    db.add(sub); db.commit(); db.refresh(sub)
+    db.add(up); await db.commit()
+    await run_in_threadpool(uploads.create, up.id)
+    return UploadOut(id=up.id, offset=0, total_size=up.total_size)
+
+@router.get("/{conv_id}/uploads/{upload_id}", response_model=UploadOut)
+async def estado_subida(conv_id: int, upload_id: str, req: Request, db: AsyncSession = Depends(get_async_db)):
+    """Offset desde el que reanudar."""
+    up = await _get_upload(req, db, conv_id, upload_id)
+    return UploadOut(id=up.id, offset=await run_in_threadpool(uploads.received_bytes, up.id), total_size=up.total_size)
+
+@router.put("/{conv_id}/uploads/{upload_id}", response_model=UploadOut)
+async def subir_trozo(conv_id: int, upload_id: str, offset: int, req: Request,
+                      db: AsyncSession = Depends(get_async_db)):
+    """Cuerpo = bytes crudos del ciphertext desde `offset`. Cabecera opcional X-Chunk-Sha256."""
+    up = await _get_upload(req, db, conv_id, upload_id)
+    async with uploads.locked(up.id):
+        pos = await uploads.append_chunk(up.id, offset, up.total_size, req.stream(),
+                                         req.headers.get("X-Chunk-Sha256"))
+    return UploadOut(id=up.id, offset=pos, total_size=up.total_size)
+
+@router.post("/{conv_id}/uploads/{upload_id}/complete", response_model=SubmissionOut)
+async def completar_subida(conv_id: int, upload_id: str, req: Request, db: AsyncSession = Depends(get_async_db)):
+    up = await _get_upload(req, db, conv_id, upload_id)
+    async with uploads.locked(up.id):
+        path = await run_crypto(uploads.finalize, up.id, up.total_size, up.payload_sha256,
+                                up.signer_pk_hex, up.signature)
+        await run_in_threadpool(get_blob_store().put_file, path, up.payload_sha256)
+
+    sub = Submission(
+        convocatoria_id=up.convocatoria_id,
+        licitante_id=up.licitante_id,
+        payload_sha256=up.payload_sha256,
+        content_zip_sha256=up.content_zip_sha256,
+        sealed_zip_sha256=up.sealed_zip_sha256,
+        wrapped_key=up.wrapped_key,
+        nonce=up.nonce,
+        tag=up.tag,
+        ciphertext_size=up.total_size,
+        signer_pk_hex=up.signer_pk_hex,
+        signature=up.signature
+    )
+    db.add(sub); await db.delete(up); await db.commit()
+    await run_in_threadpool(uploads.discard, upload_id)
     return sub
 
+@router.delete("/{conv_id}/uploads/{upload_id}")
+async def cancelar_subida(conv_id: int, upload_id: str, req: Request, db: AsyncSession = Depends(get_async_db)):
+    up = await _get_upload(req, db, conv_id, upload_id)
+    await db.delete(up); await db.commit()
+    await run_in_threadpool(uploads.discard, upload_id)
+    return {"ok": True}
+
+@router.get("/{conv_id}", response_model=SubmissionPage)
+def listar(conv_id: int, req: Request, cursor: int | None = None, limit: int = Query(50, ge=1, le=500),
+           db: Session = Depends(get_db)):
+    """Propuestas de una convocatoria (solo metadatos), paginadas por id: ?cursor=<next_cursor>."""
+    user = get_current_user(req, db)
+    if not user or user.role != Role.CONVOCANTE:
+        raise HTTPException(status_code=403, detail="Solo convocantes")
+    conv = db.get(Convocatoria, conv_id)
+    if not conv: raise HTTPException(status_code=404, detail="Convocatoria no existe")
+    if conv.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="No es tu convocatoria")
+
+    q = db.query(Submission).filter(Submission.convocatoria_id == conv_id)
+    if cursor is not None:
+        q = q.filter(Submission.id > cursor)
+    rows = q.order_by(Submission.id.asc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return {"items": rows[:limit], "next_cursor": next_cursor}
+
 @router.post("/{conv_id}/{sub_id}/decrypt")
 def decrypt(conv_id: int, sub_id: int, private_key_pem_b64: str, req: Request, db: Session = Depends(get_db)):
     user = get_current_user(req, db)
@@ -56,5 +196,136 @@ def decrypt(conv_id: int, sub_id: int, private_key_pem_b64: str, req: Request, d
         raise HTTPException(status_code=404, detail="Submission no existe")
     private_pem = base64.b64decode(private_key_pem_b64)
 
-    plaintext = decrypt_envelope(private_pem, sub.wrapped_key, sub.nonce, sub.tag, sub.ciphertext)
+    with decrypt_submission_to_spool(private_pem, sub) as spool:  # v1 o v2
+        plaintext = spool.read()
     return {"plaintext_b64": base64.b64encode(plaintext).decode()}
+
+@router.post("/{conv_id}/{sub_id}/download")
+def descargar(conv_id: int, sub_id: int, private_key_pem_b64: str, req: Request, db: Session = Depends(get_db)):
+    """
+    Igual que /decrypt pero devuelve el plaintext (sealed_base.zip; en v2, un ZIP con los
+    archivos del contenedor) como descarga binaria. Se descifra por bloques a un temporal
+    y solo se empieza a enviar tras validar el tag.
+    """
+    user = get_current_user(req, db)
+    if not user or user.role != Role.CONVOCANTE:
+        raise HTTPException(status_code=403, detail="Solo convocantes")
+
+    sub = db.get(Submission, sub_id)
+    if not sub or sub.convocatoria_id != conv_id:
+        raise HTTPException(status_code=404, detail="Submission no existe")
+    private_pem = base64.b64decode(private_key_pem_b64)
+
+    try:
+        spool = decrypt_submission_to_spool(private_pem, sub)
+    except InvalidTag:
+        raise HTTPException(status_code=400, detail="Tag GCM inválido: la propuesta no se pudo autenticar")
+    size = spool.seek(0, 2); spool.seek(0)
+
+    def body():
+        with spool:
+            while True:
+                b = spool.read(CHUNK)
+                if not b:
+                    break
+                yield b
+
+    headers = {
+        "Content-Length": str(size),
+        "Content-Disposition": f'attachment; filename="propuesta_{conv_id}_{sub_id}.zip"',
+    }
+    return StreamingResponse(body(), media_type="application/zip", headers=headers)
+
+def _own_convocatoria(req: Request, db: Session, conv_id: int) -> Convocatoria:
+    user = get_current_user(req, db)
+    if not user or user.role != Role.CONVOCANTE:
+        raise HTTPException(status_code=403, detail="Solo convocantes")
+    conv = db.get(Convocatoria, conv_id)
+    if not conv: raise HTTPException(status_code=404, detail="Convocatoria no existe")
+    if conv.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="No es tu convocatoria")
+    return conv
+
+def _open_own_package(req: Request, db: Session, conv_id: int, sub_id: int, private_key_pem_b64: str):
+    _own_convocatoria(req, db, conv_id)
+    sub = db.get(Submission, sub_id)
+    if not sub or sub.convocatoria_id != conv_id:
+        raise HTTPException(status_code=404, detail="Submission no existe")
+    try:
+        return open_package(base64.b64decode(private_key_pem_b64), sub)
+    except InvalidTag:
+        raise HTTPException(status_code=400, detail="Tag GCM inválido: la propuesta no se pudo autenticar")
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Clave privada RSA inválida o paquete corrupto")
+
+@router.post("/{conv_id}/{sub_id}/entries", response_model=PackageEntries)
+def listar_entradas(conv_id: int, sub_id: int, private_key_pem_b64: str, req: Request, db: Session = Depends(get_db)):
+    """
+    Archivos de la propuesta (documentos, manifest.json, signature.bin). En formato v2
+    solo se descifra el índice; en v1 hace falta descifrar el paquete entero.
+    """
+    with _open_own_package(req, db, conv_id, sub_id, private_key_pem_b64) as pkg:
+        return {"format": pkg.format, "entries": pkg.entries()}
+
+@router.post("/{conv_id}/{sub_id}/entries/{name:path}")
+def descargar_entrada(conv_id: int, sub_id: int, name: str, private_key_pem_b64: str, req: Request,
+                      db: Session = Depends(get_db)):
+    """
+    Un solo archivo de la propuesta. En v2 se descifran solo los trozos que lo cubren,
+    cada uno autenticado antes de enviarse.
+    """
+    pkg = _open_own_package(req, db, conv_id, sub_id, private_key_pem_b64)
+    if not pkg.has(name):
+        pkg.close()
+        raise HTTPException(status_code=404, detail="El archivo no está en la propuesta")
+    size = next(e["size"] for e in pkg.entries() if e["name"] == name)
+
+    def body():
+        with pkg:
+            yield from pkg.open(name)
+
+    filename = name.rsplit("/", 1)[-1].replace('"', "")
+    headers = {"Content-Length": str(size), "Content-Disposition": f'attachment; filename="{filename}"'}
+    # Si el cliente corta a mitad, el generador se queda sin terminar: la tarea de fondo
+    # cierra igualmente el paquete (y el spool de v1). close() se puede repetir.
+    return StreamingResponse(body(), media_type="application/octet-stream", headers=headers,
+                             background=BackgroundTask(pkg.close))
+
+@router.post("/{conv_id}/open-all", response_model=OpeningJobOut, status_code=202)
+def abrir_todas(conv_id: int, private_key_pem_b64: str, req: Request,
+                workers: int | None = Query(None, ge=1, le=os.cpu_count() or 1),
+                db: Session = Depends(get_db)):
+    """
+    Lanza la apertura de todas las propuestas de la convocatoria en segundo plano. El
+    estado del trabajo vive en el proceso que lo lanza: con varios workers, los GET de
+    estado y resultado tienen que llegar al mismo.
+    """
+    _own_convocatoria(req, db, conv_id)
+    private_pem = base64.b64decode(private_key_pem_b64)
+    try:
+        job = batch.start_opening(conv_id, private_pem, workers)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Clave privada RSA inválida")
+    except batch.JobAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail=f"Ya hay una apertura en curso para esta convocatoria: {e.job_id}")
+    return job
+
+@router.get("/{conv_id}/open-all/{job_id}", response_model=OpeningJobOut)
+def estado_apertura(conv_id: int, job_id: str, req: Request, db: Session = Depends(get_db)):
+    _own_convocatoria(req, db, conv_id)
+    job = batch.get_job(job_id)
+    if not job or job.convocatoria_id != conv_id:
+        raise HTTPException(status_code=404, detail="Trabajo no existe")
+    return job
+
+@router.get("/{conv_id}/open-all/{job_id}/{sub_id}")
+def resultado_apertura(conv_id: int, job_id: str, sub_id: int, req: Request, db: Session = Depends(get_db)):
+    """Descarga el plaintext (sealed_base.zip) de una propuesta ya abierta por el trabajo."""
+    _own_convocatoria(req, db, conv_id)
+    job = batch.get_job(job_id)
+    if not job or job.convocatoria_id != conv_id:
+        raise HTTPException(status_code=404, detail="Trabajo no existe")
+    if job.results.get(sub_id, {}).get("status") != "ok":
+        raise HTTPException(status_code=404, detail="Propuesta no abierta")
+    return FileResponse(batch.output_path(conv_id, job_id, sub_id), media_type="application/zip",
+                        filename=f"propuesta_{conv_id}_{sub_id}.zip")
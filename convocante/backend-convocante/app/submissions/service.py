@@ -1,5 +1,15 @@
+import io
+import json
 import base64
-from ..crypto_utils import rsa_decrypt_oaep_sha256, aes_gcm_decrypt, ed25519_verify
+import zipfile
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterator, List
+from ..config import settings
+from ..blobstore import get_blob_store
+from ..models import Submission
+from ..crypto_utils import (CHUNK, ChunkedAeadReader, chunked_to_zip, rsa_decrypt_oaep_sha256,
+                            aes_gcm_decrypt, aes_gcm_decrypt_stream, ed25519_verify)
+from ..sbx2 import is_chunked
 
 def b64d(s: str) -> bytes: return base64.b64decode(s)
 
@@ -11,3 +21,119 @@ def verify_optional_signature(signer_pk_hex: str | None, message: bytes, signatu
     if not signer_pk_hex or not signature:
         return True
     return ed25519_verify(signer_pk_hex, message, signature)
+
+def open_ciphertext(sub: Submission) -> BinaryIO:
+    # Filas antiguas aún tienen el ciphertext en la columna; las nuevas, en el blob store.
+    if sub.ciphertext is not None:
+        return io.BytesIO(sub.ciphertext)
+    return get_blob_store().open(sub.payload_sha256)
+
+def read_ciphertext(sub: Submission) -> bytes:
+    with open_ciphertext(sub) as f:
+        return f.read()
+
+def _spool():
+    return tempfile.SpooledTemporaryFile(max_size=settings.DECRYPT_SPOOL_MAX_BYTES,
+                                         dir=settings.DECRYPT_TMP_DIR or None)
+
+def decrypt_submission_to_spool(private_pem: bytes, sub: Submission):
+    """
+    Descifra la propuesta por bloques hacia un SpooledTemporaryFile (en RAM hasta
+    DECRYPT_SPOOL_MAX_BYTES, luego en disco). Solo se devuelve, rebobinado, si el tag
+    GCM es válido; si no, se borra y se propaga InvalidTag.
+    v1: el plaintext es sealed_base.zip; v2: un ZIP con las entradas del contenedor.
+    """
+    aes_key = rsa_decrypt_oaep_sha256(private_pem, sub.wrapped_key)
+    spool = _spool()
+    try:
+        with open_ciphertext(sub) as src:
+            if is_chunked(src):
+                chunked_to_zip(ChunkedAeadReader(src, aes_key), spool)
+            else:
+                aes_gcm_decrypt_stream(aes_key, sub.nonce, sub.tag, src, spool)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+class SealedPackage:
+    """
+    Archivos de una propuesta: `entries()` lista los documentos más manifest.json y
+    signature.bin, y `open(name)` devuelve uno por bloques.
+
+    v2 (contenedor por trozos) descifra solo los trozos del archivo pedido, en tiempo
+    proporcional a su tamaño. v1 es un único GCM sin acceso aleatorio: al abrir se
+    descifra y autentica entero a un temporal y luego se leen los ZIP anidados.
+    """
+
+    def __init__(self, src: BinaryIO, aes_key: bytes, nonce: bytes, tag: bytes):
+        self._src = src
+        self.format = 2 if is_chunked(src) else 1
+        if self.format == 2:
+            self._v2 = ChunkedAeadReader(src, aes_key)
+            return
+        self._spool = _spool()
+        try:
+            aes_gcm_decrypt_stream(aes_key, nonce, tag, src, self._spool)
+            self._outer = zipfile.ZipFile(self._spool)
+            self._content = zipfile.ZipFile(self._outer.open("content.zip"))
+            manifest = json.loads(self._outer.read("manifest.json"))
+            self._sha = {f["path"]: f["sha256"] for f in manifest.get("files", [])}
+        except BaseException:
+            self._spool.close()
+            raise
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """[{name, size, sha256}] en el orden del paquete."""
+        if self.format == 2:
+            return [{"name": e["name"], "size": e["file_size"], "sha256": e["sha256"]} for e in self._v2.entries]
+        out = [{"name": i.filename, "size": i.file_size, "sha256": self._sha.get(i.filename)}
+               for i in self._content.infolist()]
+        out += [{"name": i.filename, "size": i.file_size, "sha256": None}
+                for i in self._outer.infolist() if i.filename != "content.zip"]
+        return out
+
+    def has(self, name: str) -> bool:
+        if self.format == 2:
+            try:
+                return self._v2.entry(name) is not None
+            except KeyError:
+                return False
+        return name in self._content.NameToInfo or (name != "content.zip" and name in self._outer.NameToInfo)
+
+    def open(self, name: str) -> Iterator[bytes]:
+        if not self.has(name):
+            raise KeyError(f"No existe la entrada: {name}")
+        if self.format == 2:
+            yield from self._v2.open_entry(name)
+            return
+        z = self._content if name in self._content.NameToInfo else self._outer
+        with z.open(name) as f:
+            while True:
+                b = f.read(CHUNK)
+                if not b:
+                    break
+                yield b
+
+    def close(self):
+        if self.format == 1:
+            self._content.close()
+            self._outer.close()
+            self._spool.close()
+        self._src.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_package(private_pem: bytes, sub: Submission) -> SealedPackage:
+    aes_key = rsa_decrypt_oaep_sha256(private_pem, sub.wrapped_key)
+    src = open_ciphertext(sub)
+    try:
+        return SealedPackage(src, aes_key, sub.nonce, sub.tag)
+    except BaseException:
+        src.close()
+        raise
@@ -0,0 +1,143 @@
+import json
+import secrets
+from typing import Callable, Optional
+
+from ..config import settings
+from ..pglisten import PgListener, asyncpg_dsn
+
+Deliver = Callable[[dict], None]
+
+
+class BroadcastBackend:
+    """
+    Transporte de los mensajes del hub entre procesos. `publish` lo manda a todos los
+    workers (incluido el propio) y cada uno lo entrega a sus clientes vía `deliver`,
+    que se fija en `start`. Si el backend pudo perder mensajes (p. ej. tras reconectar)
+    llama a `on_reset(head_seq)` para que el hub descarte su log de eventos.
+
+    `epoch` identifica la serie de seq: si cambia (p. ej. un contador en memoria tras
+    reiniciar) los cursores anteriores no valen, aunque el número coincida.
+    """
+
+    on_reset: Optional[Callable[[int], None]] = None
+    epoch: str = ""
+
+    async def start(self, deliver: Deliver) -> None:
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, message: dict) -> None:
+        raise NotImplementedError
+
+    async def next_seq(self) -> int:
+        """Siguiente número de secuencia, único y creciente entre todos los workers."""
+        raise NotImplementedError
+
+    async def head_seq(self) -> int:
+        """Último seq repartido (0 si ninguno)."""
+        raise NotImplementedError
+
+
+class InProcessBackend(BroadcastBackend):
+    """
+    Un solo worker: entrega directa, sin salir del proceso. La secuencia vive en memoria:
+    tras reiniciar vuelve a 0 con un `epoch` nuevo, y los clientes con cursor del proceso
+    anterior reciben un snapshot.
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+        self._seq = 0
+        self.epoch = secrets.token_hex(4)
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def publish(self, message: dict) -> None:
+        if self._deliver is not None:
+            self._deliver(message)
+
+    async def next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    async def head_seq(self) -> int:
+        return self._seq
+
+
+class PostgresBackend(BroadcastBackend):
+    """
+    LISTEN/NOTIFY de Postgres: todos los workers (de esta máquina o de otras) que
+    escuchan `channel` reciben cada mensaje. El payload de NOTIFY está limitado a ~8 KB,
+    de sobra para los avisos. El LISTEN va por una conexión dedicada (`PgListener`, que
+    reconecta con backoff; lo publicado mientras tanto se pierde para este worker) y
+    `nextval`/`pg_notify` por un pool asyncpg pequeño (WS_PG_POOL_SIZE): una conexión
+    asyncpg no admite dos operaciones a la vez, y dos `broadcast` concurrentes son lo normal.
+
+    Los seq salen de una SEQUENCE de Postgres (`<channel>_seq`), así que sobreviven a
+    reinicios y despliegues (el `epoch` es fijo): un cliente al día reconecta sin snapshot. Dos NOTIFY de
+    workers distintos pueden llegar cruzados; el EventLog los ordena por seq.
+    """
+
+    def __init__(self, dsn: str, channel: str, pool_size: int = 2):
+        self.dsn = dsn
+        self.channel = channel
+        self.sequence = f"{channel}_seq"
+        self.pool_size = pool_size
+        self._deliver: Optional[Deliver] = None
+        self._pool = None
+        self._listener: Optional[PgListener] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        import asyncpg
+        self._deliver = deliver
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size)
+        await self._pool.execute(f'CREATE SEQUENCE IF NOT EXISTS "{self.sequence}"')
+        self._listener = PgListener(self.dsn, self.channel, self._on_notify, self._on_reconnect)
+        await self._listener.start()
+
+    async def _on_reconnect(self):
+        if self.on_reset:
+            self.on_reset(await self.head_seq())
+
+    def _on_notify(self, payload: str):
+        if self._deliver is not None:
+            self._deliver(json.loads(payload))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            await self._listener.stop()
+            self._listener = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def _queries(self):
+        if self._pool is None:
+            raise RuntimeError("Backend de broadcast sin conexión a Postgres")
+        return self._pool
+
+    async def publish(self, message: dict) -> None:
+        await self._queries().execute("SELECT pg_notify($1, $2)", self.channel, json.dumps(message))
+
+    async def next_seq(self) -> int:
+        return await self._queries().fetchval("SELECT nextval($1::regclass)", f'"{self.sequence}"')
+
+    async def head_seq(self) -> int:
+        row = await self._queries().fetchrow(f'SELECT last_value, is_called FROM "{self.sequence}"')
+        return row["last_value"] if row["is_called"] else 0
+
+
+BACKENDS = {
+    "memory": InProcessBackend,
+    "postgres": lambda: PostgresBackend(asyncpg_dsn(settings.DATABASE_URL), settings.WS_CHANNEL,
+                                        settings.WS_PG_POOL_SIZE),
+}
+
+
+def get_backend() -> BroadcastBackend:
+    if settings.WS_BACKEND not in BACKENDS:
+        raise RuntimeError(f"WS_BACKEND desconocido: {settings.WS_BACKEND}")
+    return BACKENDS[settings.WS_BACKEND]()
@@ -1,25 +1,242 @@
-from typing import Set
+import json
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
 from starlette.websockets import WebSocket
+from ..config import settings
+from .. import metrics
+from .backends import BroadcastBackend, InProcessBackend, get_backend
+
+WS_CLIENTS = metrics.gauge("ws_clients", "Clientes WebSocket conectados")
+WS_DROPPED = metrics.counter("ws_dropped_total", "Clientes desconectados por lentos o caídos", ("reason",))
+WS_FANOUT = metrics.histogram("ws_broadcast_seconds", "Tiempo de encolar un mensaje a todos los clientes")
+WS_RESUMES = metrics.counter("ws_resumes_total", "Conexiones con cursor, por resultado", ("result",))
+
+# Cierre por cliente lento: 1013 = "Try Again Later"; el cliente reconecta y se pone al día.
+SLOW_CONSUMER_CODE = 1013
+
+
+class EventLog:
+    """
+    Últimos `maxlen` mensajes ya serializados, con su `seq`. `floor` es el seq más alto
+    que ya no está (expulsado, o anterior al arranque): desde un cursor >= floor se puede
+    reanudar con solo los deltas; por debajo hace falta un snapshot.
+    """
+
+    def __init__(self, maxlen: int, head: int = 0):
+        self._items: "deque[tuple[int, str]]" = deque()
+        self.maxlen = maxlen
+        self.head = self.floor = head
+
+    def append(self, seq: int, text: str):
+        if seq <= self.floor:
+            return
+        if seq > self.head:
+            self._items.append((seq, text))
+            self.head = seq
+        else:
+            # con varios workers dos NOTIFY pueden llegar cruzados: se inserta en orden
+            i = len(self._items)
+            while i and self._items[i - 1][0] > seq:
+                i -= 1
+            if i and self._items[i - 1][0] == seq:
+                return
+            self._items.insert(i, (seq, text))
+        while len(self._items) > self.maxlen:
+            self.floor = self._items.popleft()[0]
+
+    def since(self, cursor: int) -> Optional[List[str]]:
+        """Mensajes con seq > cursor, o None si ya no se pueden reconstruir."""
+        if cursor < self.floor or cursor > self.head:
+            return None
+        out = []
+        for seq, text in reversed(self._items):
+            if seq <= cursor:
+                break
+            out.append(text)
+        out.reverse()
+        return out
+
+
+class _Client:
+    __slots__ = ("ws", "queue", "task", "sending_since")
+
+    def __init__(self, ws: WebSocket, maxsize: int):
+        self.ws = ws
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=maxsize)
+        self.task: "asyncio.Task | None" = None
+        self.sending_since = 0.0  # loop.time() del envío en curso; 0 = ocioso
+
 
 class Hub:
-    def __init__(self):
-        self.clients: Set[WebSocket] = set()
+    """
+    Fan-out de mensajes a los WebSockets conectados. Cada mensaje se serializa una sola
+    vez y se encola (sin esperar) en la cola acotada de cada cliente; una tarea escritora
+    por cliente la vacía. Un cliente cuya cola se llena, o que tarda más de
+    `send_timeout` en aceptar un envío, se desconecta sin frenar a los demás.
+
+    El timeout no se arma por envío (wait_for crea una tarea y un timer cada vez, y con
+    miles de clientes eso domina el coste): un único vigilante revisa periódicamente
+    los envíos en curso.
+
+    `broadcast` pasa por el `backend` (memoria o Postgres LISTEN/NOTIFY), que lo reparte
+    a todos los workers; cada worker lo entrega a sus clientes con `publish`.
+
+    `listeners` reciben cada mensaje entregado en este worker (p. ej. para invalidar cachés).
+
+    Cada mensaje lleva un `seq` creciente (del backend, común a todos los workers) y el
+    `epoch` del backend, y se guarda en un `EventLog` acotado. Un cliente que reconecta con
+    `cursor` = último seq visto (y su `epoch`) recibe solo lo que se perdió; si eso ya salió
+    del log, o el epoch no es el actual, recibe un snapshot.
+    """
+
+    def __init__(self, backend: Optional[BroadcastBackend] = None,
+                 queue_size: int = settings.WS_QUEUE_SIZE, send_timeout: float = settings.WS_SEND_TIMEOUT):
+        self.backend = backend or InProcessBackend()
+        self.backend.on_reset = self._reset_log
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.clients: Dict[WebSocket, _Client] = {}
+        self._watchdog: "asyncio.Task | None" = None
+        self._started = False
+        self._start_lock: "asyncio.Lock | None" = None
+        self.log = EventLog(settings.WS_EVENT_LOG_SIZE)
+        self.listeners: List[Callable[[dict], None]] = []  # se llaman con cada mensaje entregado
 
-    async def connect(self, ws: WebSocket):
+    async def start(self):
+        if self._started:
+            return
+        self._start_lock = self._start_lock or asyncio.Lock()
+        async with self._start_lock:
+            if not self._started:
+                await self.backend.start(self.publish)
+                self._reset_log(await self.backend.head_seq())
+                self._started = True
+
+    def _reset_log(self, head: int):
+        self.log = EventLog(settings.WS_EVENT_LOG_SIZE, head=head)
+
+    async def stop(self):
+        if self._started:
+            await self.backend.stop()
+            self._started = False
+        for client in list(self.clients.values()):
+            self.disconnect(client.ws)
+
+    async def connect(self, ws: WebSocket, cursor: Optional[int] = None, epoch: str = "",
+                      snapshot: Optional[Callable[[], Awaitable[dict]]] = None):
+        """
+        Registra `ws`. Con `cursor`, antes de los mensajes en vivo se le envía lo publicado
+        después de ese seq, o —si ya no está en el log, o `epoch` no es el del backend (el
+        cursor es de otra serie de seq)— `snapshot()` (o un `resync` si no hay snapshot)
+        marcado con el seq del momento del registro.
+        """
+        await self.start()
         await ws.accept()
-        self.clients.add(ws)
+        client = _Client(ws, self.queue_size)
+        # Sin awaits desde aquí hasta registrar: todo lo publicado después va a la cola
+        if cursor is None:
+            backlog = []
+        elif epoch != self.backend.epoch:
+            backlog = None
+        else:
+            backlog = self.log.since(cursor)
+        if backlog is None:
+            WS_RESUMES.labels("snapshot" if snapshot else "resync").inc()
+            preamble = [self._snapshot(snapshot, self.log.head, self.backend.epoch)]
+        else:
+            if cursor is not None:
+                WS_RESUMES.labels("replay").inc()
+            preamble = backlog
+        client.task = asyncio.create_task(self._writer(client, preamble))
+        self.clients[ws] = client
+        WS_CLIENTS.set(len(self.clients))
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.create_task(self._watch())
 
     def disconnect(self, ws: WebSocket):
-        self.clients.discard(ws)
+        client = self.clients.pop(ws, None)
+        if client is None:
+            return
+        WS_CLIENTS.set(len(self.clients))
+        if client.task is not asyncio.current_task():
+            client.task.cancel()
 
-    async def broadcast(self, message: dict):
-        dead = []
-        for ws in self.clients:
+    @staticmethod
+    async def _snapshot(snapshot, seq: int, epoch: str) -> str:
+        data = await snapshot() if snapshot else {"type": "resync"}
+        return json.dumps({**data, "seq": seq, "epoch": epoch})
+
+    async def _writer(self, client: _Client, preamble: List = ()):
+        ws, queue = client.ws, client.queue
+        loop = asyncio.get_running_loop()
+        for item in preamble:
+            try:
+                text = item if isinstance(item, str) else await item
+            except Exception:
+                self._drop(client, "snapshot_error")
+                return
+            client.sending_since = loop.time()
+            try:
+                await ws.send_text(text)
+            except Exception:
+                self._drop(client, "send_error")
+                return
+            client.sending_since = 0.0
+        while True:
+            text = await queue.get()
+            client.sending_since = loop.time()
             try:
-                await ws.send_json(message)
+                await ws.send_text(text)
             except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self.disconnect(ws)
+                self._drop(client, "send_error")
+                return
+            client.sending_since = 0.0
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while self.clients:
+            await asyncio.sleep(self.send_timeout / 2)
+            deadline = loop.time() - self.send_timeout
+            for client in list(self.clients.values()):
+                if 0.0 < client.sending_since < deadline:
+                    self._drop(client, "send_timeout")
+
+    def _drop(self, client: _Client, reason: str):
+        if client.ws not in self.clients:
+            return
+        WS_DROPPED.labels(reason).inc()
+        self.disconnect(client.ws)
+        asyncio.create_task(self._close(client.ws))
+
+    async def _close(self, ws: WebSocket):
+        try:
+            await asyncio.wait_for(ws.close(code=SLOW_CONSUMER_CODE), self.send_timeout)
+        except Exception:
+            pass
+
+    def publish(self, message: dict) -> int:
+        """Encola `message` para todos los clientes sin bloquear. Devuelve a cuántos."""
+        t0 = time.perf_counter()
+        text = json.dumps(message)
+        if "seq" in message:
+            self.log.append(message["seq"], text)
+        for listener in self.listeners:
+            listener(message)
+        sent = 0
+        for client in list(self.clients.values()):
+            try:
+                client.queue.put_nowait(text)
+                sent += 1
+            except asyncio.QueueFull:
+                self._drop(client, "queue_full")
+        WS_FANOUT.observe(time.perf_counter() - t0)
+        return sent
+
+    async def broadcast(self, message: dict):
+        """Manda `message` (con un `seq` nuevo) a los clientes de todos los workers."""
+        await self.start()
+        await self.backend.publish({**message, "seq": await self.backend.next_seq(), "epoch": self.backend.epoch})
 
-hub = Hub()
+hub = Hub(get_backend())
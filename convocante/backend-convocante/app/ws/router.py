@@ -1,14 +1,32 @@
+from typing import Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from ..db import AsyncSessionLocal
+from ..models import Convocatoria
 from .hub import hub
 
 router = APIRouter()
 
+SNAPSHOT_LIMIT = 50  # = primera página de GET /api/convocatorias
+
+async def convocatorias_snapshot() -> dict:
+    """Primera página del listado, para un cliente cuyo cursor ya salió del log de eventos."""
+    cols = [Convocatoria.id, Convocatoria.titulo, Convocatoria.owner_id, Convocatoria.created_at]  # ConvocatoriaSummary
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(*cols).order_by(Convocatoria.id.desc()).limit(SNAPSHOT_LIMIT + 1))).all()
+    next_cursor = rows[SNAPSHOT_LIMIT - 1].id if len(rows) > SNAPSHOT_LIMIT else None
+    return {"type": "snapshot", "items": jsonable_encoder([dict(r._mapping) for r in rows[:SNAPSHOT_LIMIT]]),
+            "next_cursor": next_cursor}
+
 @router.websocket("/ws/licitante")
-async def licitante_ws(ws: WebSocket):
-    await ws.accept()
-    await hub.connect(ws)
+async def licitante_ws(ws: WebSocket, cursor: Optional[int] = None, epoch: str = ""):
+    # ?cursor=N&epoch=E (último `seq` recibido y su `epoch`): al reconectar llegan solo los eventos perdidos
+    await hub.connect(ws, cursor, epoch, snapshot=convocatorias_snapshot)  # hace el accept
     try:
         while True:
             await ws.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         hub.disconnect(ws)
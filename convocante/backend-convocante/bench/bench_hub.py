@@ -0,0 +1,105 @@
+# bench_hub.py
+# Fan-out de /ws/licitante con N clientes simulados (sin red): WebSockets falsos cuyo
+# send_text tarda `--send-us` µs, y un % de clientes lentos que tardan `--slow-ms`.
+# Compara el broadcast secuencial anterior (await send_json cliente a cliente) con Hub.
+#
+# Mide, por mensaje: cuánto tarda broadcast() en volver y la latencia de entrega
+# (publicación -> send_text) p50/p99 de los clientes rápidos.
+#
+# Uso (desde backend-convocante/):
+#   python -m bench.bench_hub                       # 10k clientes, 1% lentos, 5 mensajes
+#   python -m bench.bench_hub --clients 20000 --slow-pct 5 --messages 20
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from app.ws.hub import Hub
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float, lat: list):
+        self.delay = delay
+        self.lat = lat
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.lat.append(time.perf_counter() - json.loads(text)["t"])
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message))
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class LegacyHub:
+    """El Hub anterior: serializa y espera el envío de cada cliente en serie."""
+
+    def __init__(self):
+        self.clients = set()
+
+    async def connect(self, ws):
+        await ws.accept()
+        self.clients.add(ws)
+
+    async def broadcast(self, message: dict):
+        for ws in self.clients:
+            await ws.send_json(message)
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] * 1e3 if xs else float("nan")
+
+
+async def run(hub, a):
+    fast_lat, slow_lat = [], []
+    n_slow = a.clients * a.slow_pct // 100
+    for i in range(a.clients):
+        slow = i % max(1, a.clients // max(1, n_slow)) == 0 and n_slow > 0
+        ws = FakeWebSocket(a.slow_ms / 1e3 if slow else a.send_us / 1e6, slow_lat if slow else fast_lat)
+        await hub.connect(ws)
+
+    calls = []
+    t_start = time.perf_counter()
+    for i in range(a.messages):
+        t0 = time.perf_counter()
+        await hub.broadcast({"type": "new_convocatoria", "id": i, "titulo": f"conv {i}", "t": t0})
+        calls.append(time.perf_counter() - t0)
+        await asyncio.sleep(a.interval)
+    # esperar a que se vacíen las colas de los rápidos
+    expected = (a.clients - n_slow) * a.messages
+    while len(fast_lat) < expected and time.perf_counter() - t_start < 120:
+        await asyncio.sleep(0.01)
+    return calls, fast_lat, len(getattr(hub, "clients", ()))
+
+
+async def main(argv):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=10_000)
+    ap.add_argument("--slow-pct", type=int, default=1)
+    ap.add_argument("--slow-ms", type=float, default=50)
+    ap.add_argument("--send-us", type=float, default=0)
+    ap.add_argument("--messages", type=int, default=5)
+    ap.add_argument("--interval", type=float, default=0.05)
+    ap.add_argument("--queue", type=int, default=2)
+    a = ap.parse_args(argv)
+
+    print(f"{a.clients} clientes, {a.slow_pct}% lentos ({a.slow_ms:g} ms/envío), {a.messages} mensajes")
+    print(f"{'hub':<10}{'broadcast p50 ms':>18}{'max ms':>10}{'entrega p50 ms':>16}{'p99 ms':>10}{'conectados':>12}")
+    for name, hub in (("legacy", LegacyHub()), ("Hub", Hub(queue_size=a.queue, send_timeout=a.slow_ms / 1e3 / 2))):
+        calls, lat, left = await run(hub, a)
+        print(f"{name:<10}{_pct(calls, 0.5):>18.2f}{max(calls) * 1e3:>10.2f}{_pct(lat, 0.5):>16.2f}"
+              f"{_pct(lat, 0.99):>10.2f}{left:>12}")
+        for c in list(getattr(hub, "clients", {}).values()) if isinstance(hub, Hub) else ():
+            c.task.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
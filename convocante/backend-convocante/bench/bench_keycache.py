@@ -0,0 +1,57 @@
+# bench_keycache.py
+# Coste por operación de desenvolver la clave AES (RSA-OAEP 4096) y verificar Ed25519
+# con y sin la caché de claves parseadas de crypto_utils.
+#
+# Uso (desde backend-convocante/):
+#   python -m bench.bench_keycache            # 200 iteraciones
+#   python -m bench.bench_keycache 1000
+import os
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, ed25519
+
+from app.crypto_utils import key_cache, rsa_decrypt_oaep_sha256, ed25519_verify
+
+
+def _per_op_us(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main(argv):
+    n = int(argv[0]) if argv else 200
+    priv = rsa.generate_private_key(public_exponent=65537, key_size=4096)  # como rsa_gen.py
+    pem = priv.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                             serialization.NoEncryption())
+    oaep = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+    wrapped = priv.public_key().encrypt(os.urandom(32), oaep)
+
+    sk = ed25519.Ed25519PrivateKey.generate()
+    pk_hex = sk.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+    msg = os.urandom(4096)
+    sig = sk.sign(msg)
+
+    def uncached(fn):
+        def run():
+            key_cache.clear()
+            fn()
+        return run
+
+    unwrap = lambda: rsa_decrypt_oaep_sha256(pem, wrapped)
+    verify = lambda: ed25519_verify(pk_hex, msg, sig)
+
+    print(f"{'operación':<26} {'sin caché':>12} {'con caché':>12} {'ahorro':>8}")
+    for label, fn in [("RSA-OAEP 4096 unwrap", unwrap), ("Ed25519 verify (4 KiB)", verify)]:
+        cold = _per_op_us(uncached(fn), n)
+        key_cache.clear(); fn()
+        warm = _per_op_us(fn, n)
+        print(f"{label:<26} {cold:>9.0f} µs {warm:>9.0f} µs {cold / warm:>7.1f}x")
+    print(f"caché: hits={key_cache.hits} misses={key_cache.misses} evictions={key_cache.evictions}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
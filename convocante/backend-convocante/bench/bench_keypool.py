@@ -0,0 +1,61 @@
+# bench_keypool.py
+# Lo que espera POST /api/calls por su par RSA: generado en la petición (KEY_POOL_SIZE=0,
+# lo que hacía rsa_gen.py) frente a sacado del pool pregenerado. Usa KeyPool directamente,
+# sin servidor: primero deja que el pool se llene y luego pide --calls claves separadas
+# por --gap segundos (con gap 0 una ráfaga mayor que el pool acaba generando al vuelo).
+#
+# Uso (desde backend-convocante/):
+#   python -m bench.bench_keypool                          # 4096 bits, pool de 8, 20 peticiones cada 0.5 s
+#   python -m bench.bench_keypool --bits 3072 --size 16 --calls 40 --gap 0 --workers 2
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+async def _run(pool, calls: int, gap: float):
+    lat = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        await pool.take()
+        lat.append((time.perf_counter() - t0) * 1e3)
+        await asyncio.sleep(gap)
+    return lat
+
+
+async def main(argv):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bits", type=int, default=4096)
+    ap.add_argument("--size", type=int, default=8)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--calls", type=int, default=20)
+    ap.add_argument("--gap", type=float, default=0.5)
+    a = ap.parse_args(argv)
+
+    os.environ.setdefault("KEY_ENCRYPTION_SECRET", "bench-key-encryption-secret")  # sin ella KeyPool no arranca
+    from app.keys.pool import KeyPool, KEY_POOL_TAKEN
+
+    print(f"RSA {a.bits}, {a.calls} peticiones cada {a.gap:g} s, {a.workers} procesos de keygen")
+    print(f"{'modo':<14}{'p50 ms':>9}{'p99 ms':>9}{'máx ms':>9}{'al vuelo':>10}")
+    for size in (0, a.size):
+        pool = KeyPool(size, a.bits, a.workers)
+        misses0 = KEY_POOL_TAKEN.labels("miss").value
+        await pool.start()
+        while len(pool) < size:
+            await asyncio.sleep(0.1)
+        lat = await _run(pool, a.calls, a.gap)
+        await pool.stop()
+        mode = "sin pool" if size == 0 else f"pool de {size}"
+        misses = int(KEY_POOL_TAKEN.labels("miss").value - misses0)
+        print(f"{mode:<14}{statistics.median(lat):>9.1f}{_pct(lat, 0.99):>9.1f}{max(lat):>9.1f}{misses:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
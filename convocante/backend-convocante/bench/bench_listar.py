@@ -0,0 +1,85 @@
+# bench_listar.py
+# GET /api/convocatorias con N convocatorias (100k por defecto, descripcion de ~2 KB) sobre
+# un SQLite temporal: el listado anterior (tabla entera con descripcion) frente a la
+# primera página, una página profunda (keyset), el filtro por dueño y la revalidación
+# con If-None-Match (304).
+#
+# Uso (desde backend-convocante/):
+#   python -m bench.bench_listar            # 100000 filas
+#   python -m bench.bench_listar 20000
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="bench_listar-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app.main import app
+from app.db import SessionLocal, engine
+from app.models import Convocatoria, User, Role
+
+
+def _seed(n: int):
+    db = SessionLocal()
+    owners = [User(email=f"o{i}@example.com", name=f"o{i}", role=Role.CONVOCANTE, password_hash="x") for i in range(10)]
+    db.add_all(owners); db.commit()
+    ids = [o.id for o in owners]
+    t0 = datetime(2024, 1, 1)
+    desc = "x" * 2048
+    with engine.begin() as conn:
+        for start in range(0, n, 10_000):
+            conn.execute(insert(Convocatoria), [
+                dict(titulo=f"Convocatoria {i}", descripcion=desc, owner_id=ids[i % 10], created_at=t0 + timedelta(minutes=i))
+                for i in range(start, min(n, start + 10_000))
+            ])
+    db.close()
+    return ids
+
+
+def _time(fn, reps: int):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        r = fn()
+    return (time.perf_counter() - t0) / reps * 1e3, r
+
+
+def _legacy() -> bytes:
+    """El `listar` anterior: tabla entera, con descripcion, serializada a JSON."""
+    db = SessionLocal()
+    try:
+        rows = db.query(Convocatoria).order_by(Convocatoria.id.desc()).all()
+        return json.dumps([{f: getattr(x, f) for f in ("id", "titulo", "descripcion", "owner_id")} for x in rows]).encode()
+    finally:
+        db.close()
+
+
+def main(argv):
+    n = int(argv[0]) if argv else 100_000
+    owners = _seed(n)
+    c = TestClient(app)
+    etag = c.get("/api/convocatorias").headers["etag"]
+    cases = [
+        ("anterior: tabla entera", _legacy, 3),
+        ("primera página (50)", lambda: c.get("/api/convocatorias"), 50),
+        ("página profunda", lambda: c.get(f"/api/convocatorias?cursor={n // 2}"), 50),
+        ("dueño + fecha", lambda: c.get(f"/api/convocatorias?owner_id={owners[3]}&desde=2024-02-01T00:00:00"), 50),
+        ("limit=500", lambda: c.get("/api/convocatorias?limit=500"), 20),
+        ("304 If-None-Match", lambda: c.get("/api/convocatorias", headers={"If-None-Match": etag}), 50),
+    ]
+    print(f"{n} convocatorias")
+    print(f"{'caso':<24}{'ms/pet.':>10}{'status':>8}{'bytes':>12}")
+    for name, fn, reps in cases:
+        ms, r = _time(fn, reps)
+        status, size = (r.status_code, len(r.content)) if hasattr(r, "status_code") else (200, len(r))
+        print(f"{name:<24}{ms:>10.2f}{status:>8}{size:>12}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,123 @@
+# bench_login.py
+# Throughput de POST /api/auth/login según BCRYPT_WORKERS (procesos del pool de bcrypt),
+# y latencia de GET /api/convocatorias mientras tanto: con bcrypt en el threadpool una
+# avalancha de logins dejaba sin hilos al resto de rutas.
+#
+# Requiere httpx. Por cada valor de --workers arranca `uvicorn app.main:app` en un
+# subproceso sobre un SQLite temporal con un usuario sembrado, y durante --seconds lanza
+# --clients logins concurrentes (y --readers lecturas del listado en paralelo).
+#
+# Uso (desde backend-convocante/):
+#   python -m bench.bench_login                         # workers 1,2,4; coste 12; 32 clientes
+#   python -m bench.bench_login --workers 1 2 4 8 --rounds 10 --clients 64
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+
+def _seed(db_url: str, rounds: int):
+    # el servidor no arranca sin KEY_ENCRYPTION_SECRET
+    os.environ.setdefault("KEY_ENCRYPTION_SECRET", "bench-key-encryption-secret")
+    os.environ.update(DATABASE_URL=db_url, BCRYPT_ROUNDS=str(rounds))
+    from app.db import Base, engine, SessionLocal
+    from app.models import User, Role, Convocatoria
+    from app.auth.password import hash_password
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    user = User(email="bench@example.com", name="bench", role=Role.LICITANTE, password_hash=hash_password("bench"))
+    db.add(user); db.commit()
+    db.add_all([Convocatoria(titulo=f"conv {i}", descripcion="bench", owner_id=user.id) for i in range(50)])
+    db.commit()
+    db.close()
+
+
+def _spawn_server(port: int, env: dict):
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], env=env)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(base + "/api/convocatorias").raise_for_status()
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    return proc, base
+
+
+async def _login(client, stop, lat, codes):
+    body = {"email": "bench@example.com", "password": "bench"}
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        r = await client.post("/api/auth/login", json=body)
+        codes[r.status_code] = codes.get(r.status_code, 0) + 1
+        if r.status_code == 200:
+            lat.append((time.perf_counter() - t0) * 1e3)
+        elif r.status_code == 503:
+            await asyncio.sleep(0.1)
+
+
+async def _reader(client, stop, lat):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        (await client.get("/api/convocatorias")).raise_for_status()
+        lat.append((time.perf_counter() - t0) * 1e3)
+
+
+async def _run(base, a):
+    stop = asyncio.Event()
+    login_lat, read_lat, codes = [], [], {}
+    limits = httpx.Limits(max_connections=a.clients + a.readers)
+    async with httpx.AsyncClient(base_url=base, timeout=None, limits=limits) as client:
+        await client.post("/api/auth/login", json={"email": "bench@example.com", "password": "bench"})  # arranca el pool
+        tasks = [asyncio.create_task(_login(client, stop, login_lat, codes)) for _ in range(a.clients)]
+        tasks += [asyncio.create_task(_reader(client, stop, read_lat)) for _ in range(a.readers)]
+        await asyncio.sleep(a.seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return login_lat, read_lat, codes
+
+
+async def main(argv):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--rounds", type=int, default=12)
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--port", type=int, default=8766)
+    a = ap.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="bench_login-")
+    db_url = f"sqlite:///{tmp}/bench.db"
+    _seed(db_url, a.rounds)
+
+    print(f"coste {a.rounds}, {a.clients} clientes de login, {a.readers} lectores, {a.seconds:g} s, {os.cpu_count()} CPU")
+    print(f"{'workers':>8}{'logins/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'503':>6}{'lect p50':>10}{'lect p99':>10}")
+    for n in a.workers:
+        env = dict(os.environ, DATABASE_URL=db_url, BCRYPT_ROUNDS=str(a.rounds), BCRYPT_WORKERS=str(n))
+        proc, base = _spawn_server(a.port, env)
+        try:
+            login_lat, read_lat, codes = await _run(base, a)
+        finally:
+            proc.terminate()
+            proc.wait()
+        print(f"{n:>8}{len(login_lat) / a.seconds:>10.1f}{statistics.median(login_lat):>9.0f}"
+              f"{_pct(login_lat, 0.99):>9.0f}{codes.get(503, 0):>6}{statistics.median(read_lat):>10.1f}"
+              f"{_pct(read_lat, 0.99):>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,149 @@
+# load_uploads.py
+# Latencia (p50/p99) de GET /api/convocatorias en reposo y con subidas grandes en vuelo
+# (POST /api/submissions/{id} con ciphertext en base64 + firma Ed25519). Si la firma,
+# el base64 o el commit bloquean el event loop, el p99 de las lecturas se dispara.
+#
+# Requiere httpx. Por defecto arranca `uvicorn app.main:app` en un subproceso sobre un
+# SQLite temporal sembrado (el cliente no comparte GIL ni loop con el servidor); con
+# --url se mide un servidor ya arrancado (deben existir el licitante --email/--password
+# y la convocatoria --conv-id).
+#
+# Uso (desde backend-convocante/):
+#   python -m bench.load_uploads                          # 10 s por fase, 4 subidas de 8 MiB
+#   python -m bench.load_uploads --seconds 20 --uploaders 8 --size-mb 32
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+
+def _submission_body(size: int) -> bytes:
+    sk = Ed25519PrivateKey.generate()
+    pk = sk.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+    ct = os.urandom(size)
+    b64 = lambda b: base64.b64encode(b).decode()
+    return json.dumps(dict(
+        wrapped_key_b64=b64(os.urandom(512)),
+        nonce_b64=b64(os.urandom(12)),
+        tag_b64=b64(os.urandom(16)),
+        ciphertext_b64=b64(ct),
+        payload_sha256=hashlib.sha256(ct).hexdigest(),
+        signer_pk_hex=pk,
+        signature_b64=b64(sk.sign(ct)),
+    )).encode()  # serializado una vez: el cliente no compite por el loop
+
+
+async def _reader(client, stop, lat):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        r = await client.get("/api/convocatorias")
+        r.raise_for_status()
+        lat.append((time.perf_counter() - t0) * 1e3)
+
+
+async def _uploader(client, stop, conv_id, body, done):
+    while not stop.is_set():
+        r = await client.post(f"/api/submissions/{conv_id}", content=body, headers={"Content-Type": "application/json"})
+        r.raise_for_status()
+        done.append(1)
+
+
+async def _phase(client, seconds, readers, uploaders, conv_id, body):
+    stop = asyncio.Event()
+    lat, done = [], []
+    tasks = [asyncio.create_task(_reader(client, stop, lat)) for _ in range(readers)]
+    tasks += [asyncio.create_task(_uploader(client, stop, conv_id, body, done)) for _ in range(uploaders)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return lat, len(done)
+
+
+def _spawn_server(port: int):
+    """uvicorn en subproceso sobre SQLite temporal, con un licitante y 50 convocatorias."""
+    tmp = tempfile.mkdtemp(prefix="load_uploads-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", BLOB_DIR=os.path.join(tmp, "blobs"),
+               UPLOAD_DIR=os.path.join(tmp, "uploads"))
+    env.setdefault("KEY_ENCRYPTION_SECRET", "bench-key-encryption-secret")  # sin ella el servidor no arranca
+    os.environ.update(env)
+    from app.db import Base, engine, SessionLocal
+    from app.models import User, Role, Convocatoria
+    from app.auth.password import hash_password
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    owner = User(email="owner@example.com", name="owner", role=Role.CONVOCANTE, password_hash="x")
+    lic = User(email="lic@example.com", name="lic", role=Role.LICITANTE, password_hash=hash_password("bench"))
+    db.add_all([owner, lic]); db.commit()
+    db.add_all([Convocatoria(titulo=f"conv {i}", descripcion="bench", owner_id=owner.id) for i in range(50)])
+    db.commit()
+    conv_id = db.query(Convocatoria.id).first()[0]
+    db.close()
+
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], env=env)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(base + "/api/convocatorias").raise_for_status()
+            break
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    return proc, base, "lic@example.com", "bench", conv_id
+
+
+async def main(argv):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--email")
+    ap.add_argument("--password")
+    ap.add_argument("--conv-id", type=int)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--readers", type=int, default=16)
+    ap.add_argument("--uploaders", type=int, default=4)
+    ap.add_argument("--size-mb", type=float, default=8)
+    a = ap.parse_args(argv)
+
+    if a.url:
+        proc, base, email, password, conv_id = None, a.url, a.email, a.password, a.conv_id
+    else:
+        proc, base, email, password, conv_id = _spawn_server(a.port)
+
+    body = _submission_body(int(a.size_mb * 1024 * 1024))
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=None) as client:
+            r = await client.post("/api/auth/login", json={"email": email, "password": password})
+            r.raise_for_status()
+            for _ in range(20):  # calentar conexiones y caché de SQLite
+                await client.get("/api/convocatorias")
+
+            print(f"{'fase':<22}{'lecturas':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'subidas':>10}")
+            for name, up in (("reposo", 0), (f"{a.uploaders} x {a.size_mb:g} MiB", a.uploaders)):
+                lat, n_up = await _phase(client, a.seconds, a.readers, up, conv_id, body)
+                print(f"{name:<22}{len(lat):>10}{statistics.median(lat):>10.1f}{_pct(lat, 0.99):>10.1f}"
+                      f"{max(lat):>10.1f}{n_up:>10}")
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
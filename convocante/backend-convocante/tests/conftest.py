@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Los tests corren desde backend-convocante/ con SQLite y carpetas temporales: la
+# configuración se lee al importar `app`, así que el entorno se fija antes.
+_tmp = tempfile.mkdtemp(prefix="convocante-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("KEY_POOL_SIZE", "0")
+os.environ.setdefault("KEY_ENCRYPTION_SECRET", "tests-key-encryption-secret")
+for name in ("UPLOAD_DIR", "BLOB_DIR", "OPEN_DIR"):
+    os.environ.setdefault(name, os.path.join(_tmp, name.lower()))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,29 @@
+import asyncio
+from pathlib import Path
+
+from app.submissions import router
+from app.submissions.service import SealedPackage
+
+VECTOR = Path(__file__).with_name("data") / "sbx2_vector.bin"
+
+
+def test_entry_download_closes_package_when_client_disconnects(monkeypatch):
+    pkg = SealedPackage(open(VECTOR, "rb"), bytes(range(32)), b"", b"")
+    monkeypatch.setattr(router, "_open_own_package", lambda *a: pkg)
+    resp = router.descargar_entrada(1, 1, "texto.txt", "", None, None)
+
+    async def run():
+        first_chunk = asyncio.Event()
+
+        async def send(msg):
+            if msg["type"] == "http.response.body" and msg.get("body"):
+                first_chunk.set()
+
+        async def receive():
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        await resp({"type": "http", "asgi": {"spec_version": "2.0"}}, receive, send)
+
+    asyncio.run(run())
+    assert pkg._src.closed
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.config import settings
+from app.db import SessionLocal
+from app.models import CallKey
+from app.keys import pool
+
+
+@pytest.mark.parametrize("secret", ["", "change-me", settings.SECRET_TOKEN])
+def test_refuses_to_start_without_own_key_secret(monkeypatch, secret):
+    monkeypatch.setattr(settings, "KEY_ENCRYPTION_SECRET", secret)
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.KeyPool(0, 2048, 1).start())
+
+
+def test_private_key_is_encrypted_with_its_own_secret_and_not_served(monkeypatch):
+    monkeypatch.setattr(settings, "KEY_BITS", 2048)
+    monkeypatch.setattr(pool.key_pool, "bits", 2048)
+    with TestClient(app) as c:
+        c.post("/api/auth/register", json={"email": "claves@example.com", "name": "k", "password": "pw", "role": "CONVOCANTE"})
+        c.post("/api/auth/login", json={"email": "claves@example.com", "password": "pw"})
+        key_id = c.post("/api/calls", json={"call_id": "TEST-001"}).json()["key_id"]
+        assert c.get(f"/api/keys/{key_id}/rsa_pub.pem").status_code == 200
+        assert c.get(f"/api/keys/{key_id}/rsa_priv.pem").status_code == 404
+
+    with SessionLocal() as db:
+        private_pem = db.get(CallKey, key_id).private_pem
+    with pytest.raises(ValueError):
+        serialization.load_pem_private_key(private_pem, password=settings.SECRET_TOKEN.encode())
+    serialization.load_pem_private_key(private_pem, password=settings.KEY_ENCRYPTION_SECRET.encode())
@@ -0,0 +1,59 @@
+import os
+import time
+import base64
+import threading
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.submissions import batch
+
+KEY = base64.b64encode(rsa.generate_private_key(65537, 2048).private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())).decode()
+
+
+def _convocatoria(c: TestClient) -> int:
+    c.post("/api/auth/register", json={"email": "apertura@example.com", "name": "a", "password": "pw", "role": "CONVOCANTE"})
+    c.post("/api/auth/login", json={"email": "apertura@example.com", "password": "pw"})
+    return c.post("/api/convocatorias", json={"titulo": "t", "descripcion": "d"}).json()["id"]
+
+
+def test_workers_is_bounded():
+    with TestClient(app) as c:
+        cid = _convocatoria(c)
+        for workers in (0, (os.cpu_count() or 1) + 1):
+            r = c.post(f"/api/submissions/{cid}/open-all", params={"private_key_pem_b64": KEY, "workers": workers})
+            assert r.status_code == 422
+
+
+def test_second_job_for_same_convocatoria_is_rejected(monkeypatch):
+    release = threading.Event()
+    seen = []
+    run = batch._run
+
+    def slow_run(job, private_pem, workers):
+        seen.append(workers)
+        release.wait(10)
+        run(job, private_pem, workers)
+
+    monkeypatch.setattr(batch, "_run", slow_run)
+    with TestClient(app) as c:
+        cid = _convocatoria(c)
+        url = f"/api/submissions/{cid}/open-all"
+        first = c.post(url, params={"private_key_pem_b64": KEY, "workers": 1})
+        assert first.status_code == 202
+        second = c.post(url, params={"private_key_pem_b64": KEY})
+        assert second.status_code == 409
+        assert first.json()["id"] in second.json()["detail"]
+
+        release.set()
+        for _ in range(100):
+            if batch.get_job(first.json()["id"]).finished_at:
+                break
+            time.sleep(0.05)
+        third = c.post(url, params={"private_key_pem_b64": KEY})
+        assert third.status_code == 202
+    assert seen[0] == 1
+    assert batch.output_path(cid, "a", 1).parent != batch.output_path(cid, "b", 1).parent
@@ -0,0 +1,84 @@
+import io
+import hashlib
+import importlib.util
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+from app import sbx2
+from app.crypto_utils import ChunkedAeadReader, rsa_decrypt_oaep_sha256
+
+# Vector fijo (tests/data/sbx2_vector.bin): contenedor v2 con trozos de 4 KiB, clave
+# bytes(range(32)) y una entrada por codec. Lo tienen que leer igual las dos copias de
+# sbx2.py; si cambia el formato, hay que regenerarlo a propósito.
+VECTOR = Path(__file__).with_name("data") / "sbx2_vector.bin"
+VECTOR_KEY = bytes(range(32))
+CLIDESK = Path(__file__).resolve().parents[3] / "clidesk"
+needs_clidesk = pytest.mark.skipif(not (CLIDESK / "sbx2.py").exists(), reason="sin clidesk/ en el árbol")
+
+
+def _vector_contents():
+    text = b"".join(b"linea %05d de la propuesta\n" % i for i in range(2000))
+    return {"texto.txt": text, "anexo.csv": text[:20000], "memoria.md": text[::-1],
+            "foto.jpg": hashlib.shake_256(b"sbx2").digest(5000)}
+
+
+def _clidesk_sbx2():
+    spec = importlib.util.spec_from_file_location("clidesk_sbx2", CLIDESK / "sbx2.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _read_all(reader_cls, fp, key):
+    reader = reader_cls(fp, key)
+    return {e["name"]: b"".join(reader.open_entry(e["name"])) for e in reader.entries}
+
+
+@needs_clidesk
+def test_vendored_copies_are_identical():
+    assert (CLIDESK / "sbx2.py").read_bytes() == Path(sbx2.__file__).read_bytes()
+
+
+@pytest.mark.parametrize("reader_cls", [sbx2.ChunkedAeadReader, ChunkedAeadReader])
+def test_server_reads_vector(reader_cls):
+    with open(VECTOR, "rb") as f:
+        assert sbx2.is_chunked(f)
+        assert _read_all(reader_cls, f, VECTOR_KEY) == _vector_contents()
+
+
+@needs_clidesk
+def test_clidesk_reads_vector():
+    clidesk_sbx2 = _clidesk_sbx2()
+    with open(VECTOR, "rb") as f:
+        assert _read_all(clidesk_sbx2.ChunkedAeadReader, f, VECTOR_KEY) == _vector_contents()
+
+
+@needs_clidesk
+def test_v2_round_trip_clidesk_to_both_readers(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(CLIDESK))
+    from crypto_ops import open_sealed, run_encrypt_and_sign
+
+    rk = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    rpub = rk.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    rpriv = rk.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    ed = ed25519.Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    files = {"oferta.txt": b"precio unitario 10\n" * 20000, "plano.bin": hashlib.shake_256(b"plano").digest(300_000),
+             "vacio.txt": b""}
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+    out = tmp_path / "out"
+    run_encrypt_and_sign([tmp_path / n for n in files], rpub, ed, out, {"name": "x"}, "c", "k", format_version=2)
+
+    with open_sealed(out, rpriv) as pkg:
+        assert pkg.format == 2
+        from_clidesk = {e["name"]: b"".join(pkg.open(e["name"])) for e in pkg.entries()}
+    key = rsa_decrypt_oaep_sha256(rpriv, (out / "wrapped_key.bin").read_bytes())
+    from_server = _read_all(ChunkedAeadReader, io.BytesIO((out / "payload.enc").read_bytes()), key)
+
+    assert from_server == from_clidesk
+    assert {n: from_server[n] for n in files} == files
+    assert set(from_server) == set(files) | {"manifest.json", "signature.bin"}
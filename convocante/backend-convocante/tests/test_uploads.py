@@ -0,0 +1,50 @@
+import time
+import asyncio
+import hashlib
+import secrets
+
+import pytest
+from fastapi import HTTPException
+
+from app.submissions import uploads
+
+
+async def _stream(*parts):
+    for p in parts:
+        yield p
+
+
+def test_locked_upload_rejects_a_second_writer():
+    uid = secrets.token_hex(16)
+    uploads.create(uid)
+
+    async def run():
+        async with uploads.locked(uid):
+            # otra descripción de archivo, como la de otro worker: flock no la deja pasar
+            with pytest.raises(HTTPException) as e:
+                uploads._acquire(uid)
+            assert e.value.status_code == 409
+        uploads._acquire(uid).close()
+
+    asyncio.run(run())
+    uploads.discard(uid)
+    assert not uploads.lock_path(uid).exists() and not uploads.part_path(uid).exists()
+
+
+def test_idle_hash_state_is_evicted_and_rebuilt(monkeypatch):
+    old, new = secrets.token_hex(16), secrets.token_hex(16)
+    data = secrets.token_bytes(3000)
+    uploads.create(old)
+    assert asyncio.run(uploads.append_chunk(old, 0, len(data), _stream(data[:1000]))) == 1000
+
+    later = time.monotonic() + uploads.settings.UPLOAD_STATE_TTL + 1
+    monkeypatch.setattr(uploads.time, "monotonic", lambda: later)
+    uploads.create(new)
+    assert old not in uploads._hashers and new in uploads._hashers
+
+    # sin estado en memoria se recalcula desde el .part
+    assert asyncio.run(uploads.append_chunk(old, 1000, len(data), _stream(data[1000:]))) == len(data)
+    uploads.finalize(old, len(data), hashlib.sha256(data).hexdigest(), None, None)
+    for uid in (old, new):
+        uploads.discard(uid)
+    assert old not in uploads._hashers and new not in uploads._hashers
@@ -0,0 +1,134 @@
+import os
+import json
+import asyncio
+
+import asyncpg
+import pytest
+
+from app.ws.backends import PostgresBackend
+from app.ws.hub import Hub
+
+N = 20
+
+
+class FakePg:
+    """Postgres mínimo en memoria: una SEQUENCE y NOTIFY a las conexiones en LISTEN."""
+
+    def __init__(self):
+        self.seq = 0
+        self.listeners = []
+
+
+class FakeConn:
+    """Como asyncpg: una conexión usada por dos operaciones a la vez lanza InterfaceError."""
+
+    def __init__(self, pg: FakePg):
+        self.pg = pg
+        self.busy = False
+
+    async def _run(self, fn):
+        if self.busy:
+            raise asyncpg.InterfaceError("cannot perform operation: another operation is in progress")
+        self.busy = True
+        try:
+            await asyncio.sleep(0.001)
+            return fn()
+        finally:
+            self.busy = False
+
+    async def execute(self, sql, *args):
+        def run():
+            if sql.startswith("SELECT pg_notify"):
+                loop = asyncio.get_running_loop()
+                for cb in self.pg.listeners:
+                    loop.call_soon(cb, self, 0, args[0], args[1])
+        return await self._run(run)
+
+    async def fetchval(self, sql, *args):
+        def run():
+            self.pg.seq += 1
+            return self.pg.seq
+        return await self._run(run)
+
+    async def fetchrow(self, sql, *args):
+        return await self._run(lambda: {"last_value": self.pg.seq or 1, "is_called": self.pg.seq > 0})
+
+    def add_termination_listener(self, cb):
+        pass
+
+    async def add_listener(self, channel, cb):
+        self.pg.listeners.append(cb)
+
+    async def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, pg: FakePg, size: int):
+        self._free: "asyncio.Queue[FakeConn]" = asyncio.Queue()
+        for _ in range(size):
+            self._free.put_nowait(FakeConn(pg))
+
+    async def _call(self, name, *args):
+        conn = await self._free.get()
+        try:
+            return await getattr(conn, name)(*args)
+        finally:
+            self._free.put_nowait(conn)
+
+    async def execute(self, *args):
+        return await self._call("execute", *args)
+
+    async def fetchval(self, *args):
+        return await self._call("fetchval", *args)
+
+    async def fetchrow(self, *args):
+        return await self._call("fetchrow", *args)
+
+    async def close(self):
+        pass
+
+
+async def _concurrent_broadcasts(make_backend):
+    # dos "workers" con su hub; cada uno lanza la mitad de los avisos a la vez
+    hubs = [Hub(make_backend()), Hub(make_backend())]
+    for h in hubs:
+        await h.start()
+    try:
+        await asyncio.gather(*(hubs[i % 2].broadcast({"type": "new_convocatoria", "id": i}) for i in range(N)))
+        for _ in range(200):
+            if all(len(h.log.since(0) or ()) >= N for h in hubs):
+                break
+            await asyncio.sleep(0.01)
+        return [h.log.since(0) for h in hubs]
+    finally:
+        for h in hubs:
+            await h.stop()
+
+
+def test_concurrent_broadcasts_do_not_share_the_listen_connection(monkeypatch):
+    async def run():
+        pg = FakePg()
+
+        async def connect(dsn):
+            return FakeConn(pg)
+
+        async def create_pool(dsn, min_size, max_size):
+            return FakePool(pg, max_size)
+
+        monkeypatch.setattr(asyncpg, "connect", connect)
+        monkeypatch.setattr(asyncpg, "create_pool", create_pool)
+        return await _concurrent_broadcasts(lambda: PostgresBackend("postgresql://fake/db", "test_ws", 2))
+
+    for log in asyncio.run(run()):
+        assert len(log) == N
+        assert [json.loads(t)["seq"] for t in log] == list(range(1, N + 1))
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL sin definir")
+def test_concurrent_broadcasts_postgres():
+    dsn = os.environ["TEST_POSTGRES_URL"]
+    channel = f"test_ws_{os.getpid()}"
+    logs = asyncio.run(_concurrent_broadcasts(lambda: PostgresBackend(dsn, channel, 2)))
+    for log in logs:
+        assert len(log) == N
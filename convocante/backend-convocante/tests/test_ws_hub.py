@@ -0,0 +1,57 @@
+import json
+import asyncio
+
+from app.ws.backends import InProcessBackend
+from app.ws.hub import Hub
+
+
+class FakeWS:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+
+async def _snapshot():
+    return {"type": "snapshot", "items": []}
+
+
+async def _resume(hub: Hub, cursor, epoch):
+    ws = FakeWS()
+    await hub.connect(ws, cursor, epoch, snapshot=_snapshot)
+    await asyncio.sleep(0.01)
+    hub.disconnect(ws)
+    return ws.sent
+
+
+def test_resume_after_restart_gets_snapshot():
+    async def run():
+        old = Hub(InProcessBackend())
+        for i in range(3):
+            await old.broadcast({"type": "new_convocatoria", "id": i})
+        seen = json.loads(old.log.since(0)[-1])
+        await old.stop()
+
+        # reinicio: el contador vuelve a 0 y avanza más allá del cursor del cliente
+        new = Hub(InProcessBackend())
+        for i in range(5):
+            await new.broadcast({"type": "new_convocatoria", "id": 10 + i})
+        epoch = new.backend.epoch
+
+        stale = await _resume(new, seen["seq"], seen["epoch"])
+        current = await _resume(new, 3, epoch)
+        await new.stop()
+        return seen, epoch, stale, current
+
+    seen, epoch, stale, current = asyncio.run(run())
+    assert seen["epoch"] != epoch
+    assert [m["type"] for m in stale] == ["snapshot"]
+    assert stale[0]["seq"] == 5 and stale[0]["epoch"] == epoch
+    assert [(m["seq"], m["id"]) for m in current] == [(4, 13), (5, 14)]
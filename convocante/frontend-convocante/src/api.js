@@ -12,4 +12,17 @@ export async function api(url, opts = {}) {
   const ct = res.headers.get('content-type')||''
   return ct.includes('application/json') ? res.json() : res.text()
 }
+// Listados paginados por keyset: la cabecera X-Next-Cursor trae el ?cursor= de la
+// página siguiente (null en la última).
+export async function apiPage(url, cursor = null) {
+  const sep = url.includes('?') ? '&' : '?'
+  const res = await fetch(API + url + (cursor ? `${sep}cursor=${encodeURIComponent(cursor)}` : ''), {
+    credentials: 'include'
+  })
+  if (!res.ok) {
+    const msg = await res.text().catch(()=>res.statusText)
+    throw new Error(msg || res.statusText)
+  }
+  return { items: await res.json(), next: res.headers.get('X-Next-Cursor') }
+}
 export { API }
@@ -1,9 +1,15 @@
 import React, { useEffect, useState } from 'react'
-import { api } from '../api'
+import { api, apiPage } from '../api'
 export default function Convocatorias() {
   const [items, setItems] = useState([])
+  const [next, setNext] = useState(null)
   const [sel, setSel] = useState(null)
-  useEffect(()=>{ (async()=> setItems(await api('/api/convocatorias')))() },[])
+  const load = async (cursor = null)=>{
+    const page = await apiPage('/api/convocatorias', cursor)
+    setItems(curr=> cursor ? [...curr, ...page.items] : page.items)
+    setNext(page.next)
+  }
+  useEffect(()=>{ load() },[])
   const open = async (id)=>{ setSel(await api('/api/convocatorias/'+id)) }
   return (
     <div className="container">
@@ -19,6 +25,7 @@ export default function Convocatorias() {
             </div>
           ))}
         </div>
+        {next && <><div className="sp" /><button onClick={()=>load(next)}>Cargar más</button></>}
       </div>
       {sel && <ConvocatoriaDetail item={sel} />}
     </div>
@@ -3,6 +3,15 @@ set -euo pipefail
 
 BASE_URL="${1:-http://127.0.0.1:8001/convocante}"
 CALL_ID="${2:-TEST-001}"
+# POST /api/calls requiere una sesión de convocante
+EMAIL="${EMAIL:?define EMAIL y PASSWORD de un usuario CONVOCANTE}"
+PASSWORD="${PASSWORD:?define EMAIL y PASSWORD de un usuario CONVOCANTE}"
+JAR=$(mktemp)
+trap 'rm -f "$JAR"' EXIT
+
+echo "== Login =="
+curl -s -f -c "$JAR" -X POST "$BASE_URL/api/auth/login" -H "Content-Type: application/json" \
+  -d "{\"email\": \"$EMAIL\", \"password\": \"$PASSWORD\"}" > /dev/null
 
 echo "== Create call (server generates RSA) =="
 
@@ -11,7 +20,7 @@ CREATE_PAYLOAD=$(cat <<JSON
 JSON
 )
 
-resp=$(curl -s -f -X POST "$BASE_URL/api/calls" -H "Content-Type: application/json" -d "$CREATE_PAYLOAD")
+resp=$(curl -s -f -b "$JAR" -X POST "$BASE_URL/api/calls" -H "Content-Type: application/json" -d "$CREATE_PAYLOAD")
 echo "$resp" | jq .
 
 kid=$(echo "$resp" | jq -r .key_id)
@@ -1,7 +1,105 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
 import bcrypt
 
+from ..config import settings
+from .. import metrics
+from ..metrics import CRYPTO_LATENCY
+
+# bcrypt es CPU puro (~250 ms a coste 12). En el threadpool de Starlette una avalancha de
+# logins lo acapara y deja sin hilos al resto de rutas; en hilos propios competiría igual
+# por el GIL. Por eso corre en un pool de procesos dedicado, y un semáforo limita las
+# operaciones en vuelo: quien espera turno más de BCRYPT_QUEUE_TIMEOUT recibe
+# PasswordHasherBusy (503) en lugar de encolarse sin límite.
+
+_T_HASH = CRYPTO_LATENCY.labels("bcrypt_hash")
+_T_VERIFY = CRYPTO_LATENCY.labels("bcrypt_verify")
+
+BCRYPT_QUEUE = metrics.histogram("bcrypt_queue_seconds", "Espera hasta que un worker empieza el bcrypt", ("op",))
+BCRYPT_IN_FLIGHT = metrics.gauge("bcrypt_in_flight", "Operaciones bcrypt en curso o esperando turno")
+BCRYPT_REJECTED = metrics.counter("bcrypt_rejected_total", "Operaciones bcrypt rechazadas por espera excesiva", ("op",))
+
+
+class PasswordHasherBusy(Exception):
+    """No hubo turno en el pool de bcrypt dentro de BCRYPT_QUEUE_TIMEOUT."""
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True si el hash ("$2b$<coste>$...") no usa el coste actual (BCRYPT_ROUNDS)."""
+    try:
+        return int(hashed.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+# ---- Síncrono (scripts, benchmarks) ----
+
 def hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
+    with _T_HASH.time():
+        return bcrypt.hashpw(plain.encode(), bcrypt.gensalt(settings.BCRYPT_ROUNDS)).decode()
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode(), hashed.encode())
+    with _T_VERIFY.time():
+        return bcrypt.checkpw(plain.encode(), hashed.encode())
+
+
+# ---- Lado worker (proceso del pool): devuelven también el tiempo de CPU ----
+
+def _hash(plain: bytes, rounds: int) -> Tuple[bytes, float]:
+    t0 = time.perf_counter()
+    return bcrypt.hashpw(plain, bcrypt.gensalt(rounds)), time.perf_counter() - t0
+
+def _check(plain: bytes, hashed: bytes) -> Tuple[bool, float]:
+    t0 = time.perf_counter()
+    return bcrypt.checkpw(plain, hashed), time.perf_counter() - t0
+
+
+# ---- Asíncrono (handlers) ----
+
+_executor: Optional[ProcessPoolExecutor] = None
+_workers = settings.BCRYPT_WORKERS or os.cpu_count() or 1
+_slots = asyncio.Semaphore(settings.BCRYPT_MAX_CONCURRENCY or _workers)
+
+def password_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: el servidor ya tiene hilos (threadpool, crypto) y fork podría heredar un lock tomado
+        _executor = ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)  # como mucho espera el bcrypt en curso
+        _executor = None
+
+async def _run(op: str, timer, fn, *args):
+    t0 = time.perf_counter()
+    BCRYPT_IN_FLIGHT.inc()
+    try:
+        try:
+            await asyncio.wait_for(_slots.acquire(), settings.BCRYPT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            BCRYPT_REJECTED.labels(op).inc()
+            raise PasswordHasherBusy()
+        try:
+            result, cpu = await asyncio.get_running_loop().run_in_executor(password_executor(), fn, *args)
+        finally:
+            _slots.release()
+    finally:
+        BCRYPT_IN_FLIGHT.dec()
+    # lo que no fue bcrypt: turno en el semáforo + cola del pool + IPC
+    BCRYPT_QUEUE.labels(op).observe(time.perf_counter() - t0 - cpu)
+    timer.observe(cpu)
+    return result
+
+async def hash_password_async(plain: str) -> str:
+    return (await _run("hash", _T_HASH, _hash, plain.encode(), settings.BCRYPT_ROUNDS)).decode()
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run("verify", _T_VERIFY, _check, plain.encode(), hashed.encode())
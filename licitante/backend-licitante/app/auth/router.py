@@ -1,44 +1,77 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from itsdangerous import URLSafeSerializer, BadSignature
-from ..db import get_db
+from ..db import get_async_db
 from ..models import User
 from ..schemas import UserCreate, UserOut, LoginIn
-from .password import hash_password, verify_password
+from .password import PasswordHasherBusy, hash_password_async, verify_password_async, needs_rehash
+from .sessions import Identity, create_session, resolve, resolve_async, revoke
 from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 ser = URLSafeSerializer(settings.SECRET_TOKEN, salt="session")
 SESSION_COOKIE = "session"
 
-def get_current_user(req: Request, db: Session) -> User | None:
+def _session_id(req: Request) -> str | None:
     token = req.cookies.get(SESSION_COOKIE)
     if not token:
         return None
     try:
-        data = ser.loads(token)
-        return db.get(User, int(data["uid"]))
+        # las cookies anteriores llevaban {"uid": ...}: sin sid, hay que volver a entrar
+        return ser.loads(token).get("sid")
     except BadSignature:
         return None
 
+def get_current_user(req: Request, db: Session) -> Identity | None:
+    sid = _session_id(req)
+    return resolve(db, sid) if sid else None
+
+async def get_current_user_async(req: Request, db: AsyncSession) -> Identity | None:
+    sid = _session_id(req)
+    return await resolve_async(db, sid) if sid else None
+
+def _busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Servidor ocupado, reintenta en unos segundos",
+                         headers={"Retry-After": "5"})
+
 @router.post("/register", response_model=UserOut)
-def register(body: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter_by(email=body.email).first():
+async def register(body: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(User.id).filter_by(email=body.email)):
         raise HTTPException(status_code=400, detail="Email ya registrado")
-    user = User(email=body.email, name=body.name, role=body.role, password_hash=hash_password(body.password))
-    db.add(user); db.commit(); db.refresh(user)
+    try:
+        password_hash = await hash_password_async(body.password)
+    except PasswordHasherBusy:
+        raise _busy()
+    user = User(email=body.email, name=body.name, role=body.role, password_hash=password_hash)
+    db.add(user); await db.commit(); await db.refresh(user)
     return user
 
 @router.post("/login", response_model=UserOut)
-def login(body: LoginIn, response: Response, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(email=body.email).first()
-    if not user or not verify_password(body.password, user.password_hash):
+async def login(body: LoginIn, response: Response, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).filter_by(email=body.email))
+    try:
+        ok = user is not None and await verify_password_async(body.password, user.password_hash)
+    except PasswordHasherBusy:
+        raise _busy()
+    if not ok:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
-    cookie = ser.dumps({"uid": user.id})
-    response.set_cookie("session", cookie, httponly=True, samesite="lax")
+    if needs_rehash(user.password_hash):
+        # BCRYPT_ROUNDS cambió: se aprovecha que tenemos la contraseña en claro
+        try:
+            user.password_hash = await hash_password_async(body.password)
+            await db.commit()
+        except PasswordHasherBusy:
+            pass  # el rehash queda para el próximo login
+    cookie = ser.dumps({"sid": await create_session(db, user)})
+    response.set_cookie(SESSION_COOKIE, cookie, max_age=settings.SESSION_TTL, httponly=True, samesite="lax")
     return user
 
 @router.post("/logout")
-def logout(response: Response):
-    response.delete_cookie("session")
+async def logout(req: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    sid = _session_id(req)
+    if sid:
+        await revoke(db, sid)
+    response.delete_cookie(SESSION_COOKIE)
     return {"ok": True}
@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .config import settings
+from . import metrics
+from .pglisten import PgListener, asyncpg_dsn
+
+CACHE_REQUESTS = metrics.counter("cache_requests_total", "Lecturas de caché por resultado", ("cache", "result"))
+CACHE_INVALIDATIONS = metrics.counter("cache_invalidations_total", "Invalidaciones de caché", ("cache",))
+
+
+class CacheBackend:
+    """
+    Almacén clave -> bytes con TTL. `shared` indica si lo ven todos los procesos (una
+    invalidación en uno vale para todos) o solo el propio.
+    """
+    shared = False
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Contador sin TTL ni expulsión (versiones de espacio de nombres)."""
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """LRU + TTL en el proceso."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RedisBackend(CacheBackend):
+    """Compartido entre workers y entre backends (requiere `pip install redis`)."""
+    shared = True
+
+    def __init__(self, url: str):
+        import redis
+        self._r = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._r.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._r.set(key, value, px=int(ttl * 1000))
+
+    def incr(self, key: str) -> int:
+        return int(self._r.incr(key))
+
+    def counter(self, key: str) -> int:
+        return int(self._r.get(key) or 0)
+
+
+BACKENDS = {
+    "memory": lambda: MemoryBackend(settings.CACHE_SIZE),
+    "redis": lambda: RedisBackend(settings.CACHE_URL),
+}
+
+
+def get_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND not in BACKENDS:
+        raise RuntimeError(f"CACHE_BACKEND desconocido: {settings.CACHE_BACKEND}")
+    return BACKENDS[settings.CACHE_BACKEND]()
+
+
+class ReadThroughCache:
+    """
+    Caché de lectura para un espacio de nombres (p. ej. "convocatorias"). Las claves
+    llevan la versión del espacio: `invalidate()` la incrementa y todas las entradas
+    anteriores dejan de leerse (y caducan solas por TTL o LRU).
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl: float):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self._hit = CACHE_REQUESTS.labels(name, "hit")
+        self._miss = CACHE_REQUESTS.labels(name, "miss")
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{self.backend.counter(self.name + ':v')}:{key}"
+
+    def get_or_load(self, key: str, loader: Callable[[], bytes]) -> bytes:
+        full = self._key(key)
+        value = self.backend.get(full)
+        if value is not None:
+            self._hit.inc()
+            return value
+        self._miss.inc()
+        value = loader()
+        self.backend.set(full, value, self.ttl)
+        return value
+
+    def invalidate(self) -> None:
+        self.backend.incr(self.name + ":v")
+        CACHE_INVALIDATIONS.labels(self.name).inc()
+
+
+def pack_response(body: bytes, headers: Dict[str, str]) -> bytes:
+    """Cuerpo ya serializado + cabeceras en un solo valor de caché (cabeceras en la 1ª línea)."""
+    return json.dumps(headers).encode() + b"\n" + body
+
+
+def unpack_response(value: bytes) -> Tuple[bytes, Dict[str, str]]:
+    head, _, body = value.partition(b"\n")
+    return body, json.loads(head)
+
+
+_backend = get_backend()
+convocatorias_cache = ReadThroughCache("convocatorias", _backend, settings.CACHE_TTL)
+
+if isinstance(_backend, MemoryBackend):
+    metrics.gauge("cache_entries", "Entradas en la caché en memoria", fn=lambda: {(): len(_backend)})
+
+
+class InvalidationListener:
+    """
+    Las convocatorias las crea el convocante: este proceso se entera escuchando (LISTEN)
+    el canal de su hub (WS_BACKEND=postgres) e invalida la caché con cada
+    `new_convocatoria`. La conexión es un `PgListener` (el mismo que usa el hub del
+    convocante): si cae se reintenta con backoff y se invalida al volver, por lo que
+    pudiera haberse perdido. Sin canal, la caché caduca por TTL.
+    """
+
+    def __init__(self, cache: ReadThroughCache, dsn: str, channel: str):
+        self.cache = cache
+        self._listener = PgListener(dsn, channel, self._on_notify, self._on_reconnect)
+
+    async def start(self) -> None:
+        await self._listener.start()
+
+    async def _on_reconnect(self):
+        self.cache.invalidate()
+
+    def _on_notify(self, payload: str):
+        if json.loads(payload).get("type") == "new_convocatoria":
+            self.cache.invalidate()
+
+    async def stop(self) -> None:
+        await self._listener.stop()
+
+
+def invalidation_listener() -> Optional[InvalidationListener]:
+    # Con caché compartida (Redis) invalida el propio convocante al crear
+    if not settings.CACHE_LISTEN_CHANNEL or _backend.shared:
+        return None
+    return InvalidationListener(convocatorias_cache, asyncpg_dsn(settings.DATABASE_URL), settings.CACHE_LISTEN_CHANNEL)
@@ -1,17 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session
 from ..db import get_db
 from ..models import Convocatoria
-from ..schemas import ConvocatoriaOut
+from ..schemas import ConvocatoriaOut, ConvocatoriaSummary
+from ..etag import body_response, etag_for, render_json
+from ..cache import convocatorias_cache, pack_response, unpack_response
 
 router = APIRouter(prefix="/convocatorias", tags=["convocatorias"])
 
-@router.get("", response_model=list[ConvocatoriaOut])
-def listar(db: Session = Depends(get_db)):
-    return db.query(Convocatoria).order_by(Convocatoria.id.desc()).all()
+@router.get("", response_model=list[ConvocatoriaSummary])
+def listar(req: Request, cursor: int | None = None, limit: int = Query(50, ge=1, le=500),
+           owner_id: int | None = None, desde: datetime | None = None, hasta: datetime | None = None,
+           db: Session = Depends(get_db)):
+    """
+    Convocatorias, de la más reciente a la más antigua, sin `descripcion`. Paginado por id:
+    la cabecera X-Next-Cursor trae el `?cursor=` de la página siguiente. Filtros opcionales
+    por dueño y por `created_at` en [desde, hasta). Con If-None-Match responde 304.
+    """
+    def load() -> bytes:
+        q = db.query(Convocatoria.id, Convocatoria.titulo, Convocatoria.owner_id, Convocatoria.created_at)
+        if cursor is not None:
+            q = q.filter(Convocatoria.id < cursor)
+        if owner_id is not None:
+            q = q.filter(Convocatoria.owner_id == owner_id)
+        if desde is not None:
+            q = q.filter(Convocatoria.created_at >= desde)
+        if hasta is not None:
+            q = q.filter(Convocatoria.created_at < hasta)
+        rows = q.order_by(Convocatoria.id.desc()).limit(limit + 1).all()
+        body = render_json([dict(r._mapping) for r in rows[:limit]])
+        headers = {"Cache-Control": "no-cache", "ETag": etag_for(body)}
+        if len(rows) > limit:
+            headers["X-Next-Cursor"] = str(rows[limit - 1].id)
+        return pack_response(body, headers)
+
+    key = f"list:{cursor}:{limit}:{owner_id}:{desde and desde.isoformat()}:{hasta and hasta.isoformat()}"
+    body, headers = unpack_response(convocatorias_cache.get_or_load(key, load))
+    return body_response(req, body, headers)
 
 @router.get("/{conv_id}", response_model=ConvocatoriaOut)
-def detalle(conv_id: int, db: Session = Depends(get_db)):
-    c = db.get(Convocatoria, conv_id)
-    if not c: raise HTTPException(status_code=404, detail="No existe")
-    return c
+def detalle(conv_id: int, req: Request, db: Session = Depends(get_db)):
+    def load() -> bytes:
+        c = db.get(Convocatoria, conv_id)
+        if not c: raise HTTPException(status_code=404, detail="No existe")
+        body = render_json({"id": c.id, "titulo": c.titulo, "descripcion": c.descripcion, "owner_id": c.owner_id})
+        return pack_response(body, {"Cache-Control": "no-cache", "ETag": etag_for(body)})
+
+    body, headers = unpack_response(convocatorias_cache.get_or_load(f"detail:{conv_id}", load))
+    return body_response(req, body, headers)
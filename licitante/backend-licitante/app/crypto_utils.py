@@ -1,24 +1,122 @@
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
-import binascii, hashlib
+import binascii, hashlib, threading, time
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable
+from .config import settings
+from .metrics import CRYPTO_LATENCY
+
+CHUNK = 1024 * 1024
+
+_T_RSA_UNWRAP = CRYPTO_LATENCY.labels("rsa_unwrap")
+_T_AES_GCM = CRYPTO_LATENCY.labels("aes_gcm_decrypt")
+_T_AES_GCM_STREAM = CRYPTO_LATENCY.labels("aes_gcm_decrypt_stream")
+_T_ED25519 = CRYPTO_LATENCY.labels("ed25519_verify")
+
+class KeyCache:
+    """
+    Caché LRU + TTL de claves ya parseadas, indexada por la huella SHA-256 del material
+    (PEM o bytes crudos). Nunca guarda el PEM, solo el objeto clave; una entrada
+    expulsada o caducada se suelta y la libera el recolector.
+    """
+
+    def __init__(self, maxsize: int = 32, ttl: float = 900.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def fingerprint(material: bytes) -> str:
+        return hashlib.sha256(material).hexdigest()
+
+    def get_or_load(self, material: bytes, loader: Callable[[bytes], Any]) -> Any:
+        fp = self.fingerprint(material)
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(fp)
+            if item and item[0] > now:
+                self._items.move_to_end(fp)
+                self.hits += 1
+                return item[1]
+        key = loader(material)  # fuera del lock: parsear RSA 4096 cuesta
+        with self._lock:
+            self.misses += 1
+            if fp in self._items:
+                self._drop(fp)
+            self._items[fp] = (now + self.ttl, key)
+            while len(self._items) > self.maxsize:
+                self._drop(next(iter(self._items)))
+        return key
+
+    def _drop(self, fp: str):
+        self._items.pop(fp)
+        self.evictions += 1
+
+    def evict(self, fingerprint: str) -> bool:
+        with self._lock:
+            if fingerprint not in self._items:
+                return False
+            self._drop(fingerprint)
+            return True
+
+    def clear(self):
+        with self._lock:
+            for fp in list(self._items):
+                self._drop(fp)
+
+key_cache = KeyCache(maxsize=settings.KEY_CACHE_SIZE, ttl=settings.KEY_CACHE_TTL)
+
+def load_private_key_cached(private_pem: bytes):
+    return key_cache.get_or_load(bytes(private_pem), lambda m: serialization.load_pem_private_key(m, password=None))
+
+def load_ed25519_public_cached(pub_key_hex: str) -> Ed25519PublicKey:
+    return key_cache.get_or_load(binascii.unhexlify(pub_key_hex), Ed25519PublicKey.from_public_bytes)
 
 def rsa_decrypt_oaep_sha256(private_pem: bytes, wrapped_key: bytes) -> bytes:
-    private_key = serialization.load_pem_private_key(private_pem, password=None)
-    return private_key.decrypt(
-        wrapped_key,
-        padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
-    )
+    return rsa_unwrap(load_private_key_cached(private_pem), wrapped_key)
+
+def rsa_unwrap(private_key, wrapped_key: bytes) -> bytes:
+    """RSA-OAEP-SHA256 con una clave ya parseada (evita re-parsear el PEM por cada propuesta)."""
+    with _T_RSA_UNWRAP.time():
+        return private_key.decrypt(
+            wrapped_key,
+            padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+        )
 
 def aes_gcm_decrypt(aes_key: bytes, nonce: bytes, tag: bytes, ciphertext: bytes) -> bytes:
-    aesgcm = AESGCM(aes_key)
-    return aesgcm.decrypt(nonce, ciphertext + tag, None)
+    with _T_AES_GCM.time():
+        aesgcm = AESGCM(aes_key)
+        return aesgcm.decrypt(nonce, ciphertext + tag, None)
+
+def aes_gcm_decrypt_stream(aes_key: bytes, nonce: bytes, tag: bytes, src: BinaryIO, dst: BinaryIO) -> int:
+    """
+    Descifra `src` en `dst` por bloques de CHUNK. Lo escrito en `dst` NO está autenticado
+    hasta que la función retorna: si el tag no cuadra lanza InvalidTag y el llamador
+    debe descartar `dst`. Devuelve los bytes de plaintext escritos.
+    """
+    with _T_AES_GCM_STREAM.time():  # incluye la E/S de src y dst
+        dec = Cipher(algorithms.AES(aes_key), modes.GCM(nonce, tag)).decryptor()
+        n = 0
+        while True:
+            b = src.read(CHUNK)
+            if not b:
+                break
+            out = dec.update(b)
+            dst.write(out)
+            n += len(out)
+        dst.write(dec.finalize())  # verifica el tag
+        return n
 
 def ed25519_verify(pub_key_hex: str, message: bytes, signature: bytes) -> bool:
     try:
-        pk = Ed25519PublicKey.from_public_bytes(binascii.unhexlify(pub_key_hex))
-        pk.verify(signature, message)
+        pk = load_ed25519_public_cached(pub_key_hex)
+        with _T_ED25519.time():
+            pk.verify(signature, message)
         return True
     except Exception:
         return False
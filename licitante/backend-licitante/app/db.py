@@ -1,15 +1,110 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from .config import settings
+from . import metrics
+
+# Driver async equivalente para cada driver síncrono de DATABASE_URL
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_url(url: str) -> str:
+    u = make_url(url)
+    return u.set(drivername=ASYNC_DRIVERS.get(u.get_backend_name(), u.drivername)).render_as_string(hide_password=False)
+
+POOL_CHECKOUT_WAIT = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool (incluye abrirla si hace falta)", ("engine",))
+POOL_TIMEOUTS = metrics.counter(
+    "db_pool_timeouts_total", "Checkouts que agotaron DB_POOL_TIMEOUT", ("engine",))
+QUERY_LATENCY = metrics.histogram(
+    "db_query_duration_seconds", "Latencia de cada sentencia SQL (cursor.execute)", ("engine",))
+
+class _TimedPoolMixin:
+    """Mide cuánto espera cada checkout; `_do_get` es donde QueuePool bloquea."""
+    metrics_label = ""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.labels(self.metrics_label).inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.labels(self.metrics_label).observe(time.perf_counter() - t0)
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics_label = "sync"
+
+class TimedAsyncPool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+def pool_kwargs(url: str, poolclass) -> dict:
+    # SQLite en memoria usa su propio pool (una conexión por hilo): se deja tal cual
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:"):
+        return {}
+    return dict(
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+def instrument_queries(sync_engine, label: str):
+    hist = QUERY_LATENCY.labels(label)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_t0", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_t0"].pop()
+        hist.observe(elapsed)
+        metrics.add_db_time(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(ctx):
+        stack = ctx.connection.info.get("query_t0") if ctx.connection is not None else None
+        if stack:
+            hist.observe(time.perf_counter() - stack.pop())
 
 DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(DATABASE_URL, future=True)
+engine = create_engine(DATABASE_URL, future=True, **pool_kwargs(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_kwargs(ASYNC_DATABASE_URL, TimedAsyncPool))
+
+instrument_queries(engine, "sync")
+instrument_queries(async_engine.sync_engine, "async")
+
+def _pools():
+    return {"sync": engine.pool, "async": async_engine.sync_engine.pool}
+
+def _pool_stat(fn):
+    return lambda: {(name,): fn(p) for name, p in _pools().items() if isinstance(p, QueuePool)}
+
+metrics.gauge("db_pool_size", "Conexiones permanentes configuradas", ("engine",), fn=_pool_stat(lambda p: p.size()))
+metrics.gauge("db_pool_checked_out", "Conexiones en uso", ("engine",), fn=_pool_stat(lambda p: p.checkedout()))
+metrics.gauge("db_pool_checked_in", "Conexiones libres en el pool", ("engine",), fn=_pool_stat(lambda p: p.checkedin()))
+metrics.gauge("db_pool_overflow", "Conexiones abiertas por encima de pool_size (negativo = huecos sin abrir)",
+              ("engine",), fn=_pool_stat(lambda p: p.overflow()))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,38 @@
+import hashlib
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def etag_for(body: bytes) -> str:
+    """ETag fuerte: hash del cuerpo exacto que se envía."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def not_modified(req: Request, etag: str) -> bool:
+    # If-None-Match usa comparación débil (RFC 9110 13.1.2): se ignora el prefijo W/
+    inm = req.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    return etag in (t.strip().removeprefix("W/") for t in inm.split(","))
+
+
+def render_json(payload: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def body_response(req: Request, body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """`body` ya serializado a JSON. Usa headers["ETag"] si viene (p. ej. de caché) o lo calcula."""
+    headers = dict(headers or {})
+    etag = headers.setdefault("ETag", etag_for(body))
+    if not_modified(req, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def etag_response(req: Request, payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON con ETag; 304 sin cuerpo si el cliente ya tiene esa versión."""
+    return body_response(req, render_json(payload), headers)
@@ -0,0 +1,17 @@
+import os
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from .config import settings
+
+# Pool dedicado y acotado para la criptografía CPU-bound (base64, SHA-256, Ed25519, RSA).
+# Así no compite con el threadpool por defecto de Starlette (handlers síncronos) ni
+# bloquea el event loop (WebSockets, handlers async).
+crypto_executor = ThreadPoolExecutor(
+    max_workers=settings.CRYPTO_WORKERS or os.cpu_count() or 1,
+    thread_name_prefix="crypto",
+)
+
+async def run_crypto(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(crypto_executor, partial(fn, *args, **kwargs))
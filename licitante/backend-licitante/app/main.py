@@ -1,12 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .db import Base, engine
+from .cache import invalidation_listener
+from .auth import password
+from .metrics import router as metrics_router, MetricsMiddleware
 from .auth.router import router as auth_router
 from .convocatorias.router import router as conv_router
 from .submissions.router import router as sub_router
 
-app = FastAPI(title=settings.APP_NAME + " - LICITANTE")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    listener = invalidation_listener()
+    if listener:
+        await listener.start()
+    yield
+    if listener:
+        await listener.stop()
+    password.shutdown()
+
+app = FastAPI(title=settings.APP_NAME + " - LICITANTE", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,10 +28,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
 
 Base.metadata.create_all(bind=engine)
 
 app.include_router(auth_router, prefix="/api")
 app.include_router(conv_router, prefix="/api")
 app.include_router(sub_router, prefix="/api")
+app.include_router(metrics_router)
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.engine import make_url
+
+log = logging.getLogger(__name__)
+
+# LISTEN de Postgres sobre una conexión asyncpg dedicada, con reconexión y backoff. La
+# conexión solo escucha: asyncpg no admite dos operaciones a la vez sobre una conexión,
+# así que las consultas (nextval, pg_notify...) van por un pool aparte. Lo usan el hub de
+# WebSocket del convocante (ws/backends.py) y la invalidación de cachés del licitante
+# (cache.py); el archivo es el mismo en los dos backends.
+
+
+def asyncpg_dsn(url: str) -> str:
+    # asyncpg quiere "postgresql://", sin el "+driver" de SQLAlchemy
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+class PgListener:
+    """
+    Escucha `channel` y llama a `on_notify(payload)` con cada NOTIFY. Si la conexión cae
+    se reintenta con backoff; lo notificado mientras tanto se pierde, y tras reconectar
+    se llama a `on_reconnect()` para que el dueño se resincronice.
+    """
+
+    def __init__(self, dsn: str, channel: str, on_notify: Callable[[str], None],
+                 on_reconnect: Optional[Callable[[], Awaitable[None]]] = None):
+        self.dsn = dsn
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_reconnect = on_reconnect
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+        self._lost = asyncio.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None
+
+    async def start(self) -> None:
+        await self._connect()
+        self._task = asyncio.create_task(self._keepalive())
+
+    async def _connect(self):
+        import asyncpg
+        conn = await asyncpg.connect(self.dsn)
+        conn.add_termination_listener(lambda _c: self._lost.set())
+        await conn.add_listener(self.channel, self._on_notify)
+        self._conn = conn
+        self._lost.clear()
+
+    async def _keepalive(self):
+        delay = 0.5
+        while True:
+            await self._lost.wait()
+            self._conn = None
+            try:
+                await self._connect()
+            except Exception as e:
+                log.warning("LISTEN %s: reconexión fallida (%s), reintento en %.1fs", self.channel, e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+            delay = 0.5
+            if self.on_reconnect:
+                try:
+                    await self.on_reconnect()
+                except Exception as e:
+                    log.warning("LISTEN %s: resincronización fallida tras reconectar (%s)", self.channel, e)
+
+    def _on_notify(self, _conn, _pid, _channel, payload: str):
+        self.on_notify(payload)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
+from datetime import datetime
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -31,6 +32,15 @@ class ConvocatoriaOut(BaseModel):
     class Config:
         orm_mode = True
 
+class ConvocatoriaSummary(BaseModel):
+    """Fila del listado: sin `descripcion` (Text), que solo trae el detalle."""
+    id: int
+    titulo: str
+    owner_id: int
+    created_at: Optional[datetime] = None
+    class Config:
+        orm_mode = True
+
 class SubmissionIn(BaseModel):
     payload_sha256: Optional[str] = None
     content_zip_sha256: Optional[str] = None
@@ -48,3 +58,19 @@ class SubmissionOut(BaseModel):
     licitante_id: int
     class Config:
         orm_mode = True
+
+class UploadInit(BaseModel):
+    total_size: int = Field(gt=0)
+    payload_sha256: str = Field(min_length=64, max_length=64)
+    content_zip_sha256: Optional[str] = None
+    sealed_zip_sha256: Optional[str] = None
+    wrapped_key_b64: str
+    nonce_b64: str
+    tag_b64: str
+    signer_pk_hex: Optional[str] = None
+    signature_b64: Optional[str] = None
+
+class UploadOut(BaseModel):
+    id: str
+    offset: int
+    total_size: int
@@ -1,45 +1,163 @@
 import base64
+import secrets
+from pydantic import ValidationError
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from ..db import get_db
-from ..models import Submission, Convocatoria, User, Role
-from ..schemas import SubmissionIn, SubmissionOut
-from ..auth.router import get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from ..db import get_async_db
+from ..models import Submission, Convocatoria, Role, Upload
+from ..schemas import SubmissionIn, SubmissionOut, UploadInit, UploadOut
+from ..auth.router import get_current_user_async
+from ..executors import run_crypto
+from ..config import settings
+from ..blobstore import get_blob_store
+from ..crypto_utils import sha256_bytes
 from .service import verify_optional_signature
+from . import uploads
 
 router = APIRouter(prefix="/submissions", tags=["submissions"])
 
 def b64d(s: str) -> bytes: return base64.b64decode(s)
 
-@router.post("/{conv_id}", response_model=SubmissionOut)
-def subir(conv_id: int, body: SubmissionIn, req: Request, db: Session = Depends(get_db)):
-    user = get_current_user(req, db)
+def _decode_submission(raw: bytes) -> tuple[SubmissionIn, dict]:
+    """
+    Parseo del JSON, base64, firma Ed25519 y SHA-256 del payload. Todo es CPU sobre
+    varios MB, así que corre en el crypto_executor y no en el event loop.
+    """
+    try:
+        body = SubmissionIn.parse_raw(raw)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    ciphertext = b64d(body.ciphertext_b64)
+    signature  = b64d(body.signature_b64) if body.signature_b64 else None
+    if not verify_optional_signature(body.signer_pk_hex, ciphertext, signature):
+        raise HTTPException(status_code=400, detail="Firma inválida")
+    payload_sha256 = sha256_bytes(ciphertext).hex()
+    if body.payload_sha256 and body.payload_sha256.lower() != payload_sha256:
+        raise HTTPException(status_code=400, detail="payload_sha256 no coincide")
+    return body, dict(
+        wrapped_key=b64d(body.wrapped_key_b64),
+        nonce=b64d(body.nonce_b64),
+        tag=b64d(body.tag_b64),
+        ciphertext=ciphertext,
+        signature=signature,
+        payload_sha256=payload_sha256,
+    )
+
+@router.post("/{conv_id}", response_model=SubmissionOut,
+             openapi_extra={"requestBody": {"required": True,
+                                            "content": {"application/json": {"schema": SubmissionIn.schema()}}}})
+async def subir(conv_id: int, req: Request, db: AsyncSession = Depends(get_async_db)):
+    # El cuerpo se lee crudo y se valida en _decode_submission: con `body: SubmissionIn`
+    # FastAPI parsearía el JSON (el ciphertext en base64) dentro del event loop.
+    user = await get_current_user_async(req, db)
     if not user or user.role != Role.LICITANTE:
         raise HTTPException(status_code=403, detail="Solo licitantes")
-    conv = db.get(Convocatoria, conv_id)
+    conv = await db.get(Convocatoria, conv_id)
     if not conv: raise HTTPException(status_code=404, detail="Convocatoria no existe")
 
-    wrapped_key = b64d(body.wrapped_key_b64)
-    nonce       = b64d(body.nonce_b64)
-    tag         = b64d(body.tag_b64)
-    ciphertext  = b64d(body.ciphertext_b64)
-    signature   = b64d(body.signature_b64) if body.signature_b64 else None
-
-    if not verify_optional_signature(body.signer_pk_hex, ciphertext, signature):
-        raise HTTPException(status_code=400, detail="Firma inválida")
+    body, d = await run_crypto(_decode_submission, await req.body())
+    await run_in_threadpool(get_blob_store().put_bytes, d["ciphertext"])
 
     sub = Submission(
         convocatoria_id=conv.id,
         licitante_id=user.id,
-        payload_sha256=body.payload_sha256,
+        payload_sha256=d["payload_sha256"],
         content_zip_sha256=body.content_zip_sha256,
         sealed_zip_sha256=body.sealed_zip_sha256,
-        wrapped_key=wrapped_key,
-        nonce=nonce,
-        tag=tag,
-        ciphertext=ciphertext,
+        wrapped_key=d["wrapped_key"],
+        nonce=d["nonce"],
+        tag=d["tag"],
+        ciphertext_size=len(d["ciphertext"]),
+        signer_pk_hex=body.signer_pk_hex,
+        signature=d["signature"]
+    )
+    db.add(sub); await db.commit()
+    return sub
+
+
+async def _get_upload(req: Request, db: AsyncSession, conv_id: int, upload_id: str) -> Upload:
+    user = await get_current_user_async(req, db)
+    if not user or user.role != Role.LICITANTE:
+        raise HTTPException(status_code=403, detail="Solo licitantes")
+    up = await db.get(Upload, upload_id)
+    if not up or up.convocatoria_id != conv_id or up.licitante_id != user.id:
+        raise HTTPException(status_code=404, detail="Subida no existe")
+    return up
+
+@router.post("/{conv_id}/uploads", response_model=UploadOut)
+async def iniciar_subida(conv_id: int, body: UploadInit, req: Request, db: AsyncSession = Depends(get_async_db)):
+    """Abre una subida por trozos: metadatos aquí, ciphertext crudo con PUT .../uploads/{id}?offset=N."""
+    user = await get_current_user_async(req, db)
+    if not user or user.role != Role.LICITANTE:
+        raise HTTPException(status_code=403, detail="Solo licitantes")
+    conv = await db.get(Convocatoria, conv_id)
+    if not conv: raise HTTPException(status_code=404, detail="Convocatoria no existe")
+    if body.total_size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Propuesta demasiado grande")
+
+    up = Upload(
+        id=secrets.token_hex(16),
+        convocatoria_id=conv.id,
+        licitante_id=user.id,
+        total_size=body.total_size,
+        payload_sha256=body.payload_sha256.lower(),
+        content_zip_sha256=body.content_zip_sha256,
+        sealed_zip_sha256=body.sealed_zip_sha256,
+        wrapped_key=b64d(body.wrapped_key_b64),
+        nonce=b64d(body.nonce_b64),
+        tag=b64d(body.tag_b64),
         signer_pk_hex=body.signer_pk_hex,
-        signature=signature
+        signature=b64d(body.signature_b64) if body.signature_b64 else None,
+    )
+    db.add(up); await db.commit()
+    await run_in_threadpool(uploads.create, up.id)
+    return UploadOut(id=up.id, offset=0, total_size=up.total_size)
+
+@router.get("/{conv_id}/uploads/{upload_id}", response_model=UploadOut)
+async def estado_subida(conv_id: int, upload_id: str, req: Request, db: AsyncSession = Depends(get_async_db)):
+    """Offset desde el que reanudar."""
+    up = await _get_upload(req, db, conv_id, upload_id)
+    return UploadOut(id=up.id, offset=await run_in_threadpool(uploads.received_bytes, up.id), total_size=up.total_size)
+
+@router.put("/{conv_id}/uploads/{upload_id}", response_model=UploadOut)
+async def subir_trozo(conv_id: int, upload_id: str, offset: int, req: Request,
+                      db: AsyncSession = Depends(get_async_db)):
+    """Cuerpo = bytes crudos del ciphertext desde `offset`. Cabecera opcional X-Chunk-Sha256."""
+    up = await _get_upload(req, db, conv_id, upload_id)
+    async with uploads.locked(up.id):
+        pos = await uploads.append_chunk(up.id, offset, up.total_size, req.stream(),
+                                         req.headers.get("X-Chunk-Sha256"))
+    return UploadOut(id=up.id, offset=pos, total_size=up.total_size)
+
+@router.post("/{conv_id}/uploads/{upload_id}/complete", response_model=SubmissionOut)
+async def completar_subida(conv_id: int, upload_id: str, req: Request, db: AsyncSession = Depends(get_async_db)):
+    up = await _get_upload(req, db, conv_id, upload_id)
+    async with uploads.locked(up.id):
+        path = await run_crypto(uploads.finalize, up.id, up.total_size, up.payload_sha256,
+                                up.signer_pk_hex, up.signature)
+        await run_in_threadpool(get_blob_store().put_file, path, up.payload_sha256)
+
+    sub = Submission(
+        convocatoria_id=up.convocatoria_id,
+        licitante_id=up.licitante_id,
+        payload_sha256=up.payload_sha256,
+        content_zip_sha256=up.content_zip_sha256,
+        sealed_zip_sha256=up.sealed_zip_sha256,
+        wrapped_key=up.wrapped_key,
+        nonce=up.nonce,
+        tag=up.tag,
+        ciphertext_size=up.total_size,
+        signer_pk_hex=up.signer_pk_hex,
+        signature=up.signature
     )
-    db.add(sub); db.commit(); db.refresh(sub)
+    db.add(sub); await db.delete(up); await db.commit()
+    await run_in_threadpool(uploads.discard, upload_id)
     return sub
+
+@router.delete("/{conv_id}/uploads/{upload_id}")
+async def cancelar_subida(conv_id: int, upload_id: str, req: Request, db: AsyncSession = Depends(get_async_db)):
+    up = await _get_upload(req, db, conv_id, upload_id)
+    await db.delete(up); await db.commit()
+    await run_in_threadpool(uploads.discard, upload_id)
+    return {"ok": True}
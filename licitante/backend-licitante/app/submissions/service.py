@@ -1,4 +1,8 @@
+import io
 import base64
+from typing import BinaryIO
+from ..blobstore import get_blob_store
+from ..models import Submission
 from ..crypto_utils import rsa_decrypt_oaep_sha256, aes_gcm_decrypt, ed25519_verify
 
 def b64d(s: str) -> bytes: return base64.b64decode(s)
@@ -11,3 +15,13 @@ def verify_optional_signature(signer_pk_hex: str | None, message: bytes, signatu
     if not signer_pk_hex or not signature:
         return True
     return ed25519_verify(signer_pk_hex, message, signature)
+
+def open_ciphertext(sub: Submission) -> BinaryIO:
+    # Filas antiguas aún tienen el ciphertext en la columna; las nuevas, en el blob store.
+    if sub.ciphertext is not None:
+        return io.BytesIO(sub.ciphertext)
+    return get_blob_store().open(sub.payload_sha256)
+
+def read_ciphertext(sub: Submission) -> bytes:
+    with open_ciphertext(sub) as f:
+        return f.read()
@@ -0,0 +1,180 @@
+import os
+import mmap
+import time
+import hashlib
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from ..config import settings
+from ..crypto_utils import ed25519_verify
+
+CHUNK = 1024 * 1024
+
+# Estado de hash por subida: (offset, sha256 parcial, último uso). Es solo una caché del
+# proceso: si se reinicia, si otro worker escribió el trozo anterior o si la entrada se
+# expulsó por inactividad (UPLOAD_STATE_TTL), el offset no coincide y se recalcula
+# leyendo lo ya recibido. Quién escribe en una subida lo decide `locked` (flock sobre
+# <id>.lock), que vale entre todos los workers de la máquina.
+_hashers: Dict[str, Tuple[int, "hashlib._Hash", float]] = {}
+_hashers_lock = threading.Lock()
+
+
+def upload_dir() -> Path:
+    d = Path(settings.UPLOAD_DIR)
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def part_path(upload_id: str) -> Path:
+    return upload_dir() / f"{upload_id}.part"
+
+
+def lock_path(upload_id: str) -> Path:
+    return upload_dir() / f"{upload_id}.lock"
+
+
+def received_bytes(upload_id: str) -> int:
+    p = part_path(upload_id)
+    return p.stat().st_size if p.exists() else 0
+
+
+def _remember(upload_id: str, offset: int, h) -> None:
+    now = time.monotonic()
+    with _hashers_lock:
+        _hashers[upload_id] = (offset, h, now)
+        # expulsa las subidas sin actividad (abandonadas, o que siguieron en otro worker)
+        cutoff = now - settings.UPLOAD_STATE_TTL
+        for stale in [k for k, v in _hashers.items() if v[2] < cutoff]:
+            del _hashers[stale]
+
+
+def create(upload_id: str):
+    part_path(upload_id).touch()
+    _remember(upload_id, 0, hashlib.sha256())
+
+
+def _acquire(upload_id: str) -> BinaryIO:
+    f = open(lock_path(upload_id), "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        raise HTTPException(status_code=409, detail="Otra petición está escribiendo en esta subida")
+    return f
+
+
+@asynccontextmanager
+async def locked(upload_id: str):
+    """
+    Exclusión sobre la subida entre peticiones y entre workers (flock, o msvcrt.locking en
+    Windows, sobre <id>.lock). No espera: si otra petición la tiene, 409.
+    """
+    f = await run_in_threadpool(_acquire, upload_id)
+    try:
+        yield
+    finally:
+        f.close()  # cerrar suelta el lock
+
+
+def _hasher_at(upload_id: str, offset: int):
+    cached = _hashers.get(upload_id)
+    if cached and cached[0] == offset:
+        return cached[1]
+    h = hashlib.sha256()
+    with open(part_path(upload_id), "rb") as f:
+        remaining = offset
+        while remaining:
+            b = f.read(min(CHUNK, remaining))
+            if not b:
+                break
+            h.update(b)
+            remaining -= len(b)
+    return h
+
+
+async def append_chunk(upload_id: str, offset: int, total_size: int, stream: AsyncIterator[bytes],
+                       chunk_sha256: Optional[str] = None) -> int:
+    """
+    Añade al .part lo que llega por `stream` a partir de `offset` (que debe coincidir
+    con lo ya recibido), hasheando al vuelo, dentro de `locked(upload_id)`. Si el trozo
+    no cuadra (tamaño o `chunk_sha256`), se descarta y el archivo vuelve a `offset`.
+    Devuelve el nuevo offset.
+    """
+    current = await run_in_threadpool(received_bytes, upload_id)
+    if offset != current:
+        raise HTTPException(status_code=409, detail=f"Offset esperado {current}")
+    h = await run_in_threadpool(_hasher_at, upload_id, offset)
+    before = h.copy()
+    ch = hashlib.sha256() if chunk_sha256 else None
+    pos = offset
+    buf = bytearray()
+
+    def flush(f, data: bytes):
+        # write + sha256 en el threadpool: con trozos de 1 MiB el loop no se bloquea
+        f.write(data)
+        h.update(data)
+        if ch:
+            ch.update(data)
+
+    with open(part_path(upload_id), "ab") as f:
+        try:
+            async for b in stream:
+                if not b:
+                    continue
+                pos += len(b)
+                if pos > total_size:
+                    raise HTTPException(status_code=413, detail="El trozo excede el tamaño declarado")
+                buf += b
+                if len(buf) >= CHUNK:
+                    await run_in_threadpool(flush, f, bytes(buf))
+                    buf.clear()
+            if buf:
+                await run_in_threadpool(flush, f, bytes(buf))
+            if ch and ch.hexdigest() != chunk_sha256.lower():
+                raise HTTPException(status_code=400, detail="SHA-256 del trozo no coincide")
+        except BaseException:
+            f.truncate(offset)
+            _remember(upload_id, offset, before)
+            raise
+    _remember(upload_id, pos, h)
+    return pos
+
+
+def finalize(upload_id: str, total_size: int, payload_sha256: str,
+             signer_pk_hex: Optional[str], signature: Optional[bytes]) -> Path:
+    """Comprueba tamaño, hash y (si viene) firma Ed25519 del payload completo."""
+    size = received_bytes(upload_id)
+    if size != total_size:
+        raise HTTPException(status_code=409, detail=f"Faltan bytes: {size}/{total_size}")
+    if _hasher_at(upload_id, size).hexdigest() != payload_sha256.lower():
+        raise HTTPException(status_code=400, detail="payload_sha256 no coincide")
+    if signer_pk_hex and signature:
+        with open(part_path(upload_id), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if not ed25519_verify(signer_pk_hex, m, signature):
+                raise HTTPException(status_code=400, detail="Firma inválida")
+    return part_path(upload_id)
+
+
+def discard(upload_id: str):
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    for p in (part_path(upload_id), lock_path(upload_id)):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Los tests corren desde backend-licitante/ con SQLite y carpetas temporales: la
+# configuración se lee al importar `app`, así que el entorno se fija antes.
+_tmp = tempfile.mkdtemp(prefix="licitante-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+for name in ("UPLOAD_DIR", "BLOB_DIR"):
+    os.environ.setdefault(name, os.path.join(_tmp, name.lower()))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
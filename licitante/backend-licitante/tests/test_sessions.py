@@ -0,0 +1,43 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import SessionLocal
+from app.models import Role, User
+
+UPLOAD = {"total_size": 10, "payload_sha256": "0" * 64, "wrapped_key_b64": "", "nonce_b64": "", "tag_b64": ""}
+
+
+def _set_role(email: str, role: Role):
+    with SessionLocal() as db:
+        db.query(User).filter_by(email=email).one().role = role
+        db.commit()
+
+
+def test_role_change_is_visible_on_next_request():
+    with TestClient(app) as c:
+        email = "rol@example.com"
+        c.post("/api/auth/register", json={"email": email, "name": "rol", "password": "pw", "role": "LICITANTE"})
+        assert c.post("/api/auth/login", json={"email": email, "password": "pw"}).status_code == 200
+
+        # licitante: pasa el control de rol (y la convocatoria no existe); la identidad queda cacheada
+        assert c.post("/api/submissions/999/uploads", json=UPLOAD).status_code == 404
+        assert c.post("/api/submissions/999/uploads", json=UPLOAD).status_code == 404
+
+        _set_role(email, Role.CONVOCANTE)
+        assert c.post("/api/submissions/999/uploads", json=UPLOAD).status_code == 403
+
+        _set_role(email, Role.LICITANTE)
+        assert c.post("/api/submissions/999/uploads", json=UPLOAD).status_code == 404
+
+
+def test_logout_is_visible_on_next_request():
+    with TestClient(app) as c:
+        email = "salida@example.com"
+        c.post("/api/auth/register", json={"email": email, "name": "salida", "password": "pw", "role": "LICITANTE"})
+        c.post("/api/auth/login", json={"email": email, "password": "pw"})
+        cookie = c.cookies.get("session")
+        assert c.post("/api/submissions/999/uploads", json=UPLOAD).status_code == 404
+
+        c.post("/api/auth/logout")
+        c.cookies.set("session", cookie)
+        assert c.post("/api/submissions/999/uploads", json=UPLOAD).status_code == 403
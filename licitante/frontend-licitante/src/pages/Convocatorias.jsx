@@ -1,25 +1,56 @@
 import React, { useEffect, useState } from 'react'
-import { api, API } from '../api'
+import { api, apiPage, API } from '../api'
 const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8001/ws/licitante'
 export default function Convocatorias() {
   const [items, setItems] = useState([])
   const [log, setLog] = useState([])
+  const [next, setNext] = useState(null)
   const [sel, setSel] = useState(null)
-  useEffect(()=>{ (async()=> setItems(await api('/api/convocatorias')))() },[])
+  const load = async (cursor = null)=>{
+    const page = await apiPage('/api/convocatorias', cursor)
+    setItems(curr=> cursor ? [...curr, ...page.items] : page.items)
+    setNext(page.next)
+  }
+  useEffect(()=>{ load() },[])
   useEffect(()=>{
-    const ws = new WebSocket(WS_URL)
-    ws.onopen = () => setLog(x=>[...x, 'WS conectado'])
-    ws.onmessage = (ev)=>{
-      try{
-        const data = JSON.parse(ev.data)
-        if(data.type === 'new_convocatoria'){
-          setItems(curr=>[{ id:data.id, titulo:data.titulo, descripcion:'(nueva)' }, ...curr])
-          setLog(x=>[...x, `Nueva convocatoria #${data.id}: ${data.titulo}`])
-        }
-      }catch{}
+    // Reconecta con ?cursor=<último seq>&epoch=<su epoch>: el servidor manda solo los eventos
+    // perdidos, o un snapshot (la primera página) si ya no los tiene o reinició con otra serie
+    // de seq. No se vuelve a pedir /api/convocatorias.
+    let ws, timer, closed = false, seq = null, epoch = null, delay = 1000
+    const connect = ()=>{
+      ws = new WebSocket(seq === null ? WS_URL
+        : `${WS_URL}?cursor=${seq}&epoch=${encodeURIComponent(epoch ?? '')}`)
+      ws.onopen = () => { delay = 1000; setLog(x=>[...x, 'WS conectado']) }
+      ws.onmessage = (ev)=>{
+        try{
+          const data = JSON.parse(ev.data)
+          if(typeof data.seq === 'number'){
+            // otro epoch = otra serie de seq: el número anterior ya no sirve de referencia
+            seq = data.epoch === epoch ? Math.max(seq ?? 0, data.seq) : data.seq
+            epoch = data.epoch
+          }
+          if(data.type === 'new_convocatoria'){
+            setItems(curr=> curr.some(c=>c.id === data.id) ? curr
+              : [{ id:data.id, titulo:data.titulo, descripcion:'(nueva)' }, ...curr])
+            setLog(x=>[...x, `Nueva convocatoria #${data.id}: ${data.titulo}`])
+          } else if(data.type === 'snapshot'){
+            setItems(data.items)
+            setNext(data.next_cursor == null ? null : String(data.next_cursor))
+            setLog(x=>[...x, 'Lista resincronizada'])
+          } else if(data.type === 'resync'){
+            load()
+          }
+        }catch{}
+      }
+      ws.onclose = ()=>{
+        setLog(x=>[...x, 'WS desconectado'])
+        if(closed) return
+        timer = setTimeout(connect, delay + Math.random()*delay)  // jitter: sin estampida tras un deploy
+        delay = Math.min(delay*2, 30000)
+      }
     }
-    ws.onclose = ()=> setLog(x=>[...x, 'WS desconectado'])
-    return ()=> ws.close()
+    connect()
+    return ()=>{ closed = true; clearTimeout(timer); ws.close() }
   }, [])
   const open = async (id)=>{ setSel(await api('/api/convocatorias/'+id)) }
   return (
@@ -36,6 +67,7 @@ export default function Convocatorias() {
             </div>
           ))}
         </div>
+        {next && <><div className="sp" /><button onClick={()=>load(next)}>Cargar más</button></>}
       </div>
       <div className="card">
         <strong>Eventos</strong>